@@ -1,11 +1,35 @@
-from flask import Flask
+from io import BytesIO
+from flask import Flask, Request
 from flask_cors import CORS
 from config import Config
+from utils.serialization import install_json_provider
+from utils.metrics import metrics, install_metrics
+from services.registry import services
+from services.prompt_compiler import PromptBudgetError
+
+class InMemoryUploadRequest(Request):
+    """
+    Keeps file uploads in memory. Werkzeug spools anything over 500KB to a
+    temporary file; requests over MAX_CONTENT_LENGTH are rejected anyway.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= Config.MAX_CONTENT_LENGTH:
+            return BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
 def create_app():
     app = Flask(__name__)
+    app.request_class = InMemoryUploadRequest
     app.config.from_object(Config)
-    CORS(app)
+    # orjson-backed request parsing and responses for every blueprint
+    install_json_provider(app)
+    CORS(app, expose_headers=['Server-Timing', 'X-Request-Id'])
+    # Per-route latency plus optional Server-Timing trace headers
+    install_metrics(app)
+
+    # Services (Gemini, Supabase, exporters...) are built once per process on first use
+    app.extensions['services'] = services
 
     # Register blueprints
     from routes.policy_routes import policy_bp
@@ -22,10 +46,29 @@ def create_app():
     app.register_blueprint(file_bp, url_prefix='/api/files')
     app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
 
+    @app.errorhandler(PromptBudgetError)
+    def prompt_budget_exceeded(e):
+        return {'error': str(e), 'endpoint': e.endpoint, 'tokens': e.tokens, 'budget': e.budget}, 413
+
     @app.route('/health')
     def health_check():
         return {'status': 'healthy'}, 200
 
+    @app.route('/metrics')
+    def metrics_endpoint():
+        if not metrics.enabled:
+            return {'error': 'Metrics are disabled (METRICS_ENABLED=false)'}, 404
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    @app.route('/health/models')
+    def model_health_check():
+        from services.model_health import model_health
+        return {'models': model_health.snapshot()}, 200
+
+    @app.route('/health/services')
+    def service_health_check():
+        return services.stats(), 200
+
     return app
 
 if __name__ == '__main__':
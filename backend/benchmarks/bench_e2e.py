@@ -0,0 +1,263 @@
+"""
+End-to-end load test: boots create_app() on a local threaded server with a
+deterministic fake Gemini backend and an in-memory SQLite database, drives
+every blueprint at a fixed concurrency and reports throughput and
+p50/p95/p99 latency per endpoint. Results are saved as JSON and can be
+compared against a previous run.
+
+Run from the backend directory:
+    python benchmarks/bench_e2e.py --requests 200 --concurrency 8
+    python benchmarks/bench_e2e.py --llm-latency 800 --rate-limit-rate 0.05
+    python benchmarks/bench_e2e.py --compare benchmarks/baselines/e2e.json --no-save
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "e2e.json")
+
+# Isolated, in-process stand-ins; must be set before config is imported
+BENCH_ENV = {
+    "GEMINI_API_KEY": "fake",
+    "SUPABASE_URL": "",
+    "SUPABASE_KEY": "",
+    "DB_BACKEND": "sqlite",
+    "DB_SQLITE_PATH": ":memory:",
+    "LLM_CACHE_ENABLED": "false",
+    "MODEL_HEALTH_PATH": "",
+    "JOB_STORE_PATH": ":memory:",
+    "RISK_RULES_RELOAD_INTERVAL": "0",
+}
+
+CLIENT = {"name": "Load Test", "age": 52, "income": 48000, "lifestyle": "active", "medical_history": True}
+INSURANCE = {"type": "life", "coverage_amount": 250000}
+
+
+def make_docx(text: str) -> bytes:
+    from docx import Document
+    document = Document()
+    for line in text.split("\n"):
+        document.add_paragraph(line)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def multipart(field: str, filename: str, data: bytes, content_type: str):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def json_request(method: str, path: str, payload: dict):
+    return method, path, json.dumps(payload).encode(), "application/json"
+
+
+def build_scenarios(policy_id: str, policy_text: str, docx_bytes: bytes, bypass_cache: bool):
+    """Endpoint name -> function(i) returning (method, path, body, content_type)."""
+    upload_body, upload_type = multipart(
+        "file", "policy.docx", docx_bytes,
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    refine_prompts = ["Add flood coverage to the exclusions", "Clarify the premium payment schedule",
+                      "Extend detailed coverage to dental care", "Tighten the terms & conditions on claims"]
+    questions = ["What is excluded?", "How are premiums paid?", "What does the coverage include?"]
+    return {
+        "policies_create": lambda i: json_request("POST", "/api/policies/", {
+            "client_details": dict(CLIENT, age=25 + i % 50), "insurance_details": INSURANCE, "bypass_cache": bypass_cache}),
+        "risk_analyze": lambda i: json_request("POST", "/api/risk/analyze", {"client_details": dict(CLIENT, age=18 + i % 70)}),
+        "pricing_calculate": lambda i: json_request("POST", "/api/pricing/calculate", {
+            "risk_score": ("Low", "Medium", "High")[i % 3], "coverage_amount": 50000 + 1000 * (i % 100)}),
+        "prompts_refine": lambda i: json_request("POST", "/api/prompts/refine", {
+            "policy_id": policy_id, "prompt": refine_prompts[i % len(refine_prompts)],
+            "current_text": policy_text, "bypass_cache": bypass_cache}),
+        "chatbot_query": lambda i: json_request("POST", "/api/chatbot/query", {
+            "policy_id": policy_id, "question": questions[i % len(questions)], "bypass_cache": bypass_cache}),
+        "files_upload": lambda i: ("POST", "/api/files/upload", upload_body, upload_type),
+        "policies_get": lambda i: ("GET", f"/api/policies/{policy_id}", None, "application/json"),
+        "policies_export": lambda i: json_request("POST", f"/api/policies/{policy_id}/export", {
+            "format": ("pdf", "docx")[i % 2], "policy_text": policy_text + f"\nRevision {i % 10}\n"}),
+    }
+
+
+class ServerThread:
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def run_endpoint(port: int, build, count: int, concurrency: int) -> dict:
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(count))
+    local = threading.local()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, path, body, content_type = build(i)
+            start = time.perf_counter()
+            try:
+                conn = getattr(local, "conn", None)
+                if conn is None:
+                    conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                conn.request(method, path, body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    local.conn = None
+            except (OSError, http.client.HTTPException) as e:
+                local.conn = None
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors.append(status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    import numpy as np
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0, 0, 0)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_statuses": sorted({str(status) for status in errors}),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["endpoints"]
+    print(f"\ncompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    ok = True
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+        rps_change = (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] if previous["throughput_rps"] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        ok = ok and not regressed
+        print(f"  {name:<18} p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", help="Comma-separated subset of endpoint names")
+    parser.add_argument("--llm-latency", type=float, default=50.0, help="Fake Gemini latency (ms)")
+    parser.add_argument("--llm-jitter", type=float, default=10.0, help="Fake Gemini latency jitter (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Gemini calls failing with a 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of Gemini calls failing with a 429")
+    parser.add_argument("--llm-cache", action="store_true", help="Enable the LLM response cache")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", default=DEFAULT_BASELINE, help="Where to write the JSON results")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/throughput regression")
+    parser.add_argument("--verbose", action="store_true", help="Show server logs")
+    args = parser.parse_args()
+
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    if args.llm_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "true"
+        os.environ["LLM_CACHE_PATH"] = ""
+
+    from benchmarks.fake_gemini import FakeGeminiBackend, policy_markdown
+    fake = FakeGeminiBackend(latency_ms=args.llm_latency, jitter_ms=args.llm_jitter, error_rate=args.error_rate,
+                             rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    fake.install()
+
+    from app import create_app
+    from services.registry import services
+    app = create_app()
+
+    policy_text = policy_markdown("seed")
+    db = services.get("db")
+    policy_id = db.save_policy_bundle(CLIENT, INSURANCE, {"score": "Medium", "score_value": 0.5, "factors": [], "explanation": ""},
+                                      {"monthly_premium": 40.0, "yearly_premium": 456.0, "breakdown": {}, "explanation": ""},
+                                      policy_text)["id"]
+    scenarios = build_scenarios(policy_id, policy_text, make_docx(policy_text), bypass_cache=not args.llm_cache)
+    names = args.endpoints.split(",") if args.endpoints else list(scenarios)
+
+    results = {}
+    logs = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with ServerThread(app) as server:
+        for name in names:
+            with logs:
+                # A few warm-up requests so lazy services and pools are built
+                run_endpoint(server.port, scenarios[name], min(args.concurrency, args.requests), args.concurrency)
+                results[name] = run_endpoint(server.port, scenarios[name], args.requests, args.concurrency)
+
+    print(f"{'endpoint':<18} {'requests':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['requests']:>8} {result['errors']:>7} {result['throughput_rps']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+    print(f"fake Gemini: {fake.stats()}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("save", "no_save", "compare", "verbose")},
+        },
+        "endpoints": results,
+        "fake_gemini": fake.stats(),
+    }
+    ok = compare(results, args.compare, args.tolerance) if args.compare else True
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results saved to {args.save}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
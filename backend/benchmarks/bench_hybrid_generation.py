@@ -0,0 +1,102 @@
+"""
+Policy generation latency and token spend in "llm" mode (Gemini writes the
+whole policy) vs. "hybrid" mode (templates plus an LLM-written narrative),
+against the fake Gemini backend with per-token decode time. Also reports the
+time to the first streamed chunk and the cost of the all-models-failed
+template fallback.
+
+Run from the backend directory:
+    python benchmarks/bench_hybrid_generation.py --policies 20 --ms-per-token 5
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {"GEMINI_API_KEY": "fake", "LLM_CACHE_ENABLED": "false", "MODEL_HEALTH_PATH": "",
+                   "METRICS_ENABLED": "true"}.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks.fake_gemini import FakeGeminiBackend
+
+CLIENT = {"name": "Jane Roe", "age": 64, "income": 52000, "lifestyle": "smoker", "medical_history": True}
+INSURANCE = {"type": "health", "coverage_amount": 200000}
+
+
+def tokens_by_kind(metrics, kind: str) -> float:
+    return sum(value for (name, labels), value in metrics._counters.items()
+               if name.endswith("llm_tokens_total") and ("kind", kind) in labels)
+
+
+def run_mode(ai, mode: str, policies: int, stream: bool, risk: dict, pricing: dict):
+    from config import Config
+    from utils.metrics import metrics
+    Config.POLICY_GENERATION_MODE = mode
+    metrics.reset()
+    latencies = []
+    first_chunk = []
+    lengths = []
+    for i in range(policies):
+        client = dict(CLIENT, age=CLIENT["age"] + i % 5)
+        start = time.perf_counter()
+        if stream:
+            chunks = ai.stream_policy(client, risk, pricing, use_cache=False, insurance_details=INSURANCE)
+            text = ""
+            for chunk in chunks:
+                if not text:
+                    first_chunk.append(time.perf_counter() - start)
+                text += chunk
+        else:
+            text = ai.generate_policy(client, risk, pricing, use_cache=False, insurance_details=INSURANCE)
+        latencies.append(time.perf_counter() - start)
+        lengths.append(len(text))
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "first_chunk_ms": statistics.median(first_chunk) * 1000 if first_chunk else None,
+        "prompt_tokens": tokens_by_kind(metrics, "prompt") / policies,
+        "completion_tokens": tokens_by_kind(metrics, "completion") / policies,
+        "policy_chars": statistics.mean(lengths)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fake Gemini time to first token")
+    parser.add_argument("--ms-per-token", type=float, default=5.0, help="Fake Gemini decode time per output token")
+    args = parser.parse_args()
+
+    fake = FakeGeminiBackend(latency_ms=args.latency_ms, jitter_ms=0, ms_per_token=args.ms_per_token)
+    fake.install()
+
+    from services.risk_engine import RiskEngine
+    from services.pricing_engine import PricingEngine
+    from services.ai_service import AIService
+    risk = RiskEngine().calculate_risk(CLIENT).model_dump()
+    pricing = PricingEngine().calculate_pricing(risk["score"], INSURANCE["coverage_amount"], INSURANCE["type"]).model_dump()
+    ai = AIService()
+
+    print(f"{args.policies} policies, fake Gemini {args.latency_ms:.0f} ms + {args.ms_per_token} ms/output token\n")
+    print(f"{'mode':<16} {'p50 ms':>9} {'1st chunk ms':>13} {'prompt tok':>11} {'output tok':>11} {'chars':>7}")
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results = {}
+        for mode in ("llm", "hybrid"):
+            results[mode] = run_mode(ai, mode, args.policies, False, risk, pricing)
+            results[mode + " stream"] = run_mode(ai, mode, args.policies, True, risk, pricing)
+        fake.error_rate = 1.0
+        results["hybrid degraded"] = run_mode(ai, "hybrid", args.policies, False, risk, pricing)
+    for mode, r in results.items():
+        first = f"{r['first_chunk_ms']:.1f}" if r["first_chunk_ms"] is not None else "-"
+        print(f"{mode:<16} {r['p50_ms']:>9.1f} {first:>13} {r['prompt_tokens']:>11.0f} "
+              f"{r['completion_tokens']:>11.0f} {r['policy_chars']:>7.0f}")
+    speedup = results["llm"]["p50_ms"] / results["hybrid"]["p50_ms"]
+    saved = 1 - results["hybrid"]["completion_tokens"] / results["llm"]["completion_tokens"]
+    print(f"\nhybrid: {speedup:.1f}x faster, {saved:.0%} fewer output tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compares the risk and pricing endpoints before and after the shared
+serialization layer: Flask's default JSON provider with `.dict()`/`.tolist()`
+handlers vs. the orjson provider with results serialized once.
+
+Run from the backend directory:
+    python benchmarks/bench_json_responses.py --requests 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from services.risk_engine import RiskEngine
+from services.pricing_engine import PricingEngine
+
+CLIENT = {"age": 64, "income": 18000, "medical_history": True, "lifestyle": "high_risk"}
+
+
+def make_legacy_app() -> Flask:
+    """The handlers as they were written before, on Flask's default provider."""
+    app = Flask("legacy")
+    app.json = DefaultJSONProvider(app)
+    risk_engine = RiskEngine()
+    pricing_engine = PricingEngine()
+
+    @app.route('/api/risk/analyze', methods=['POST'])
+    def analyze_risk():
+        result = risk_engine.calculate_risk(request.json.get('client_details', {}))
+        return jsonify(result.dict()), 200
+
+    @app.route('/api/risk/analyze/batch', methods=['POST'])
+    def analyze_risk_batch():
+        data = request.json
+        result = risk_engine.calculate_risk_batch(data.get('clients', []), include_factors=True)
+        return jsonify({
+            "count": result["count"],
+            "score": result["score"].tolist(),
+            "score_value": result["score_value"].tolist(),
+            "factors": [[f.dict() for f in row] for row in result["factors"]],
+            "explanation": result["explanation"]
+        }), 200
+
+    @app.route('/api/pricing/calculate', methods=['POST'])
+    def calculate_pricing():
+        data = request.json
+        result = pricing_engine.calculate_pricing(data.get('risk_score', 'Medium'), data.get('coverage_amount', 100000), data.get('insurance_type', 'life'))
+        return jsonify(result.dict()), 200
+
+    @app.route('/api/pricing/grid', methods=['POST'])
+    def calculate_grid():
+        data = request.json
+        grid = pricing_engine.calculate_grid(data['coverage_amounts'])
+        return jsonify({
+            "insurance_types": grid["insurance_types"],
+            "risk_scores": grid["risk_scores"],
+            "coverage_amounts": grid["coverage_amounts"].tolist(),
+            "shape": list(grid["monthly_premium"].shape),
+            "monthly_premium": grid["monthly_premium"].tolist(),
+            "yearly_premium": grid["yearly_premium"].tolist()
+        }), 200
+
+    return app
+
+
+def policy_payload_legacy(risk_engine, pricing_engine):
+    risk_result = risk_engine.calculate_risk(CLIENT)
+    pricing_result = pricing_engine.calculate_pricing(risk_result.score, 250000, 'life')
+    prompt = json.dumps(CLIENT, indent=2) + json.dumps(risk_result.dict(), indent=2) + json.dumps(pricing_result.dict(), indent=2)
+    bundle = (risk_result.dict(), pricing_result.dict())
+    return json.dumps({"risk_assessment": risk_result.dict(), "pricing": pricing_result.dict(), "policy_text": prompt}).encode(), bundle
+
+
+def policy_payload_current(risk_engine, pricing_engine):
+    from utils.serialization import Serialized, dumps_bytes, dumps_pretty
+    risk_result = risk_engine.calculate_risk(CLIENT)
+    pricing_result = pricing_engine.calculate_pricing(risk_result.score, 250000, 'life')
+    risk = Serialized(risk_result)
+    pricing = Serialized(pricing_result)
+    prompt = dumps_pretty(CLIENT) + dumps_pretty(risk.data) + dumps_pretty(pricing.data)
+    bundle = (risk.data, pricing.data)
+    return dumps_bytes({"risk_assessment": risk, "pricing": pricing, "policy_text": prompt}), bundle
+
+
+def requests_per_second(client, path: str, body: dict, count: int) -> float:
+    for _ in range(min(50, count)):
+        client.post(path, json=body)
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.post(path, json=body)
+        response.get_data()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = [
+        ("/api/risk/analyze", {"client_details": CLIENT}, args.requests),
+        ("/api/risk/analyze/batch", {"clients": [dict(CLIENT, age=18 + i % 70) for i in range(1000)], "include_factors": True}, max(1, args.requests // 20)),
+        ("/api/pricing/calculate", {"risk_score": "High", "coverage_amount": 250000}, args.requests),
+        ("/api/pricing/grid", {"coverage_amounts": list(range(50000, 2000001, 5000))}, max(1, args.requests // 20)),
+    ]
+    legacy = make_legacy_app().test_client()
+    current = create_app().test_client()
+    for path, body, count in cases:
+        if legacy.post(path, json=body).json != current.post(path, json=body).json:
+            print(f"{path}: responses differ")
+            return 1
+
+    print(f"{'endpoint':<26} {'before':>12} {'after':>12} {'speedup':>8}")
+    for path, body, count in cases:
+        before = requests_per_second(legacy, path, body, count)
+        after = requests_per_second(current, path, body, count)
+        print(f"{path:<26} {before:>8,.0f} r/s {after:>8,.0f} r/s {after / before:>7.2f}x")
+
+    risk_engine = RiskEngine()
+    pricing_engine = PricingEngine()
+    timings = []
+    for build in (policy_payload_legacy, policy_payload_current):
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            build(risk_engine, pricing_engine)
+        timings.append((time.perf_counter() - start) / args.requests * 1e6)
+    print(f"{'create_policy serialization':<26} {timings[0]:>9.1f} us {timings[1]:>9.1f} us {timings[0] / timings[1]:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Persistence throughput per storage backend: single policy bundles, bulk
+bundle batches, row inserts vs. bulk inserts, and policy version saves.
+Runs against the embedded SQLite backend, and against Postgres too when a
+DSN is given.
+
+Run from the backend directory:
+    python benchmarks/bench_persistence.py --bundles 2000
+    python benchmarks/bench_persistence.py --dsn postgresql://localhost/insurance
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from models.supabase_models import SupabaseModels
+from models.sqlite_repository import SQLiteRepository
+
+CLIENT = {"name": "Bench", "age": 42, "income": 65000, "lifestyle": "active", "medical_history": False}
+INSURANCE = {"type": "life", "coverage_amount": 250000}
+RISK = {"score": "Medium", "score_value": 0.5, "factors": [{"name": "Age", "impact": "Medium", "description": "Bench factor."}],
+        "explanation": "Risk assessment concluded with a Medium risk level due to factors: Age"}
+PRICING = {"monthly_premium": 42.5, "yearly_premium": 484.5, "breakdown": {"base_premium": 25.0, "processing_fee": 10.0},
+           "explanation": "Calculated pricing."}
+POLICY_TEXT = "# Policy\n\n" + "".join(f"## Section {i}\n" + "Coverage clause text.\n" * 10 for i in range(10))
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>10,.0f}/s"
+
+
+def run(db: SupabaseModels, bundles: int):
+    start = time.perf_counter()
+    policy_ids = [
+        db.save_policy_bundle(CLIENT, INSURANCE, RISK, PRICING, POLICY_TEXT)["id"]
+        for _ in range(bundles)
+    ]
+    print(f"  bundle per transaction:   {rate(bundles, time.perf_counter() - start)}")
+
+    for batch_size in (50, 500):
+        batch = [db._build_bundle(CLIENT, INSURANCE, RISK, PRICING, POLICY_TEXT, "Bench") for _ in range(bundles)]
+        start = time.perf_counter()
+        for i in range(0, bundles, batch_size):
+            db._write_bundles(batch[i:i + batch_size])
+        print(f"  bundles, batch of {batch_size:<4}   {rate(bundles, time.perf_counter() - start)}")
+
+    rows = [{"policy_id": policy_ids[i % len(policy_ids)], "prompt_text": f"Prompt {i}"} for i in range(bundles)]
+    start = time.perf_counter()
+    for row in rows:
+        db.repo.insert("prompts_log", row)
+    print(f"  prompt rows, one by one:  {rate(bundles, time.perf_counter() - start)}")
+    start = time.perf_counter()
+    db.repo.insert_many("prompts_log", rows)
+    print(f"  prompt rows, bulk insert: {rate(bundles, time.perf_counter() - start)}")
+
+    versions = min(bundles, 500)
+    text = POLICY_TEXT
+    start = time.perf_counter()
+    for i in range(versions):
+        text = text.replace("Coverage clause text.", f"Amended clause {i}.", 1)
+        db.save_policy_version(policy_ids[0], text)
+    print(f"  policy versions (delta):  {rate(versions, time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    for i in range(1, versions + 1):
+        db.get_policy_version(policy_ids[0], i)
+    print(f"  version reads:            {rate(versions, time.perf_counter() - start)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bundles", type=int, default=2000)
+    parser.add_argument("--dsn", help="Postgres DSN with supabase_schema.sql applied")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("sqlite (file, WAL):")
+        repo = SQLiteRepository(os.path.join(tmp, "bench.sqlite3"), schema_path=Config.DB_SCHEMA_PATH)
+        run(SupabaseModels(repo), args.bundles)
+        repo.close()
+
+    if args.dsn:
+        from models.postgres_repository import PostgresRepository
+        print("postgres (pooled):")
+        repo = PostgresRepository(args.dsn, min_size=Config.DB_POOL_MIN_SIZE, max_size=Config.DB_POOL_MAX_SIZE,
+                                  prepare_threshold=Config.DB_PREPARE_THRESHOLD)
+        run(SupabaseModels(repo), args.bundles)
+        repo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Per-policy read latency on the SQLite backend: GET /api/policies/<id> and
+its risk, pricing and versions endpoints against a database of `--policies`
+imported policies, with and without the policy_id indexes and with the
+read-through cache off and on. Reads pick policies at random from a hot set
+of `--hot` policies. `--db-latency-ms` adds a delay to every query to stand
+in for the network round trip to Supabase/Postgres.
+
+Run from the backend directory:
+    python benchmarks/bench_policy_reads.py --policies 100000 --reads 2000
+"""
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {"GEMINI_API_KEY": "fake", "SUPABASE_URL": "", "SUPABASE_KEY": "", "DB_BACKEND": "sqlite",
+                   "LLM_CACHE_ENABLED": "false", "MODEL_HEALTH_PATH": "", "RISK_RULES_RELOAD_INTERVAL": "0"}.items():
+    os.environ.setdefault(key, value)
+
+INDEXES = ["idx_risk_assessments_policy_created", "idx_pricing_details_policy_created",
+           "idx_policy_versions_policy_created"]
+PATHS = ["", "/risk", "/pricing", "/versions"]
+
+
+def read_latencies(client, policy_ids, reads: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    latencies = []
+    for i in range(reads):
+        path = f"/api/policies/{rng.choice(policy_ids)}{PATHS[i % len(PATHS)]}"
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", type=int, default=100000)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--hot", type=int, default=200, help="Distinct policies read")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Added to every DB query")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_reads_")
+    os.environ["DB_SQLITE_PATH"] = os.path.join(workdir, "insurance.sqlite3")
+    os.environ["IMPORT_STATE_DIR"] = os.path.join(workdir, "imports")
+    csv_path = os.path.join(workdir, "portfolio.csv")
+
+    from benchmarks.bench_portfolio_import import write_portfolio
+    from app import create_app
+    from config import Config
+    from models.sqlite_repository import translate_schema
+    from services.registry import services
+    from services.portfolio_import import PortfolioImporter
+
+    write_portfolio(csv_path, args.policies)
+    importer = PortfolioImporter()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        importer.run(importer.create(csv_path, policy_text="template")["import_id"])
+    print(f"Imported {args.policies:,} policies with versions in {time.perf_counter() - start:.1f}s\n")
+
+    app = create_app()
+    client = app.test_client()
+    db = services.get("db")
+    conn = db.repo._conn()
+    policy_ids = [row[0] for row in conn.execute(f"SELECT id FROM policies ORDER BY random() LIMIT {args.hot}")]
+    if args.db_latency_ms:
+        select = db.repo.select
+
+        def delayed_select(*a, **kw):
+            time.sleep(args.db_latency_ms / 1000)
+            return select(*a, **kw)
+        db.repo.select = delayed_select
+
+    print(f"{'setup':<24} {'p50 ms':>8} {'p95 ms':>8} {'reads/s':>9}")
+    for setup in ("no indexes", "indexes", "indexes + read cache"):
+        if setup == "no indexes":
+            for name in INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        elif setup == "indexes":
+            with open(Config.DB_SCHEMA_PATH) as f:
+                statements, _, _ = translate_schema(f.read())
+            for statement in statements:
+                conn.execute(statement)
+        db.read_cache.clear()
+        db.read_cache.max_policies = 4096 if setup.endswith("read cache") else 0
+        latencies = sorted(read_latencies(client, policy_ids, args.reads))
+        print(f"{setup:<24} {statistics.median(latencies) * 1000:>8.2f} "
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.2f} {len(latencies) / sum(latencies):>9.0f}")
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM risk_assessments WHERE policy_id = ? "
+                        "ORDER BY created_at DESC LIMIT 1", (policy_ids[0],)).fetchall()
+    print(f"\nDB latency {args.db_latency_ms:.0f} ms per query; risk lookup plan: {plan[0][-1]}")
+    print(f"read cache: {db.read_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
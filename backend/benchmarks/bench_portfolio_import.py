@@ -0,0 +1,111 @@
+"""
+Bulk portfolio import throughput: generates a synthetic CSV book of
+business and imports it through risk scoring, pricing and batched
+persistence into a SQLite database, reporting rows/s per stage.
+Compares against the per-request path (one save_policy_bundle per client,
+as POST /api/policies/ without the LLM call) on a sample of the rows, run
+afterwards against the same database, and reports the peak RSS growth.
+
+Run from the backend directory:
+    python benchmarks/bench_portfolio_import.py --rows 1000000
+    python benchmarks/bench_portfolio_import.py --rows 50000 --policy-text template
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {"GEMINI_API_KEY": "fake", "SUPABASE_URL": "", "SUPABASE_KEY": "", "DB_BACKEND": "sqlite",
+                   "LLM_CACHE_ENABLED": "false", "MODEL_HEALTH_PATH": "", "RISK_RULES_RELOAD_INTERVAL": "0",
+                   "METRICS_ENABLED": "true"}.items():
+    os.environ.setdefault(key, value)
+
+TYPES = ["life", "health", "auto", "property"]
+LIFESTYLES = ["standard", "active", "smoker", "high_risk"]
+
+
+def write_portfolio(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "age", "gender", "location", "income", "lifestyle", "medical_history",
+                         "type", "coverage_amount"])
+        for i in range(rows):
+            writer.writerow([f"Client {i}", rng.randint(18, 85), rng.choice("MF"), "Springfield",
+                             rng.randint(8000, 200000), rng.choice(LIFESTYLES), rng.choice(["true", "false"]),
+                             rng.choice(TYPES), rng.choice([50000, 100000, 250000, 500000])])
+
+
+def stage_totals(metrics) -> dict:
+    totals = {}
+    for (name, labels), (_, total, _) in metrics._histograms.items():
+        if name.endswith("stage_seconds") or name.endswith("db_operation_seconds"):
+            totals[dict(labels).get("stage") or dict(labels).get("op")] = total
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--policy-text", choices=("none", "template"), default="none")
+    parser.add_argument("--baseline-rows", type=int, default=2000, help="Rows run through the per-request path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    os.environ["DB_SQLITE_PATH"] = os.path.join(workdir, "insurance.sqlite3")
+    os.environ["IMPORT_STATE_DIR"] = os.path.join(workdir, "imports")
+    csv_path = os.path.join(workdir, "portfolio.csv")
+
+    start = time.perf_counter()
+    write_portfolio(csv_path, args.rows)
+    print(f"Generated {args.rows:,} rows ({os.path.getsize(csv_path) / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+    from services.registry import services
+    from services.portfolio_import import PortfolioImporter, iter_chunks
+    from utils.metrics import metrics
+    db = services.get("db")
+    risk_engine = services.get("risk_engine")
+    pricing_engine = services.get("pricing_engine")
+
+    importer = PortfolioImporter(chunk_size=args.chunk_size)
+    metrics.reset()
+    state = importer.create(csv_path, policy_text=args.policy_text)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    state = importer.run(state["import_id"])
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    totals = stage_totals(metrics)
+
+    # Per-request path, against the now populated database: scalar risk +
+    # pricing and one bundle write per client
+    sample = next(iter_chunks(csv_path, "csv", args.baseline_rows))
+    sample, _ = importer._coerce(sample)
+    names = list(sample)
+    start = time.perf_counter()
+    for i in range(len(sample["age"])):
+        client = {name: sample[name][i] for name in names}
+        risk = risk_engine.calculate_risk(client).model_dump()
+        pricing = pricing_engine.calculate_pricing(risk["score"], client["coverage_amount"], client["type"]).model_dump()
+        db.save_policy_bundle(client, {"type": client["type"], "coverage_amount": client["coverage_amount"]},
+                              risk, pricing, None)
+    per_request = len(sample["age"]) / (time.perf_counter() - start)
+
+    count = db.repo.select("policies", "id")
+    print(f"\nper-request path: {per_request:>10,.0f} rows/s ({args.baseline_rows:,} rows)")
+    print(f"bulk import:      {state['rows_per_second']:>10,.0f} rows/s ({state['rows_done']:,} rows, "
+          f"{state['elapsed_seconds']:.1f}s, chunk {args.chunk_size:,}, policy text: {args.policy_text})")
+    print(f"speedup:          {state['rows_per_second'] / per_request:>10.1f}x")
+    print(f"peak RSS growth during import: {rss_growth / 1024:.1f} MB; policies in DB: {len(count):,}")
+    print("\nstage totals (s):")
+    for stage, total in sorted(totals.items(), key=lambda item: -item[1]):
+        print(f"  {stage:<22} {total:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
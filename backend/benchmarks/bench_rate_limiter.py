@@ -0,0 +1,123 @@
+"""
+Gemini throughput under a request quota with and without the client-side
+rate limiter. Bulk threads generate policies back to back while a few
+interactive (chatbot) callers ask questions; the fake backend enforces a
+per-model quota over a sliding window and answers 429 past it, which opens
+the model's circuit breaker. Reports successful generations per second,
+mock policies, 429s and interactive latency.
+
+Time is scaled down: a `--window` second quota window stands in for
+Gemini's per-minute quota, and the limiter runs at `--headroom` of it.
+
+Run from the backend directory:
+    python benchmarks/bench_rate_limiter.py --duration 10 --bulk-threads 16
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {"GEMINI_API_KEY": "fake", "LLM_CACHE_ENABLED": "false", "MODEL_HEALTH_PATH": "",
+                   "SINGLEFLIGHT_ENABLED": "false"}.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks.fake_gemini import FakeGeminiBackend
+
+
+def run(ai, app, limiter, args):
+    from services.ai_service import AllModelsFailed
+    from services.model_health import ModelHealthRegistry
+    ai.limiter = limiter
+    ai.health = ModelHealthRegistry(quota_cooldown=args.window)
+    stop = time.monotonic() + args.duration
+    counts = {"ok": 0, "mock": 0}
+    interactive = []
+    lock = threading.Lock()
+
+    def bulk(worker: int):
+        i = 0
+        while time.monotonic() < stop:
+            prompt = f"Generate a policy for bulk client {worker}-{i}"
+            try:
+                ai._generate_with_retry(prompt, use_cache=False, fallback=False)
+                outcome = "ok"
+            except AllModelsFailed:
+                outcome = "mock"
+            with lock:
+                counts[outcome] += 1
+            i += 1
+
+    def chat(worker: int):
+        i = 0
+        with app.test_request_context("/api/chatbot/query"):
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                ai._generate_with_retry(f"Question {worker}-{i} about the policy.\nAnswer:", use_cache=False)
+                with lock:
+                    interactive.append(time.perf_counter() - start)
+                i += 1
+                time.sleep(args.think_ms / 1000)
+
+    threads = [threading.Thread(target=bulk, args=(n,)) for n in range(args.bulk_threads)]
+    threads += [threading.Thread(target=chat, args=(n,)) for n in range(args.interactive_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    interactive.sort()
+    return {
+        "ok_per_s": counts["ok"] / elapsed,
+        "mock": counts["mock"],
+        "chat_p50_ms": statistics.median(interactive) * 1000 if interactive else 0.0,
+        "chat_p95_ms": interactive[int(len(interactive) * 0.95) - 1] * 1000 if interactive else 0.0,
+        "chats": len(interactive)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--bulk-threads", type=int, default=16)
+    parser.add_argument("--interactive-threads", type=int, default=2)
+    parser.add_argument("--think-ms", type=float, default=200.0, help="Pause between one chat user's questions")
+    parser.add_argument("--quota", type=int, default=20, help="Requests per model per window")
+    parser.add_argument("--window", type=float, default=2.0, help="Quota window in seconds (stands in for a minute)")
+    parser.add_argument("--headroom", type=float, default=0.9, help="Limiter rate as a fraction of the quota")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from services.ai_service import AIService
+    from services.rate_limiter import RateLimiter
+
+    app = Flask(__name__)
+    ai = AIService()
+    per_minute = args.quota * args.headroom * 60 / args.window
+    quota_limited = RateLimiter({"*": (per_minute, 0)}, max_wait={"interactive": args.window * 5, "bulk": args.window * 30},
+                                burst_seconds=args.window / 12)
+    modes = {"no limiter": RateLimiter({}, max_wait={"interactive": 0, "bulk": 0}), "limiter": quota_limited}
+
+    print(f"{args.bulk_threads} bulk + {args.interactive_threads} chat threads for {args.duration:.0f}s, "
+          f"quota {args.quota} req/{args.window:.0f}s per model x {len(ai.model_names)} models\n")
+    print(f"{'mode':<12} {'ok/s':>7} {'mock':>6} {'429s':>6} {'chats':>6} {'chat p50 ms':>12} {'chat p95 ms':>12}")
+    for mode, limiter in modes.items():
+        fake = FakeGeminiBackend(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 5,
+                                 quota=args.quota, quota_window_s=args.window)
+        fake.install()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            r = run(ai, app, limiter, args)
+        print(f"{mode:<12} {r['ok_per_s']:>7.1f} {r['mock']:>6} {fake.stats()['rate_limited']:>6} {r['chats']:>6} "
+              f"{r['chat_p50_ms']:>12.1f} {r['chat_p95_ms']:>12.1f}")
+    capacity = args.quota * len(ai.model_names) / args.window
+    print(f"\nquota capacity: {capacity:.1f} req/s across all models")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares scalar RiskEngine.calculate_risk against calculate_risk_batch.
+
+Run from the backend directory:
+    python benchmarks/bench_risk_batch.py --clients 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.risk_engine import RiskEngine
+
+
+def make_clients(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {
+            "age": rng.randint(18, 85),
+            "income": rng.choice([12000, 18000, 35000, 50000, 90000, 150000]),
+            "medical_history": rng.random() < 0.2,
+            "lifestyle": rng.choice(["standard", "active", "high_risk"])
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50000)
+    args = parser.parse_args()
+
+    engine = RiskEngine()
+    clients = make_clients(args.clients)
+
+    start = time.perf_counter()
+    scalar = [engine.calculate_risk(client) for client in clients]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = engine.calculate_risk_batch(clients)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.calculate_risk_batch(clients, include_factors=True)
+    factors_seconds = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for i, result in enumerate(scalar)
+        if result.score != batch["score"][i] or result.score_value != batch["score_value"][i]
+    )
+
+    print(f"clients:                 {args.clients}")
+    print(f"scalar:                  {args.clients / scalar_seconds:,.0f} clients/s")
+    print(f"batch:                   {args.clients / batch_seconds:,.0f} clients/s")
+    print(f"batch + factors:         {args.clients / factors_seconds:,.0f} clients/s")
+    print(f"speedup (batch/scalar):  {scalar_seconds / batch_seconds:.1f}x")
+    print(f"score mismatches:        {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Per-evaluation cost of the compiled risk rule engine with a small (10) and a
+large (500) rule set, compared with interpreting the same rule tables on
+every call.
+
+Run from the backend directory:
+    python benchmarks/bench_risk_rules.py --evaluations 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.risk_engine import RiskEngine
+from services.risk_rules import CompiledRuleSet
+
+FIELDS = ["age", "income", "credit_score", "claims", "dependents", "bmi", "years_driving", "vehicle_age"]
+CATEGORIES = {"lifestyle": ["standard", "active", "high_risk"], "region": ["north", "south", "east", "west"]}
+
+
+def make_rules(count: int, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        if i % 5 == 4:
+            field = rng.choice(list(CATEGORIES))
+            rule = {"field": field, "op": "in", "value": rng.sample(CATEGORIES[field], 2), "default": CATEGORIES[field][0]}
+        else:
+            rule = {"field": rng.choice(FIELDS), "op": rng.choice(["gt", "lt", "ge", "le"]),
+                    "value": rng.randint(0, 100), "default": 50}
+        rule.update({
+            "name": f"Rule {i}",
+            "weight": round(rng.uniform(-0.02, 0.05), 3),
+            "impact": rng.choice(["Low", "Medium", "High"]),
+            "description": f"Synthetic rule {i}."
+        })
+        # Every third rule joins an exclusive group on its field
+        if i % 3 == 0:
+            rule["group"] = f"{rule['field']}-{i % 4}"
+        rules.append(rule)
+    return {"base_score": 0.5, "levels": [{"below": 0.4, "score": "Low"}, {"below": 0.7, "score": "Medium"}, {"score": "High"}], "rules": rules}
+
+
+def make_clients(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    clients = []
+    for _ in range(count):
+        client = {field: rng.randint(0, 100) for field in FIELDS}
+        client.update({field: rng.choice(values) for field, values in CATEGORIES.items()})
+        clients.append(client)
+    return clients
+
+
+INTERPRETED_OPS = {
+    "gt": lambda v, c: v > c, "lt": lambda v, c: v < c, "ge": lambda v, c: v >= c,
+    "le": lambda v, c: v <= c, "in": lambda v, c: v in c
+}
+
+
+def interpret(spec: dict, client: dict) -> float:
+    """Walks the raw rule table on every call, the way an uncompiled engine would."""
+    score = spec["base_score"]
+    matched_groups = set()
+    for rule in spec["rules"]:
+        group = rule.get("group")
+        if group is not None and group in matched_groups:
+            continue
+        value = client.get(rule["field"], rule.get("default"))
+        if INTERPRETED_OPS[rule["op"]](value, rule["value"]):
+            score += rule["weight"]
+            if group is not None:
+                matched_groups.add(group)
+    return score
+
+
+def time_per_call(fn, clients) -> float:
+    start = time.perf_counter()
+    for client in clients:
+        fn(client)
+    return (time.perf_counter() - start) / len(clients) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluations", type=int, default=20000)
+    args = parser.parse_args()
+
+    clients = make_clients(args.evaluations)
+    print(f"{'rules':>6} {'interpreted':>14} {'compiled':>12} {'calculate_risk':>16} {'batch/client':>14} {'compile':>10}")
+    for count in (10, 500):
+        spec = make_rules(count)
+        start = time.perf_counter()
+        rule_set = CompiledRuleSet(spec)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = sum(1 for client in clients[:1000] if abs(interpret(spec, client) - rule_set.evaluate(client)[0]) > 1e-9)
+        if mismatches:
+            print(f"{count} rules: {mismatches} score mismatches against the interpreter")
+            return 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, "w") as f:
+                json.dump(spec, f)
+            engine = RiskEngine(rules_path=path, reload_interval=0)
+            full_us = time_per_call(engine.calculate_risk, clients)
+            start = time.perf_counter()
+            engine.calculate_risk_batch(clients)
+            batch_us = (time.perf_counter() - start) / len(clients) * 1e6
+
+        interpreted_us = time_per_call(lambda client: interpret(spec, client), clients)
+        compiled_us = time_per_call(rule_set.evaluate, clients)
+        print(f"{count:>6} {interpreted_us:>11.2f} us {compiled_us:>9.2f} us {full_us:>13.2f} us {batch_us:>11.2f} us {compile_ms:>7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
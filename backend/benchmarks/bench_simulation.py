@@ -0,0 +1,78 @@
+"""
+Monte Carlo portfolio simulation throughput: a scalar Python loop over
+PricingEngine.calculate_pricing (one policy at a time, as an overnight batch
+job would do it) against the vectorized simulator run inline and across
+the process pool. Reports policy draws per second and checks that a seed
+gives the same summary inline and in the pool.
+
+Run from the backend directory:
+    python benchmarks/bench_simulation.py --scenarios 10000 --portfolio-size 1000 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {"GEMINI_API_KEY": "fake", "RISK_RULES_RELOAD_INTERVAL": "0"}.items():
+    os.environ.setdefault(key, value)
+
+
+def scalar_loop(pricing_engine, draws: int, seed: int) -> float:
+    """Draws/s of the per-policy loop the simulator replaces."""
+    from services.simulation import DEFAULT_CLAIM_PROBABILITY
+    rng = random.Random(seed)
+    tiers = list(pricing_engine.risk_multipliers)
+    types = list(pricing_engine.base_rates)
+    start = time.perf_counter()
+    premium = losses = 0.0
+    for _ in range(draws):
+        tier = rng.choice(tiers)
+        coverage = min(max(rng.lognormvariate(11.5, 0.5), 0.0), 1e7)
+        premium += pricing_engine.calculate_pricing(tier, coverage, rng.choice(types)).yearly_premium
+        if rng.random() < DEFAULT_CLAIM_PROBABILITY[tier]:
+            losses += coverage * rng.betavariate(1.2, 2.8)
+    return draws / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--portfolio-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--scalar-draws", type=int, default=50000, help="Draws timed for the scalar loop")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from services.pricing_engine import PricingEngine
+    from services.simulation import PortfolioSimulator
+    spec = {"scenarios": args.scenarios, "portfolio_size": args.portfolio_size, "seed": args.seed,
+            "base_rate_volatility": 0.05}
+    draws = args.scenarios * args.portfolio_size
+
+    scalar = scalar_loop(PricingEngine(), args.scalar_draws, args.seed)
+    simulator = PortfolioSimulator(workers=args.workers)
+    # Starts the pool so worker spawn time is not counted
+    simulator.simulate(dict(spec, scenarios=max(1, simulator.chunk_draws // args.portfolio_size) * args.workers))
+
+    print(f"{draws:,} policy draws ({args.scenarios:,} scenarios x {args.portfolio_size:,} policies), "
+          f"blocks of {simulator.chunk_draws:,} draws, {args.workers} workers\n")
+    print(f"{'mode':<22} {'seconds':>9} {'draws/s':>14}")
+    print(f"{'scalar loop':<22} {draws / scalar:>9.1f} {scalar:>14,.0f}   (extrapolated from {args.scalar_draws:,} draws)")
+    results = {}
+    for mode, parallel in (("vectorized inline", False), ("vectorized pool", True)):
+        start = time.perf_counter()
+        results[mode] = simulator.simulate(spec, parallel=parallel)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<22} {elapsed:>9.2f} {draws / elapsed:>14,.0f}")
+
+    summary = results["vectorized inline"]["summary"]
+    print(f"\nsame summary inline and in the pool: {summary == results['vectorized pool']['summary']}")
+    print(f"loss ratio p5/p50/p95: {summary['loss_ratio']['p5']:.3f} / {summary['loss_ratio']['p50']:.3f} / "
+          f"{summary['loss_ratio']['p95']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Worker cold-start time and memory with the lazy service registry.
+
+Each scenario runs in a fresh interpreter:
+  lazy     create_app() only; services are built on first request
+  eager    create_app() plus every service built up front (the old import-time behaviour)
+  workers  private memory per forked worker serving the same requests,
+           with and without a --preload style warm master
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py --workers 2
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REQUESTS = [
+    ("/api/risk/analyze", {"client_details": {"age": 64, "medical_history": True}}),
+    ("/api/pricing/calculate", {"risk_score": "High", "coverage_amount": 250000}),
+    ("/api/policies/p1/export", {"format": "pdf", "policy_text": "# Policy\n" + "Coverage line.\n" * 200}),
+]
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def private_mb() -> float:
+    """Memory not shared with the parent (Linux); falls back to peak RSS."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        kb = sum(int(fields[key].split()[0]) for key in ("Private_Clean", "Private_Dirty"))
+        return kb / 1024
+    except (OSError, KeyError):
+        return rss_mb()
+
+
+def serve_requests(app):
+    client = app.test_client()
+    for path, body in REQUESTS:
+        client.post(path, json=body).get_data()
+
+
+def run_child(mode: str, workers: int):
+    start = time.perf_counter()
+    if mode in ("lazy", "eager"):
+        from app import create_app
+        from services.registry import services
+        create_app()
+        if mode == "eager":
+            for name in services.stats()["services"]:
+                services.get(name)
+        print(json.dumps({"seconds": time.perf_counter() - start, "rss_mb": rss_mb()}))
+        return
+
+    preload = mode == "preload"
+    if preload:
+        from app import create_app
+        from services.registry import services
+        app = create_app()
+        services.warm()
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            if not preload:
+                from app import create_app
+                app = create_app()
+            serve_requests(app)
+            os.write(write_fd, json.dumps(private_mb()).encode())
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        results.append(json.loads(os.read(read_fd, 64)))
+        os.close(read_fd)
+    print(json.dumps({"private_mb": sum(results) / len(results)}))
+
+
+def measure(mode: str, workers: int) -> dict:
+    env = dict(os.environ, SUPABASE_URL="", SUPABASE_KEY="", LLM_CACHE_ENABLED="false",
+               MODEL_HEALTH_PATH="", JOB_STORE_PATH=":memory:", EXPORT_WORKERS="0")
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", os.path.abspath(__file__), "--child", mode, "--workers", str(workers)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.workers)
+        return 0
+
+    lazy = measure("lazy", args.workers)
+    eager = measure("eager", args.workers)
+    print(f"cold start (lazy):        {lazy['seconds']:.2f} s, {lazy['rss_mb']:.0f} MB RSS")
+    print(f"cold start (eager):       {eager['seconds']:.2f} s, {eager['rss_mb']:.0f} MB RSS")
+    if hasattr(os, "fork"):
+        standalone = measure("standalone", args.workers)
+        preload = measure("preload", args.workers)
+        print(f"per-worker private (no preload): {standalone['private_mb']:.0f} MB")
+        print(f"per-worker private (preload):    {preload['private_mb']:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
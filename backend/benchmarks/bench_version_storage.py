@@ -0,0 +1,81 @@
+"""
+Measures storage size and reconstruction time for policy version chains
+stored as full text vs. snapshots + compressed deltas.
+
+Run from the backend directory:
+    python benchmarks/bench_version_storage.py --versions 200 --interval 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.version_store import VersionCodec, FULL
+
+
+def make_policy(rng: random.Random, sections: int = 12, lines: int = 15) -> str:
+    words = ["coverage", "premium", "deductible", "insured", "claim", "benefit", "exclusion",
+             "period", "renewal", "rider", "liability", "payment", "schedule", "notice"]
+    parts = ["# Personalized Insurance Policy\n"]
+    for s in range(sections):
+        parts.append(f"\n## Section {s + 1}\n")
+        for _ in range(lines):
+            parts.append("- " + " ".join(rng.choice(words) for _ in range(14)) + ".\n")
+    return "".join(parts)
+
+
+def refine(rng: random.Random, text: str) -> str:
+    # A typical refinement rewrites a handful of lines in one section
+    lines = text.splitlines(keepends=True)
+    for _ in range(rng.randint(1, 4)):
+        i = rng.randrange(1, len(lines))
+        lines[i] = f"- amended clause {rng.randint(0, 10 ** 6)} applies to this coverage.\n"
+    return "".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    codec = VersionCodec(snapshot_interval=args.interval)
+
+    texts = [make_policy(rng)]
+    for _ in range(args.versions - 1):
+        texts.append(refine(rng, texts[-1]))
+
+    rows = []
+    snapshot = None
+    start = time.perf_counter()
+    for number, text in enumerate(texts, start=1):
+        row = codec.encode(text, number, snapshot)
+        rows.append(row)
+        if row["storage_kind"] == FULL:
+            snapshot = {"version_number": number, "policy_text": text}
+    encode_seconds = time.perf_counter() - start
+
+    snapshots = {row["version_number"]: row for row in rows if row["storage_kind"] == FULL}
+    start = time.perf_counter()
+    for row, text in zip(rows, texts):
+        base = snapshots.get(row["base_version"]) if row["base_version"] else None
+        assert codec.decode(row, base) == text
+    decode_seconds = time.perf_counter() - start
+
+    full_size = sum(len(text) for text in texts)
+    stored_size = codec.storage_size(rows)
+    print(f"versions:              {args.versions} (snapshot every {args.interval})")
+    print(f"avg policy size:       {full_size / len(texts):,.0f} chars")
+    print(f"full-text storage:     {full_size:,} chars")
+    print(f"snapshot+delta:        {stored_size:,} chars ({full_size / stored_size:.1f}x smaller)")
+    print(f"encode per version:    {encode_seconds / len(texts) * 1000:.2f} ms")
+    print(f"rebuild per version:   {decode_seconds / len(texts) * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Deterministic stand-in for google.generativeai.GenerativeModel used by the
+benchmarks. Latency, generic errors and 429 quota errors are injected from a
+seeded RNG so runs are repeatable. `ms_per_token` adds decode time
+proportional to the response length, like a real model. `quota` enforces a
+real per-model request quota over a sliding `quota_window_s` window.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator
+
+SECTIONS_PATTERN = re.compile(r"SECTIONS TO UPDATE:\s*---\n(.*?)\n\s*---", re.S)
+
+
+class FakeUsage:
+    def __init__(self, prompt: str, text: str):
+        # Gemini bills roughly four characters per token
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeQuotaError(Exception):
+    pass
+
+
+class FakeGeminiBackend:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 10.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, stream_chunks: int = 8, seed: int = 7, ms_per_token: float = 0.0,
+                 quota: int = 0, quota_window_s: float = 60.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunks = stream_chunks
+        self.ms_per_token = ms_per_token
+        self.quota = quota
+        self.quota_window_s = quota_window_s
+        self._windows = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "errors": 0, "rate_limited": 0}
+
+    def install(self):
+        """Replaces genai.GenerativeModel for the rest of the process."""
+        import google.generativeai as genai
+        backend = self
+
+        class FakeGenerativeModel:
+            def __init__(self, model_name: str, *args, **kwargs):
+                self.model_name = model_name
+
+            def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+                return backend.generate(self.model_name, prompt, stream)
+
+        genai.GenerativeModel = FakeGenerativeModel
+        genai.configure = lambda *args, **kwargs: None
+
+    def _over_quota(self, model_name: str) -> float:
+        """Seconds until the model has quota again, 0 if the call is within quota."""
+        if not self.quota:
+            return 0.0
+        now = time.monotonic()
+        window = self._windows.setdefault(model_name, [])
+        while window and window[0] <= now - self.quota_window_s:
+            window.pop(0)
+        if len(window) >= self.quota:
+            return window[0] + self.quota_window_s - now
+        window.append(now)
+        return 0.0
+
+    def _draw(self, model_name: str):
+        with self._lock:
+            self.counts["calls"] += 1
+            retry_in = self._over_quota(model_name)
+            if retry_in:
+                self.counts["rate_limited"] += 1
+                return retry_in * 1000, "quota"
+            latency = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return latency, "429"
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return latency, "error"
+            return latency, None
+
+    def generate(self, model_name: str, prompt: str, stream: bool = False):
+        latency, failure = self._draw(model_name)
+        if failure == "quota":
+            raise FakeQuotaError(f"429 Resource has been exhausted (e.g. check quota). Please retry in {latency / 1000:.1f}s.")
+        if failure == "429":
+            time.sleep(latency / 4000)
+            raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota). Please retry in 2s.")
+        if failure == "error":
+            time.sleep(latency / 2000)
+            raise RuntimeError("503 The model is overloaded. Please try again later.")
+
+        text = self.respond(prompt)
+        latency += self.ms_per_token * (len(text) // 4)
+        if not stream:
+            time.sleep(latency / 1000)
+            return FakeResponse(text, FakeUsage(prompt, text))
+        return self._stream(prompt, text, latency)
+
+    def _stream(self, prompt: str, text: str, latency: float) -> Iterator[FakeResponse]:
+        size = max(1, len(text) // self.stream_chunks + 1)
+        for start in range(0, len(text), size):
+            time.sleep(latency / 1000 / self.stream_chunks)
+            # Usage is reported on the final chunk, as the real API does
+            last = start + size >= len(text)
+            yield FakeResponse(text[start:start + size], FakeUsage(prompt, text) if last else None)
+
+    def respond(self, prompt: str) -> str:
+        """Plausible output for each prompt the app sends."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        sections = SECTIONS_PATTERN.search(prompt)
+        if sections:
+            # Section refinement: echo the sections back, amended
+            return "\n\n".join(
+                block.strip() + f"\n- Amended per request ({digest})."
+                for block in re.split(r"\n(?=#{1,6} )", sections.group(1).strip())
+            )
+        if "## Personalized Terms" in prompt:
+            return policy_narrative(digest)
+        if prompt.rstrip().endswith("Answer:"):
+            return f"Based on the policy context, the requested coverage applies as described ({digest})."
+        return policy_markdown(digest)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def policy_narrative(digest: str) -> str:
+    coverage = "".join(f"- Personalized coverage item {i}: benefits apply to the insured as assessed.\n" for i in range(6))
+    terms = "".join(f"- Personalized condition {i} for the identified risk factors.\n" for i in range(3))
+    return f"## Detailed Coverage\n{coverage}\n## Personalized Terms\n{terms}({digest})\n"
+
+
+def policy_markdown(digest: str) -> str:
+    sections = ["Policy Overview", "Detailed Coverage", "Terms & Conditions", "Exclusions", "Premium and Payment Schedule"]
+    body = [f"# Personalized Insurance Policy {digest}\n"]
+    for heading in sections:
+        body.append(f"## {heading}\n")
+        body.extend(f"- {heading} clause {i}: standard wording applies to the insured.\n" for i in range(6))
+        body.append("\n")
+    return "".join(body)
@@ -10,3 +10,137 @@ class Config:
     FLASK_ENV = os.getenv("FLASK_ENV", "development")
     PORT = int(os.getenv("PORT", 5000))
     DEBUG = FLASK_ENV == "development"
+
+    # Persistence backend: "supabase" (REST), "postgres" (pooled direct connection),
+    # "sqlite" (embedded, implements supabase_schema.sql) or "none" (no persistence).
+    # "auto" uses Supabase when its credentials are set, then DATABASE_URL, then SQLite.
+    DB_BACKEND = os.getenv("DB_BACKEND", "auto")
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    # Server-side prepare after N executions per connection; "none" disables (PgBouncer transaction mode)
+    DB_PREPARE_THRESHOLD = None if os.getenv("DB_PREPARE_THRESHOLD", "0").lower() == "none" else int(os.getenv("DB_PREPARE_THRESHOLD", 0))
+    DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "cache/insurance.sqlite3")
+    DB_SCHEMA_PATH = os.getenv("DB_SCHEMA_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "supabase_schema.sql"))
+
+    # Policy persistence: "batch" writes each policy bundle in one RPC call,
+    # "write_behind" queues bundles and flushes them from a background worker
+    DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "batch")
+    DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", 1000))
+    DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", 50))
+    DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", 0.05))
+    DB_SPILL_PATH = os.getenv("DB_SPILL_PATH", "spill/policy_bundles.jsonl")
+    # How long a version save waits for its policy's queued bundle to be written first
+    DB_BUNDLE_WAIT_SECONDS = float(os.getenv("DB_BUNDLE_WAIT_SECONDS", 5))
+
+    # LLM response cache: in-process LRU plus a SQLite file shared by all workers
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 86400))
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+
+    # Client-side Gemini rate limits per worker, "model=requests_per_min:tokens_per_min,..." ("*" for any
+    # other model, 0 for no limit); unset means unlimited. Calls from the interactive paths are admitted
+    # ahead of bulk generation; a call that cannot be admitted within its lane's max wait skips the model
+    LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+    LLM_INTERACTIVE_PATHS = tuple(path.strip() for path in os.getenv("LLM_INTERACTIVE_PATHS", "/api/chatbot/,/api/prompts/refine").split(",") if path.strip())
+    LLM_MAX_WAIT_INTERACTIVE = float(os.getenv("LLM_MAX_WAIT_INTERACTIVE", 10))
+    LLM_MAX_WAIT_BULK = float(os.getenv("LLM_MAX_WAIT_BULK", 60))
+    LLM_RATE_LIMIT_BURST_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BURST_SECONDS", 5))
+
+    # Identical concurrent Gemini calls (same prompt and models) share one upstream request.
+    # SINGLEFLIGHT_PATH is a SQLite file that extends this across workers; empty means per worker only
+    SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+    SINGLEFLIGHT_PATH = os.getenv("SINGLEFLIGHT_PATH", "")
+    SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_WAIT_SECONDS", 120))
+
+    # Upper bound on cells (types x tiers x coverage steps) per /api/pricing/grid request
+    PRICING_GRID_MAX_CELLS = int(os.getenv("PRICING_GRID_MAX_CELLS", 1000000))
+
+    # Per-model circuit breakers for Gemini; state is shared across workers via SQLite
+    MODEL_FAILURE_THRESHOLD = int(os.getenv("MODEL_FAILURE_THRESHOLD", 3))
+    MODEL_COOLDOWN_SECONDS = float(os.getenv("MODEL_COOLDOWN_SECONDS", 30))
+    MODEL_MAX_COOLDOWN_SECONDS = float(os.getenv("MODEL_MAX_COOLDOWN_SECONDS", 600))
+    MODEL_QUOTA_COOLDOWN_SECONDS = float(os.getenv("MODEL_QUOTA_COOLDOWN_SECONDS", 60))
+    MODEL_HEALTH_PATH = os.getenv("MODEL_HEALTH_PATH", "cache/model_health.sqlite3")
+
+    # Async policy generation jobs (POST /api/policies/?async=true)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+    JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", 100))
+    JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 3600))
+    JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "cache/jobs.sqlite3")
+    # Unfinished jobs older than this, or whose worker process is gone, are failed when a queue starts
+    JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", 3600))
+
+    # Policy exports: rendered-bytes LRU and ReportLab/docx process pool (0 renders inline)
+    EXPORT_CACHE_ENTRIES = int(os.getenv("EXPORT_CACHE_ENTRIES", 128))
+    EXPORT_CACHE_BYTES = int(os.getenv("EXPORT_CACHE_BYTES", 64 * 1024 * 1024))
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+
+    # Uploaded policy ingestion (/api/files/upload)
+    INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", 25 * 1024 * 1024))
+    INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", 500))
+    INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", 16))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+    # Flask rejects larger request bodies with 413 before reading them (1 MB multipart headroom)
+    MAX_CONTENT_LENGTH = INGEST_MAX_BYTES + 1024 * 1024
+
+    # Chatbot retrieval: only the top-k BM25-ranked policy chunks are sent to Gemini
+    CHATBOT_TOP_K = int(os.getenv("CHATBOT_TOP_K", 4))
+    CHATBOT_CHUNK_CHARS = int(os.getenv("CHATBOT_CHUNK_CHARS", 1200))
+    CHATBOT_INDEX_CACHE_SIZE = int(os.getenv("CHATBOT_INDEX_CACHE_SIZE", 256))
+
+    # Refinement: regenerate only the affected policy sections when possible
+    REFINE_INCREMENTAL = os.getenv("REFINE_INCREMENTAL", "true").lower() == "true"
+    REFINE_MAX_SECTIONS = int(os.getenv("REFINE_MAX_SECTIONS", 2))
+    REFINE_MAX_SECTION_FRACTION = float(os.getenv("REFINE_MAX_SECTION_FRACTION", 0.5))
+
+    # Bulk portfolio imports (/api/policies/imports, scripts/import_portfolio.py): rows per chunk,
+    # resumable checkpoints, uploaded files, and the upload size limit for that endpoint only
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+    IMPORT_STATE_DIR = os.getenv("IMPORT_STATE_DIR", "cache/imports")
+    IMPORT_UPLOAD_DIR = os.getenv("IMPORT_UPLOAD_DIR", "uploads/imports")
+    IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+    # Monte Carlo simulation (/api/pricing/simulate): policy draws per block, which bounds memory,
+    # the per-request caps on draws and on scenarios (per-scenario totals are kept in memory for the
+    # percentiles), and the process pool the blocks are spread over (0 runs them inline)
+    SIMULATION_CHUNK_DRAWS = int(os.getenv("SIMULATION_CHUNK_DRAWS", 500000))
+    SIMULATION_MAX_DRAWS = int(os.getenv("SIMULATION_MAX_DRAWS", 100000000))
+    SIMULATION_MAX_SCENARIOS = int(os.getenv("SIMULATION_MAX_SCENARIOS", 1000000))
+    SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", 2))
+
+    # Policy versions: full snapshot every N versions, compressed deltas in between
+    VERSION_SNAPSHOT_INTERVAL = int(os.getenv("VERSION_SNAPSHOT_INTERVAL", 10))
+    VERSION_HEAD_CACHE_SIZE = int(os.getenv("VERSION_HEAD_CACHE_SIZE", 1024))
+
+    # Read-through cache for the GET policy endpoints; entries are dropped when a version is saved,
+    # other workers see the write after at most the TTL. Size 0 disables it
+    POLICY_READ_CACHE_SIZE = int(os.getenv("POLICY_READ_CACHE_SIZE", 4096))
+    POLICY_READ_CACHE_TTL = float(os.getenv("POLICY_READ_CACHE_TTL", 30))
+
+    # Declarative risk rules (YAML or JSON); the file is re-checked for changes every N seconds, 0 disables
+    RISK_RULES_PATH = os.getenv("RISK_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "risk_rules.yaml"))
+    RISK_RULES_RELOAD_INTERVAL = float(os.getenv("RISK_RULES_RELOAD_INTERVAL", 2))
+
+    # Prompt budgets in estimated tokens, (input, output) per prompt template. Inputs over
+    # budget are truncated where that is safe (client details, outline, chat context), else rejected with 413
+    PROMPT_BUDGETS = {
+        "policy": (int(os.getenv("PROMPT_POLICY_INPUT_TOKENS", 2000)), int(os.getenv("PROMPT_POLICY_OUTPUT_TOKENS", 8192))),
+        "policy_narrative": (int(os.getenv("PROMPT_POLICY_NARRATIVE_INPUT_TOKENS", 1500)), int(os.getenv("PROMPT_POLICY_NARRATIVE_OUTPUT_TOKENS", 4096))),
+        "refine": (int(os.getenv("PROMPT_REFINE_INPUT_TOKENS", 16000)), int(os.getenv("PROMPT_REFINE_OUTPUT_TOKENS", 16384))),
+        "refine_sections": (int(os.getenv("PROMPT_REFINE_SECTIONS_INPUT_TOKENS", 6000)), int(os.getenv("PROMPT_REFINE_SECTIONS_OUTPUT_TOKENS", 8192))),
+        "chatbot": (int(os.getenv("PROMPT_CHATBOT_INPUT_TOKENS", 2500)), int(os.getenv("PROMPT_CHATBOT_OUTPUT_TOKENS", 2048))),
+    }
+
+    # Policy generation: "hybrid" renders overview, terms, exclusions and premiums from versioned
+    # templates and asks the LLM only for the coverage and personalized terms; "llm" writes everything.
+    # Either way, the templates replace the generic mock policy when every model fails.
+    POLICY_GENERATION_MODE = os.getenv("POLICY_GENERATION_MODE", "hybrid")
+    POLICY_TEMPLATES_PATH = os.getenv("POLICY_TEMPLATES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy_templates", "v1.yaml"))
+
+    # Instrumentation: Prometheus text format at /metrics (per worker process).
+    # Trace headers (Server-Timing, X-Request-Id): "off", "on_request" (client sends X-Trace: 1) or "always"
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TRACE_HEADERS = os.getenv("METRICS_TRACE_HEADERS", "on_request")
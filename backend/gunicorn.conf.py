@@ -0,0 +1,12 @@
+# Picked up automatically when gunicorn is started from the backend directory (see Procfile)
+import os
+
+# Load the app once in the master and fork workers from it; services are
+# warmed there and clients that cannot survive a fork are rebuilt per worker
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    if preload_app:
+        from services.registry import services
+        services.warm()
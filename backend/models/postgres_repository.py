@@ -0,0 +1,137 @@
+import os
+import threading
+from typing import Dict, List, Optional
+from models.repository import Repository, split_bundles
+
+
+class PostgresRepository(Repository):
+    """
+    Direct Postgres backend using a psycopg connection pool. Every query
+    shape is generated once with the same SQL text, so psycopg prepares it
+    server-side after `prepare_threshold` executions on a connection (set
+    `None` when running behind a transaction-mode pooler such as PgBouncer).
+    Bulk inserts use pipelined executemany.
+    """
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, prepare_threshold: Optional[int] = 0):
+        import psycopg
+        from psycopg import sql
+        from psycopg.rows import dict_row
+        from psycopg.types.json import Jsonb
+        self._psycopg = psycopg
+        self._sql = sql
+        self._dict_row = dict_row
+        self._jsonb = Jsonb
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.prepare_threshold = prepare_threshold
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # The pool owns sockets and a maintenance thread, so each process builds its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    from psycopg_pool import ConnectionPool
+                    self._pool = ConnectionPool(
+                        self.dsn,
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        kwargs={"prepare_threshold": self.prepare_threshold, "row_factory": self._dict_row},
+                        open=True
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _adapt(self, value):
+        return self._jsonb(value) if isinstance(value, (dict, list)) else value
+
+    def _insert_query(self, table: str, columns, on_conflict: str = "", returning: bool = False):
+        sql = self._sql
+        return sql.SQL("INSERT INTO {} ({}) VALUES ({}){}{}").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(map(sql.Identifier, columns)),
+            sql.SQL(", ").join(sql.Placeholder() * len(columns)),
+            sql.SQL(on_conflict),
+            sql.SQL(" RETURNING *" if returning else "")
+        )
+
+    def _where(self, filters: Dict):
+        sql = self._sql
+        if not filters:
+            return sql.SQL("")
+        return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(
+            sql.SQL("{} = %s").format(sql.Identifier(column)) for column in filters
+        )
+
+    def insert(self, table: str, row: Dict) -> Dict:
+        columns = list(row)
+        with self.pool.connection() as conn:
+            return conn.execute(
+                self._insert_query(table, columns, returning=True),
+                [self._adapt(row[column]) for column in columns]
+            ).fetchone()
+
+    def _insert_rows(self, cur, table: str, rows: List[Dict], on_conflict: str = "") -> None:
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append([self._adapt(value) for value in row.values()])
+        for columns, values in groups.items():
+            cur.executemany(self._insert_query(table, columns, on_conflict), values)
+
+    def insert_many(self, table: str, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            self._insert_rows(cur, table, rows)
+
+    def select(self, table: str, columns: str = "*", filters: Optional[Dict] = None,
+               order: Optional[str] = None, desc: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        sql = self._sql
+        filters = filters or {}
+        if columns.strip() == "*":
+            selected = sql.SQL("*")
+        else:
+            selected = sql.SQL(", ").join(sql.Identifier(column.strip()) for column in columns.split(","))
+        query = sql.SQL("SELECT {} FROM {}").format(selected, sql.Identifier(table)) + self._where(filters)
+        if order:
+            query += sql.SQL(" ORDER BY {}{}").format(sql.Identifier(order), sql.SQL(" DESC" if desc else ""))
+        if limit is not None:
+            query += sql.SQL(" LIMIT {}").format(sql.Literal(int(limit)))
+        with self.pool.connection() as conn:
+            return conn.execute(query, list(filters.values())).fetchall()
+
+    def update(self, table: str, values: Dict, filters: Dict) -> None:
+        sql = self._sql
+        query = sql.SQL("UPDATE {} SET {}").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.SQL("{} = %s").format(sql.Identifier(column)) for column in values)
+        ) + self._where(filters)
+        with self.pool.connection() as conn:
+            conn.execute(query, [self._adapt(value) for value in values.values()] + list(filters.values()))
+
+    def write_bundles(self, bundles: List[Dict]) -> None:
+        users, policies, risks, pricing, versions = split_bundles(bundles)
+        # pool.connection() commits on exit, so the whole batch is one transaction
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT id::text AS id FROM policies WHERE id = ANY(%s::uuid[])",
+                [[policy["id"] for policy in policies]]
+            )
+            existing = {row["id"] for row in cur.fetchall()}
+            # Same replay rule as create_policy_bundles: skip bundles already written
+            new_ids = {policy["id"] for policy in policies if policy["id"] not in existing}
+            self._insert_rows(cur, "users", users, " ON CONFLICT (id) DO NOTHING")
+            self._insert_rows(cur, "policies", [p for p in policies if p["id"] in new_ids], " ON CONFLICT (id) DO NOTHING")
+            for table, rows in (("risk_assessments", risks), ("pricing_details", pricing), ("policy_versions", versions)):
+                self._insert_rows(cur, table, [row for row in rows if row["policy_id"] in new_ids])
+
+    def close(self) -> None:
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.close()
+            self._pool = None
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class PolicyReadCache:
+    """
+    Read-through cache for per-policy reads (policy row, risk, pricing,
+    versions), LRU over policies with a TTL per entry. All entries of a
+    policy are dropped together by `invalidate`, which SupabaseModels calls
+    when it writes a new version. Other worker processes only see that
+    write once their entries expire, so the TTL bounds cross-worker
+    staleness.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_policies: int = 4096, ttl: float = 30.0):
+        self.max_policies = max_policies
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_policies > 0 and self.ttl > 0
+
+    def get(self, policy_id: str, kind: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached `kind` read for the policy or calls `loader`.
+        Loader errors propagate and None results are not cached, so a
+        failed or premature read is retried next time.
+        """
+        if not self.enabled or not policy_id:
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(policy_id, {}).get(kind)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(policy_id)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+            invalidations = self._stats["invalidations"]
+
+        value = loader()
+        with self._lock:
+            # A write during the load may have made the value stale; don't keep it
+            if value is None or self._stats["invalidations"] != invalidations:
+                return value
+            self._data.setdefault(policy_id, {})[kind] = (value, now + self.ttl)
+            self._data.move_to_end(policy_id)
+            while len(self._data) > self.max_policies:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, policy_id: str):
+        with self._lock:
+            self._data.pop(policy_id, None)
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["policies"] = len(self._data)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["ttl_seconds"] = self.ttl
+        stats["max_policies"] = self.max_policies
+        return stats
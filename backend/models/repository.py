@@ -0,0 +1,134 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+USER_COLUMNS = ("id", "age", "gender", "location", "income", "lifestyle_factors")
+
+
+class Repository(ABC):
+    """
+    Storage interface behind SupabaseModels. Filters are column equality
+    matches; `columns` follows the Supabase select syntax ("*" or "a, b").
+    """
+    name = "base"
+
+    @abstractmethod
+    def insert(self, table: str, row: Dict) -> Dict:
+        ...
+
+    @abstractmethod
+    def insert_many(self, table: str, rows: List[Dict]) -> None:
+        ...
+
+    @abstractmethod
+    def select(self, table: str, columns: str = "*", filters: Optional[Dict] = None,
+               order: Optional[str] = None, desc: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def update(self, table: str, values: Dict, filters: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def write_bundles(self, bundles: List[Dict]) -> None:
+        """
+        Writes policy bundles (see SupabaseModels._build_bundle) in one
+        transaction. Bundles whose policy already exists are skipped, so a
+        replayed batch is a no-op.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+def split_bundles(bundles: List[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict], List[Dict], List[Dict]]:
+    """
+    Flattens bundles into per-table rows for bulk inserts, mirroring the
+    column mapping of `create_policy_bundles` in supabase_schema.sql.
+    """
+    users, policies, risks, pricing, versions = [], [], [], [], []
+    for bundle in bundles:
+        user = bundle["user"]
+        row = {column: user.get(column) for column in USER_COLUMNS}
+        if row["lifestyle_factors"] is None:
+            row["lifestyle_factors"] = user.get("lifestyle")
+        users.append(row)
+        policies.append(bundle["policy"])
+        risks.append(bundle["risk_assessment"])
+        pricing.append(bundle["pricing"])
+        if "policy_version" in bundle:
+            versions.append(bundle["policy_version"])
+    return users, policies, risks, pricing, versions
+
+
+class SupabaseRepository(Repository):
+    """
+    Supabase REST backend. Bulk inserts send all rows in one request and
+    bundles go through the `create_policy_bundles` RPC.
+    """
+    name = "supabase"
+
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def insert(self, table: str, row: Dict) -> Dict:
+        response = self.client.table(table).insert(row).execute()
+        return response.data[0] if response.data else row
+
+    def insert_many(self, table: str, rows: List[Dict]) -> None:
+        if rows:
+            self.client.table(table).insert(rows).execute()
+
+    def select(self, table: str, columns: str = "*", filters: Optional[Dict] = None,
+               order: Optional[str] = None, desc: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        query = self.client.table(table).select(columns)
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        if order:
+            query = query.order(order, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data or []
+
+    def update(self, table: str, values: Dict, filters: Dict) -> None:
+        query = self.client.table(table).update(values)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        query.execute()
+
+    def write_bundles(self, bundles: List[Dict]) -> None:
+        self.client.rpc('create_policy_bundles', {"bundles": bundles}).execute()
+
+
+def create_repository(backend: str = None) -> Optional[Repository]:
+    """
+    Builds the backend named by Config.DB_BACKEND. "auto" picks Supabase when
+    its credentials are set, then Postgres when DATABASE_URL is set, and the
+    embedded SQLite database otherwise. "none" returns None (no persistence).
+    """
+    backend = backend or Config.DB_BACKEND
+    if backend == "auto":
+        if Config.SUPABASE_URL and Config.SUPABASE_KEY:
+            backend = "supabase"
+        elif Config.DATABASE_URL:
+            backend = "postgres"
+        else:
+            backend = "sqlite"
+
+    if backend == "supabase":
+        return SupabaseRepository(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+    if backend == "postgres":
+        from models.postgres_repository import PostgresRepository
+        return PostgresRepository(
+            Config.DATABASE_URL,
+            min_size=Config.DB_POOL_MIN_SIZE,
+            max_size=Config.DB_POOL_MAX_SIZE,
+            prepare_threshold=Config.DB_PREPARE_THRESHOLD
+        )
+    if backend == "sqlite":
+        from models.sqlite_repository import SQLiteRepository
+        return SQLiteRepository(Config.DB_SQLITE_PATH, schema_path=Config.DB_SCHEMA_PATH)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown DB_BACKEND: {backend}")
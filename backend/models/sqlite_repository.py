@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+from models.repository import Repository, split_bundles
+
+TABLE_PATTERN = re.compile(r"CREATE TABLE (\w+) \((.*?)\n\);", re.S)
+INDEX_PATTERN = re.compile(r"CREATE (UNIQUE )?INDEX (?:IF NOT EXISTS )?(\w+)\s+ON (\w+)\s*(?:USING \w+\s*)?(\([^;]*?\));", re.S)
+COLUMN_PATTERN = re.compile(r"^\s*(\w+)\s+([A-Z]+)")
+NOT_COLUMNS = {"PRIMARY", "UNIQUE", "CONSTRAINT", "FOREIGN", "CHECK"}
+
+# Postgres -> SQLite type rewrites, applied in order
+TYPE_REWRITES = [
+    (re.compile(r"UUID PRIMARY KEY DEFAULT uuid_generate_v4\(\)"), "TEXT PRIMARY KEY"),
+    (re.compile(r"TIMESTAMP WITH TIME ZONE DEFAULT NOW\(\)"), "TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"),
+    (re.compile(r"\bUUID\b"), "TEXT"),
+    (re.compile(r"\bJSONB\b"), "TEXT"),
+    (re.compile(r"\bDECIMAL\b"), "NUMERIC"),
+    (re.compile(r"\bFLOAT\b"), "REAL"),
+]
+
+
+def translate_schema(schema_sql: str) -> Tuple[List[str], Dict[str, List[str]], Dict[str, set]]:
+    """
+    Turns the tables and indexes of supabase_schema.sql into SQLite DDL.
+    Returns (statements, columns per table, JSONB columns per table). The
+    plpgsql bundle function has no SQLite equivalent and is implemented by
+    `SQLiteRepository.write_bundles` instead.
+    """
+    statements = []
+    columns = {}
+    json_columns = {}
+    for table, body in TABLE_PATTERN.findall(schema_sql):
+        columns[table] = []
+        json_columns[table] = set()
+        for line in body.split("\n"):
+            match = COLUMN_PATTERN.match(line)
+            if match and match.group(1).upper() not in NOT_COLUMNS:
+                columns[table].append(match.group(1))
+                if match.group(2) == "JSONB":
+                    json_columns[table].add(match.group(1))
+        for pattern, replacement in TYPE_REWRITES:
+            body = pattern.sub(replacement, body)
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table} ({body}\n)")
+    for unique, name, table, index_columns in INDEX_PATTERN.findall(schema_sql):
+        statements.append(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} {index_columns}")
+    return statements, columns, json_columns
+
+
+class SQLiteRepository(Repository):
+    """
+    Embedded backend implementing supabase_schema.sql for local and test
+    runs. Uses WAL mode with one connection per thread and process; bulk
+    inserts go through executemany inside a single transaction. A path of
+    ":memory:" gives a private in-memory database shared by all threads.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, schema_path: str):
+        self._local = threading.local()
+        self._sql_cache = {}
+        self._anchor = None
+        if path == ":memory:":
+            self.path = f"file:insurance-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._uri = True
+            # Shared in-memory databases live as long as one connection is open
+            self._anchor = sqlite3.connect(self.path, uri=True, check_same_thread=False)
+        else:
+            self.path = path
+            self._uri = False
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        with open(schema_path, "r", encoding="utf-8") as f:
+            statements, self.columns, self.json_columns = translate_schema(f.read())
+        conn = self._conn()
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, uri=self._uri)
+            if not self._uri:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _check_columns(self, table: str, columns) -> None:
+        known = self.columns.get(table)
+        if known is None:
+            raise ValueError(f"Unknown table: {table}")
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    def _insert_sql(self, table: str, columns: Tuple[str, ...], ignore: bool = False, returning: bool = False) -> str:
+        key = (table, columns, ignore, returning)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            self._check_columns(table, columns)
+            sql = (
+                f"INSERT {'OR IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})"
+                f"{' RETURNING *' if returning else ''}"
+            )
+            self._sql_cache[key] = sql
+        return sql
+
+    def _encode(self, table: str, row: Dict) -> Dict:
+        json_columns = self.json_columns.get(table, ())
+        encoded = {}
+        for column, value in row.items():
+            if column in json_columns and value is not None:
+                value = json.dumps(value)
+            encoded[column] = value
+        if "id" not in encoded and "id" in self.columns.get(table, ()):
+            encoded["id"] = str(uuid.uuid4())
+        return encoded
+
+    def _decode(self, table: str, row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        for column in self.json_columns.get(table, ()):
+            if isinstance(data.get(column), str):
+                data[column] = json.loads(data[column])
+        return data
+
+    def insert(self, table: str, row: Dict) -> Dict:
+        row = self._encode(table, row)
+        columns = tuple(row)
+        conn = self._conn()
+        with conn:
+            stored = conn.execute(self._insert_sql(table, columns, returning=True), tuple(row.values())).fetchone()
+        return self._decode(table, stored)
+
+    def _insert_rows(self, conn: sqlite3.Connection, table: str, rows: List[Dict], ignore: bool = False) -> None:
+        # Rows with the same column set share one executemany call
+        groups = {}
+        for row in rows:
+            row = self._encode(table, row)
+            groups.setdefault(tuple(row), []).append(tuple(row.values()))
+        for columns, values in groups.items():
+            conn.executemany(self._insert_sql(table, columns, ignore=ignore), values)
+
+    def insert_many(self, table: str, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        conn = self._conn()
+        with conn:
+            self._insert_rows(conn, table, rows)
+
+    def select(self, table: str, columns: str = "*", filters: Optional[Dict] = None,
+               order: Optional[str] = None, desc: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        filters = filters or {}
+        selected = [column.strip() for column in columns.split(",")] if columns.strip() != "*" else []
+        self._check_columns(table, selected + list(filters) + ([order] if order else []))
+        sql = f"SELECT {', '.join(selected) or '*'} FROM {table}"
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        if order:
+            sql += f" ORDER BY {order}{' DESC' if desc else ''}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        rows = self._conn().execute(sql, tuple(filters.values())).fetchall()
+        return [self._decode(table, row) for row in rows]
+
+    def update(self, table: str, values: Dict, filters: Dict) -> None:
+        self._check_columns(table, list(values) + list(filters))
+        json_columns = self.json_columns.get(table, ())
+        params = [json.dumps(value) if column in json_columns and value is not None else value
+                  for column, value in values.items()]
+        sql = (
+            f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in values)} "
+            f"WHERE {' AND '.join(f'{column} = ?' for column in filters)}"
+        )
+        conn = self._conn()
+        with conn:
+            conn.execute(sql, params + list(filters.values()))
+
+    def write_bundles(self, bundles: List[Dict]) -> None:
+        users, policies, risks, pricing, versions = split_bundles(bundles)
+        conn = self._conn()
+        with conn:
+            ids = [policy["id"] for policy in policies]
+            existing = set()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM policies WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+                ))
+            # Same replay rule as create_policy_bundles: skip bundles already written
+            new_ids = {policy_id for policy_id in ids if policy_id not in existing}
+            self._insert_rows(conn, "users", users, ignore=True)
+            self._insert_rows(conn, "policies", [p for p in policies if p["id"] in new_ids], ignore=True)
+            for table, rows in (("risk_assessments", risks), ("pricing_details", pricing), ("policy_versions", versions)):
+                self._insert_rows(conn, table, [row for row in rows if row["policy_id"] in new_ids])
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        if self._anchor is not None:
+            self._anchor.close()
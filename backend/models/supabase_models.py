@@ -1,29 +1,51 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
+from collections import OrderedDict
 import os
-from supabase import create_client, Client
+import threading
+import uuid
 from config import Config
+from models.repository import Repository, create_repository
+from models.read_cache import PolicyReadCache
+from models.write_behind import WriteBehindQueue
+from models.version_store import VersionCodec, FULL, DELTA
+from services.policy_index import policy_indexes
+from utils.metrics import metrics
 
 class SupabaseModels:
-    def __init__(self):
-        url = Config.SUPABASE_URL
-        key = Config.SUPABASE_KEY
-        if url and key:
-            self.supabase: Client = create_client(url, key)
-        else:
-            self.supabase = None
-            print("Warning: Supabase credentials not found. DB operations will be bypassed.")
+    def __init__(self, repo: Optional[Repository] = None):
+        # Backend is chosen by Config.DB_BACKEND (Supabase REST, pooled Postgres or embedded SQLite)
+        self.repo = repo if repo is not None else create_repository()
+        if self.repo is None:
+            print("Warning: DB_BACKEND is 'none'. DB operations will be bypassed.")
+
+        self.version_codec = VersionCodec(snapshot_interval=Config.VERSION_SNAPSHOT_INTERVAL)
+        self._version_heads = OrderedDict()
+        self._version_heads_lock = threading.Lock()
+        self.read_cache = PolicyReadCache(max_policies=Config.POLICY_READ_CACHE_SIZE, ttl=Config.POLICY_READ_CACHE_TTL)
+        # Policy id -> Event set once its queued bundle is in the database
+        self._pending_bundles = {}
+        self._pending_bundles_lock = threading.Lock()
 
+        # Background writer; in "batch" mode it only picks up bundles whose inline write failed
+        self.write_queue = WriteBehindQueue(
+            self._write_bundles,
+            max_size=Config.DB_WRITE_QUEUE_SIZE,
+            batch_size=Config.DB_WRITE_BATCH_SIZE,
+            flush_interval=Config.DB_WRITE_FLUSH_INTERVAL,
+            spill_path=Config.DB_SPILL_PATH
+        )
+
+    @metrics.timed("db_operation_seconds", op="create_user")
     def create_user(self, user_data: Dict) -> Dict:
-        if not self.supabase: return {**user_data, "id": "mock-user-id"}
+        if not self.repo: return {**user_data, "id": "mock-user-id"}
         try:
-            response = self.supabase.table('users').insert(user_data).execute()
-            if response.data:
-                return response.data[0]
-            return {**user_data, "id": "mock-user-id"}
+            return self.repo.insert('users', user_data)
         except Exception as e:
+            metrics.inc("db_errors_total", op="create_user")
             print(f"DB Error (create_user): {e}. Falling back to mock data.")
             return {**user_data, "id": "mock-user-id"}
 
+    @metrics.timed("db_operation_seconds", op="create_policy")
     def create_policy(self, user_id: str, insurance_details: Dict) -> Dict:
         policy_data = {
             "user_id": user_id,
@@ -31,19 +53,18 @@ class SupabaseModels:
             "coverage_amount": insurance_details.get('coverage_amount'),
             "status": "active"
         }
-        if not self.supabase: return {**policy_data, "id": "mock-policy-id"}
+        if not self.repo: return {**policy_data, "id": "mock-policy-id"}
         
         try:
-            response = self.supabase.table('policies').insert(policy_data).execute()
-            if response.data:
-                return response.data[0]
-            return {**policy_data, "id": "mock-policy-id"}
+            return self.repo.insert('policies', policy_data)
         except Exception as e:
+            metrics.inc("db_errors_total", op="create_policy")
             print(f"DB Error (create_policy): {e}. Falling back to mock data.")
             return {**policy_data, "id": "mock-policy-id"}
 
+    @metrics.timed("db_operation_seconds", op="save_risk_assessment")
     def save_risk_assessment(self, policy_id: str, risk_data: Dict) -> Dict:
-        if not self.supabase: return risk_data
+        if not self.repo: return risk_data
         try:
             data = {
                 "policy_id": policy_id,
@@ -52,14 +73,16 @@ class SupabaseModels:
                 "factors": risk_data.get('factors'),
                 "explanation": risk_data.get('explanation')
             }
-            self.supabase.table('risk_assessments').insert(data).execute()
+            self.repo.insert('risk_assessments', data)
             return risk_data
         except Exception as e:
+            metrics.inc("db_errors_total", op="save_risk_assessment")
             print(f"DB Error (save_risk_assessment): {e}")
             return risk_data
 
+    @metrics.timed("db_operation_seconds", op="save_pricing")
     def save_pricing(self, policy_id: str, pricing_data: Dict) -> Dict:
-        if not self.supabase: return pricing_data
+        if not self.repo: return pricing_data
         try:
             data = {
                 "policy_id": policy_id,
@@ -68,32 +91,318 @@ class SupabaseModels:
                 "breakdown": pricing_data.get('breakdown'),
                 "explanation": pricing_data.get('explanation')
             }
-            self.supabase.table('pricing_details').insert(data).execute()
+            self.repo.insert('pricing_details', data)
             return pricing_data
         except Exception as e:
+            metrics.inc("db_errors_total", op="save_pricing")
             print(f"DB Error (save_pricing): {e}")
             return pricing_data
 
+    def _version_head(self, policy_id: str) -> Optional[Dict]:
+        """
+        Returns {"version_number", "snapshot"} for the newest stored version of
+        a policy, where snapshot is the full row its delta chain starts from.
+        """
+        with self._version_heads_lock:
+            head = self._version_heads.get(policy_id)
+            if head is not None:
+                return head
+        rows = self.repo.select(
+            'policy_versions', 'version_number, storage_kind, base_version',
+            filters={'policy_id': policy_id}, order='version_number', desc=True, limit=1
+        )
+        if not rows:
+            return None
+        latest = rows[0]
+        snapshot = self._fetch_snapshot(policy_id, latest)
+        head = {"version_number": latest['version_number'], "snapshot": snapshot}
+        self._remember_version_head(policy_id, head)
+        return head
+
+    def _fetch_snapshot(self, policy_id: str, row: Dict) -> Dict:
+        snapshot_version = row['version_number'] if row.get('storage_kind', FULL) == FULL else row['base_version']
+        return self.repo.select(
+            'policy_versions', 'version_number, policy_text',
+            filters={'policy_id': policy_id, 'version_number': snapshot_version}, limit=1
+        )[0]
+
+    def _remember_version_head(self, policy_id: str, head: Dict):
+        with self._version_heads_lock:
+            self._version_heads[policy_id] = head
+            self._version_heads.move_to_end(policy_id)
+            while len(self._version_heads) > Config.VERSION_HEAD_CACHE_SIZE:
+                self._version_heads.popitem(last=False)
+
+    def _forget_version_head(self, policy_id: str):
+        with self._version_heads_lock:
+            self._version_heads.pop(policy_id, None)
+
+    @metrics.timed("db_operation_seconds", op="save_policy_version")
     def save_policy_version(self, policy_id: str, policy_text: str, version_note: str = "Update") -> Dict:
+        """
+        Stores a new policy version as a full snapshot or as a compressed delta
+        against the latest snapshot (see models/version_store.py).
+        """
         data = {
             "policy_id": policy_id, 
             "policy_text": policy_text,
             "version_note": version_note
         }
-        if not self.supabase: return data
+        policy_indexes.register(policy_id, policy_text)
+        if not self.repo: return data
+        self._wait_for_bundle(policy_id)
+        # Another worker may have added a version since our cached head; the
+        # unique (policy_id, version_number) index rejects that, so re-read and retry once
+        for attempt in range(2):
+            try:
+                head = self._version_head(policy_id)
+                version_number = head["version_number"] + 1 if head else 1
+                row = self.version_codec.encode(policy_text, version_number, head["snapshot"] if head else None)
+                self.repo.insert('policy_versions', {
+                    "policy_id": policy_id,
+                    "version_note": version_note,
+                    **row
+                })
+                snapshot = {"version_number": version_number, "policy_text": policy_text} if row["storage_kind"] == FULL else head["snapshot"]
+                self._remember_version_head(policy_id, {"version_number": version_number, "snapshot": snapshot})
+                self.read_cache.invalidate(policy_id)
+                return {**data, "version_number": version_number}
+            except Exception as e:
+                metrics.inc("db_errors_total", op="save_policy_version")
+                print(f"DB Error (save_policy_version): {e}")
+                self._forget_version_head(policy_id)
+        return data
+
+    @metrics.timed("db_operation_seconds", op="get_policy_version")
+    def get_policy_version(self, policy_id: str, version_number: Optional[int] = None) -> Optional[Dict]:
+        """
+        Rebuilds one version (the latest if `version_number` is None): one
+        query for the row plus, for deltas, one for its snapshot. Served from
+        the read cache when possible.
+        """
+        if not self.repo: return None
         try:
-            self.supabase.table('policy_versions').insert(data).execute()
-            return data
+            kind = "latest" if version_number is None else ("version", version_number)
+            return self.read_cache.get(policy_id, kind, lambda: self._load_policy_version(policy_id, version_number))
         except Exception as e:
-            print(f"DB Error (save_policy_version): {e}")
-            return data
+            metrics.inc("db_errors_total", op="get_policy_version")
+            print(f"DB Error (get_policy_version): {e}")
+            return None
+
+    def _load_policy_version(self, policy_id: str, version_number: Optional[int]) -> Optional[Dict]:
+        if version_number is None:
+            rows = self.repo.select('policy_versions', filters={'policy_id': policy_id},
+                                    order='version_number', desc=True, limit=1)
+        else:
+            rows = self.repo.select('policy_versions', filters={'policy_id': policy_id, 'version_number': version_number},
+                                    limit=1)
+        if not rows:
+            return None
+        row = rows[0]
+        snapshot = None
+        if row.get('storage_kind', FULL) == DELTA:
+            snapshot = self._fetch_snapshot(policy_id, row)
+        row['policy_text'] = self.version_codec.decode(row, snapshot)
+        row.pop('delta', None)
+        return row
 
+    def get_latest_policy_version(self, policy_id: str) -> Optional[Dict]:
+        return self.get_policy_version(policy_id)
+
+    @metrics.timed("db_operation_seconds", op="list_policy_versions")
+    def list_policy_versions(self, policy_id: str) -> List[Dict]:
+        """
+        Lists version metadata without loading any policy text or deltas.
+        """
+        if not self.repo: return []
+        try:
+            return self.read_cache.get(policy_id, "versions", lambda: self.repo.select(
+                'policy_versions', 'id, version_number, version_note, storage_kind, text_length, created_at',
+                filters={'policy_id': policy_id}, order='version_number'
+            ))
+        except Exception as e:
+            metrics.inc("db_errors_total", op="list_policy_versions")
+            print(f"DB Error (list_policy_versions): {e}")
+            return []
+
+    def _latest_row(self, table: str, policy_id: str) -> Optional[Dict]:
+        rows = self.repo.select(table, filters={'policy_id': policy_id}, order='created_at', desc=True, limit=1)
+        return rows[0] if rows else None
+
+    @metrics.timed("db_operation_seconds", op="get_policy")
+    def get_policy(self, policy_id: str) -> Optional[Dict]:
+        if not self.repo: return None
+        try:
+            def load():
+                rows = self.repo.select('policies', filters={'id': policy_id}, limit=1)
+                return rows[0] if rows else None
+            return self.read_cache.get(policy_id, "policy", load)
+        except Exception as e:
+            metrics.inc("db_errors_total", op="get_policy")
+            print(f"DB Error (get_policy): {e}")
+            return None
+
+    @metrics.timed("db_operation_seconds", op="get_risk_assessment")
+    def get_risk_assessment(self, policy_id: str) -> Optional[Dict]:
+        """Latest risk assessment of a policy."""
+        if not self.repo: return None
+        try:
+            return self.read_cache.get(policy_id, "risk", lambda: self._latest_row('risk_assessments', policy_id))
+        except Exception as e:
+            metrics.inc("db_errors_total", op="get_risk_assessment")
+            print(f"DB Error (get_risk_assessment): {e}")
+            return None
+
+    @metrics.timed("db_operation_seconds", op="get_pricing")
+    def get_pricing(self, policy_id: str) -> Optional[Dict]:
+        """Latest pricing of a policy."""
+        if not self.repo: return None
+        try:
+            return self.read_cache.get(policy_id, "pricing", lambda: self._latest_row('pricing_details', policy_id))
+        except Exception as e:
+            metrics.inc("db_errors_total", op="get_pricing")
+            print(f"DB Error (get_pricing): {e}")
+            return None
+
+    @metrics.timed("db_operation_seconds", op="log_prompt")
     def log_prompt(self, policy_id: str, prompt_text: str) -> Dict:
         data = {"policy_id": policy_id, "prompt_text": prompt_text}
-        if not self.supabase: return data
+        if not self.repo: return data
         try:
-            self.supabase.table('prompts_log').insert(data).execute()
+            self.repo.insert('prompts_log', data)
             return data
         except Exception as e:
+            metrics.inc("db_errors_total", op="log_prompt")
             print(f"DB Error (log_prompt): {e}")
             return data
+
+    def _build_bundle(self, client_data: Dict, insurance_details: Dict, risk_data: Dict,
+                      pricing_data: Dict, policy_text: Optional[str], version_note: str,
+                      policy_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict:
+        """
+        Builds the rows for one policy with client-generated ids so the policy id
+        is known before anything reaches the database.
+        """
+        user_id = user_id or str(uuid.uuid4())
+        policy_id = policy_id or str(uuid.uuid4())
+        bundle = {
+            "user": {**client_data, "id": user_id},
+            "policy": {
+                "id": policy_id,
+                "user_id": user_id,
+                "type": insurance_details.get('type'),
+                "coverage_amount": insurance_details.get('coverage_amount'),
+                "status": "active"
+            },
+            "risk_assessment": {
+                "policy_id": policy_id,
+                "score": risk_data.get('score'),
+                "score_value": float(risk_data.get('score_value', 0)),
+                "factors": risk_data.get('factors'),
+                "explanation": risk_data.get('explanation')
+            },
+            "pricing": {
+                "policy_id": policy_id,
+                "monthly_premium": pricing_data.get('monthly_premium'),
+                "yearly_premium": pricing_data.get('yearly_premium'),
+                "breakdown": pricing_data.get('breakdown'),
+                "explanation": pricing_data.get('explanation')
+            }
+        }
+        if policy_text is not None:
+            bundle["policy_version"] = {
+                "policy_id": policy_id,
+                "version_note": version_note,
+                **self.version_codec.encode(policy_text, 1, None)
+            }
+        return bundle
+
+    @metrics.timed("db_operation_seconds", op="write_bundles")
+    def _write_bundles(self, bundles: List[Dict]) -> None:
+        """
+        Writes many policy bundles in a single transaction: the
+        `create_policy_bundles` RPC on Supabase, bulk inserts elsewhere.
+        """
+        if not self.repo: return
+        self.repo.write_bundles(bundles)
+        with self._pending_bundles_lock:
+            for bundle in bundles:
+                written = self._pending_bundles.pop(bundle["policy"]["id"], None)
+                if written is not None:
+                    written.set()
+
+    def _queue_bundle(self, bundle: Dict):
+        """Hands a bundle to the write-behind queue; later version saves for it wait for the flush."""
+        with self._pending_bundles_lock:
+            self._pending_bundles.setdefault(bundle["policy"]["id"], threading.Event())
+        self.write_queue.put(bundle)
+
+    def _wait_for_bundle(self, policy_id: str):
+        # A version row references its policy, so it cannot be written before the queued bundle
+        with self._pending_bundles_lock:
+            written = self._pending_bundles.get(policy_id)
+        if written is not None and not written.wait(Config.DB_BUNDLE_WAIT_SECONDS):
+            print(f"Policy {policy_id} is still queued for writing; its version write will likely fail")
+
+    @metrics.timed("db_operation_seconds", op="save_policy_bundle")
+    def save_policy_bundle(self, client_data: Dict, insurance_details: Dict, risk_data: Dict,
+                           pricing_data: Dict, policy_text: Optional[str], version_note: str = "Update") -> Dict:
+        """
+        Persists user, policy, risk assessment, pricing and the first policy version
+        in one round trip, or hands them to the write-behind queue. Pass
+        `policy_text=None` to save the version later with `save_policy_version`.
+        """
+        bundle = self._build_bundle(client_data, insurance_details, risk_data,
+                                    pricing_data, policy_text, version_note)
+        policy = bundle["policy"]
+        if policy_text is not None:
+            policy_indexes.register(policy["id"], policy_text)
+            self._remember_version_head(policy["id"], {
+                "version_number": 1,
+                "snapshot": {"version_number": 1, "policy_text": policy_text}
+            })
+        if not self.repo: return policy
+
+        if Config.DB_WRITE_MODE == "write_behind":
+            self._queue_bundle(bundle)
+            return policy
+
+        try:
+            self._write_bundles([bundle])
+        except Exception as e:
+            metrics.inc("db_errors_total", op="save_policy_bundle")
+            print(f"DB Error (save_policy_bundle): {e}. Queued for background retry.")
+            self._queue_bundle(bundle)
+        return policy
+
+    @metrics.timed("db_operation_seconds", op="save_policy_bundles")
+    def save_policy_bundles(self, records: List[Dict], version_note: str = "Imported") -> List[str]:
+        """
+        Bulk counterpart of save_policy_bundle for imports: every record
+        (client_data, insurance_details, risk_data, pricing_data, optional
+        policy_text and policy_id/user_id) is written in one transaction and
+        errors are raised to the caller. Records with a policy_id that already
+        exists are skipped, so a re-imported chunk is a no-op. Imported
+        policies are not added to the in-process chatbot index or version
+        head cache.
+        """
+        bundles = [
+            self._build_bundle(record["client_data"], record["insurance_details"], record["risk_data"],
+                               record["pricing_data"], record.get("policy_text"), version_note,
+                               policy_id=record.get("policy_id"), user_id=record.get("user_id"))
+            for record in records
+        ]
+        if self.repo:
+            try:
+                self._write_bundles(bundles)
+            except Exception:
+                metrics.inc("db_errors_total", op="save_policy_bundles")
+                raise
+        return [bundle["policy"]["id"] for bundle in bundles]
+
+    def persistence_stats(self) -> Dict:
+        stats = {"mode": Config.DB_WRITE_MODE, "backend": self.repo.name if self.repo else None,
+                 "connected": self.repo is not None}
+        stats.update(self.write_queue.stats())
+        stats["read_cache"] = self.read_cache.stats()
+        return stats
@@ -0,0 +1,83 @@
+import base64
+import difflib
+import json
+import zlib
+from typing import Dict, List, Optional
+
+FULL = "full"
+DELTA = "delta"
+
+
+def make_delta(base_text: str, new_text: str) -> str:
+    """
+    Encodes `new_text` as line-level edits against `base_text`: ["=", i1, i2]
+    copies base lines i1..i2, ["+", lines] inserts new lines. The op list is
+    JSON, zlib-compressed and base64-encoded so it fits a TEXT column.
+    """
+    base_lines = base_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", new_lines[j1:j2]])
+    payload = json.dumps(ops, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(payload, 6)).decode("ascii")
+
+
+def apply_delta(base_text: str, delta: str) -> str:
+    base_lines = base_text.splitlines(keepends=True)
+    ops = json.loads(zlib.decompress(base64.b64decode(delta)))
+    parts = []
+    for op in ops:
+        if op[0] == "=":
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.extend(op[1])
+    return "".join(parts)
+
+
+class VersionCodec:
+    """
+    Decides how each policy version is stored. Every `snapshot_interval`
+    versions a full snapshot is written; versions in between store a
+    compressed delta against the most recent snapshot, so rebuilding any
+    version takes at most one delta application.
+    """
+
+    def __init__(self, snapshot_interval: int = 10):
+        self.snapshot_interval = snapshot_interval
+
+    def encode(self, policy_text: str, version_number: int, snapshot: Optional[Dict]) -> Dict:
+        """
+        `snapshot` is the latest full row ({"version_number", "policy_text"})
+        or None. Returns the storage columns for the new version.
+        """
+        row = {"version_number": version_number, "text_length": len(policy_text)}
+        if snapshot is None or version_number - snapshot["version_number"] >= self.snapshot_interval:
+            row.update({"storage_kind": FULL, "policy_text": policy_text, "base_version": None, "delta": None})
+            return row
+        delta = make_delta(snapshot["policy_text"], policy_text)
+        # A delta that is no smaller than the text itself is pointless
+        if len(delta) >= len(policy_text):
+            row.update({"storage_kind": FULL, "policy_text": policy_text, "base_version": None, "delta": None})
+            return row
+        row.update({
+            "storage_kind": DELTA,
+            "policy_text": None,
+            "base_version": snapshot["version_number"],
+            "delta": delta
+        })
+        return row
+
+    def decode(self, row: Dict, snapshot: Optional[Dict]) -> str:
+        if row.get("storage_kind", FULL) == FULL or row.get("delta") is None:
+            return row["policy_text"]
+        if snapshot is None or snapshot["version_number"] != row["base_version"]:
+            raise ValueError(f"Snapshot {row.get('base_version')} required to rebuild version {row.get('version_number')}")
+        return apply_delta(snapshot["policy_text"], row["delta"])
+
+    def storage_size(self, rows: List[Dict]) -> int:
+        return sum(len(row["policy_text"] or "") + len(row["delta"] or "") for row in rows)
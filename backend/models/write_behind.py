@@ -0,0 +1,213 @@
+import contextlib
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import atexit
+from typing import Callable, Dict, List
+from utils.file_lock import file_lock
+
+
+class WriteBehindQueue:
+    """
+    Bounded write-behind queue drained by a background worker thread.
+
+    Items enqueued by concurrent requests are micro-batched and handed to
+    `flush_fn` as a list. If the flush fails (e.g. the DB is unreachable),
+    the batch is appended to a local JSONL spill file and replayed later.
+    Worker processes share the spill file, so appends and replays also hold
+    an flock on `<spill_path>.lock`.
+    """
+
+    def __init__(self, flush_fn: Callable[[List[Dict]], None], max_size: int = 1000,
+                 batch_size: int = 50, flush_interval: float = 0.05,
+                 spill_path: str = "spill/write_behind.jsonl", replay_interval: float = 30.0):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.replay_interval = replay_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._last_replay = 0.0
+        self._stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "rejected": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so (re)start the worker in each process
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def put(self, item: Dict, timeout: float = 1.0) -> bool:
+        """
+        Enqueues an item. If the queue stays full for `timeout` seconds the item
+        is spilled to disk instead, so a request is never dropped.
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put(item, timeout=timeout)
+            self._count("enqueued")
+            return True
+        except queue.Full:
+            self._count("rejected")
+            self._spill([item])
+            return False
+
+    def _drain_batch(self, first: Dict) -> List[Dict]:
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.replay_interval)
+            except queue.Empty:
+                self.replay_spill()
+                continue
+            if first is None:
+                return
+            batch = self._drain_batch(first)
+            stop = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                self._flush(batch)
+            if time.monotonic() - self._last_replay >= self.replay_interval:
+                self.replay_spill()
+            if stop:
+                return
+
+    def _flush(self, batch: List[Dict]) -> bool:
+        start = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            print(f"Write-behind flush failed ({len(batch)} items): {e}. Spilling to disk.")
+            self._count("failed_batches")
+            self._spill(batch)
+            return False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["flushed"] += len(batch)
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+        return True
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @contextlib.contextmanager
+    def _locked_spill(self):
+        # Thread lock for this process, flock for the other worker processes
+        with self._spill_lock, file_lock(self.spill_path + ".lock"):
+            yield
+
+    def _spill(self, items: List[Dict]):
+        with self._locked_spill():
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self._count("spilled", len(items))
+
+    def replay_spill(self) -> int:
+        """
+        Re-submits spilled items to `flush_fn`. The spill file is only removed
+        once every batch in it has been written successfully.
+        """
+        self._last_replay = time.monotonic()
+        with self._locked_spill():
+            if not os.path.exists(self.spill_path):
+                return 0
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                items = [json.loads(line) for line in f if line.strip()]
+            replayed = 0
+            try:
+                for i in range(0, len(items), self.batch_size):
+                    self.flush_fn(items[i:i + self.batch_size])
+                    replayed += len(items[i:i + self.batch_size])
+            except Exception as e:
+                print(f"Write-behind replay failed: {e}")
+            remaining = items[replayed:]
+            if remaining:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.spill_path) or ".",
+                                                prefix=os.path.basename(self.spill_path) + ".", suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    for item in remaining:
+                        f.write(json.dumps(item, default=str) + "\n")
+                os.replace(tmp_path, self.spill_path)
+            else:
+                os.remove(self.spill_path)
+        self._count("replayed", replayed)
+        return replayed
+
+    def spill_depth(self) -> int:
+        with self._locked_spill():
+            if not os.path.exists(self.spill_path):
+                return 0
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["spill_depth"] = self.spill_depth()
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stops the worker after draining the queue. Anything left is spilled.
+        """
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._worker.join(timeout)
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            self._spill(leftover)
@@ -1,38 +1,57 @@
 from flask import Blueprint, request, jsonify
-from services.ai_service import AIService
+from services.policy_index import policy_indexes
+from services.registry import services
+from services.prompt_compiler import prompt_compiler
+from config import Config
 
 chatbot_bp = Blueprint('chatbot', __name__)
-ai_service = AIService()
+ai_service = services.proxy('ai_service')
+db = services.proxy('db')
+
+def _find_policy_index(policy_id, policy_context):
+    """
+    Resolves the retrieval index for a chat question: explicit context first,
+    then the current version registered for the policy id, then the database.
+    Client-supplied context only gets an ad-hoc index; per-policy indexes
+    are registered from stored versions alone.
+    """
+    if policy_context:
+        return policy_indexes.get_or_build(policy_context)
+    if not policy_id:
+        return None
+    index = policy_indexes.get(policy_id)
+    if index is not None:
+        return index
+    version = db.get_latest_policy_version(policy_id)
+    if version and version.get('policy_text'):
+        policy_indexes.register(policy_id, version['policy_text'])
+        return policy_indexes.get_or_build(version['policy_text'])
+    return None
 
 @chatbot_bp.route('/query', methods=['POST'])
 def chatbot_query():
     """Handle chatbot queries with policy context"""
     data = request.json
     
-    if not data or 'question' not in data or 'policy_context' not in data:
+    if not data or 'question' not in data or not (data.get('policy_context') or data.get('policy_id')):
         return jsonify({'error': 'Missing question or policy context'}), 400
     
     question = data['question']
-    policy_context = data['policy_context']
-    
-    # Create a context-aware prompt
-    prompt = f"""You are an insurance policy assistant. Answer the following question based ONLY on the provided policy context. 
-    
-Policy Context:
-{policy_context}
-
-Question: {question}
-
-Instructions:
-- Only answer based on the policy context provided
-- If the answer is not in the policy, say "This information is not available in the provided policy"
-- Be concise and professional
-- Do not make assumptions or provide general insurance advice
+    index = _find_policy_index(data.get('policy_id'), data.get('policy_context'))
+    if index is None:
+        # Unknown policy id: the client should resend with policy_context
+        return jsonify({
+            'success': False,
+            'error': 'Policy not found',
+            'context_required': True
+        }), 404
 
-Answer:"""
+    # Only the sections relevant to the question are sent to the model, best first
+    policy_context = "\n\n".join(index.top_chunks(question, Config.CHATBOT_TOP_K))
+    prompt = prompt_compiler.compile("chatbot", policy_context=policy_context, question=question)
     
     try:
-        response = ai_service._generate_with_retry(prompt)
+        response = ai_service._generate_with_retry(prompt, use_cache=not data.get('bypass_cache', False))
         return jsonify({
             'success': True,
             'answer': response
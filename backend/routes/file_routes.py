@@ -1,79 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import os
-import PyPDF2
-import docx
+import re
+from utils.ingestion import IngestionError, IngestionLimitError
+from services.policy_index import policy_indexes
+from services.registry import services
+from utils.sse import format_sse, SSE_HEADERS
 
 file_bp = Blueprint('files', __name__)
 
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
 
-# Ensure upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+ingestor = services.proxy('ingestor')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(filepath):
-    """Extract text from PDF file"""
-    try:
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text
-    except Exception as e:
-        print(f"Error extracting PDF: {e}")
-        return None
-
-def extract_text_from_docx(filepath):
-    """Extract text from DOCX file"""
-    try:
-        doc = docx.Document(filepath)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    except Exception as e:
-        print(f"Error extracting DOCX: {e}")
-        return None
-
-@file_bp.route('/upload', methods=['POST'])
-def upload_file():
-    """Handle file upload for existing policies"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'Invalid file type. Only PDF and DOC files are allowed'}), 400
-    
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    
-    # Extract text based on file type
-    file_ext = filename.rsplit('.', 1)[1].lower()
-    
-    if file_ext == 'pdf':
-        policy_text = extract_text_from_pdf(filepath)
-    elif file_ext in ['doc', 'docx']:
-        policy_text = extract_text_from_docx(filepath)
-    else:
-        return jsonify({'error': 'Unsupported file format'}), 400
-    
-    if not policy_text:
-        return jsonify({'error': 'Failed to extract text from file'}), 500
-    
-    # Clean up uploaded file
-    os.remove(filepath)
-    
+def build_upload_response(policy_text):
     # Mock analysis of the uploaded policy for UI consistency
     # In a real app, we would use NLP to extract these values
     risk_assessment = {
@@ -88,7 +31,6 @@ def upload_file():
     }
     
     # Try to extract coverage amount if possible (simple regex)
-    import re
     coverage_match = re.search(r'\$?(\d{1,3}(,\d{3})*(\.\d{2})?)', policy_text)
     if coverage_match:
         try:
@@ -97,11 +39,82 @@ def upload_file():
         except:
             pass
 
-    return jsonify({
+    policy_id = f"UPLOAD-{os.urandom(4).hex()}"
+    # Lets the chatbot answer questions about the upload by id; uploads are not stored, so never expire
+    policy_indexes.register(policy_id, policy_text, expires=False)
+
+    return {
         "success": True,
-        "policy_id": f"UPLOAD-{os.urandom(4).hex()}",
+        "policy_id": policy_id,
         "risk_assessment": risk_assessment,
         "pricing": pricing,
         "policy_text": policy_text,
         "insurance_details": {"type": "Existing Policy"}
-    }), 200
+    }
+
+def stream_pdf_upload(data):
+    """
+    Pushes extracted pages as Server-Sent Events, then the usual upload
+    response once the whole document has been read.
+    """
+    def generate():
+        pages = []
+        try:
+            for page_number, text in ingestor.iter_pdf_pages(data):
+                pages.append(text)
+                yield format_sse({"page": page_number + 1, "text": text}, event="page")
+        except IngestionLimitError as e:
+            # Same 413 the non-streaming upload returns, as an event since the stream has started
+            yield format_sse({"error": str(e), "status": 413}, event="error")
+            return
+        except Exception as e:
+            print(f"Error extracting PDF: {e}")
+            yield format_sse({"error": "Failed to extract text from file"}, event="error")
+            return
+        policy_text = "".join(pages)
+        if not policy_text:
+            yield format_sse({"error": "Failed to extract text from file"}, event="error")
+            return
+        yield format_sse(build_upload_response(policy_text), event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@file_bp.route('/upload', methods=['POST'])
+def upload_file():
+    """Handle file upload for existing policies"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file type. Only PDF and DOC files are allowed'}), 400
+    
+    filename = secure_filename(file.filename)
+    file_ext = filename.rsplit('.', 1)[1].lower()
+
+    # The upload is already in memory (app.InMemoryUploadRequest); nothing touches disk
+    try:
+        data = ingestor.read_upload(file.stream)
+    except IngestionLimitError as e:
+        return jsonify({'error': str(e)}), 413
+
+    if file_ext == 'pdf' and request.args.get('stream') == 'true':
+        return stream_pdf_upload(data)
+
+    # Extract text based on file type
+    try:
+        policy_text = ingestor.extract(data, file_ext)
+    except IngestionLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    except IngestionError as e:
+        print(f"Error extracting {file_ext.upper()}: {e}")
+        return jsonify({'error': 'Failed to extract text from file'}), 500
+    
+    if not policy_text:
+        return jsonify({'error': 'Failed to extract text from file'}), 500
+
+    return jsonify(build_upload_response(policy_text)), 200
@@ -1,16 +1,47 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
+from werkzeug.utils import secure_filename
 import os
-from services.risk_engine import RiskEngine
-from services.pricing_engine import PricingEngine
-from services.ai_service import AIService
-from models.supabase_models import SupabaseModels
+from config import Config
+from services.job_queue import job_queue, QueueFullError
+from services.portfolio_import import PortfolioImportError, detect_format
+from services.registry import services
+from utils.sse import format_sse, SSE_HEADERS
+from utils.serialization import Serialized
 
 policy_bp = Blueprint('policy', __name__)
 
-risk_engine = RiskEngine()
-pricing_engine = PricingEngine()
-ai_service = AIService()
-db = SupabaseModels()
+risk_engine = services.proxy('risk_engine')
+pricing_engine = services.proxy('pricing_engine')
+ai_service = services.proxy('ai_service')
+db = services.proxy('db')
+importer = services.proxy('portfolio_importer')
+
+def _generate_policy_job(job, client_data, insurance_details, risk_data, pricing_data, use_cache):
+    """
+    Background half of create_policy: LLM generation and persistence.
+    """
+    policy_text = ai_service.generate_policy(
+        client_data=client_data,
+        risk_result=risk_data,
+        pricing_result=pricing_data,
+        use_cache=use_cache,
+        insurance_details=insurance_details
+    )
+    # Nothing has been written yet, so a cancellation here leaves no trace
+    job.raise_if_cancelled()
+    policy = db.save_policy_bundle(
+        client_data=client_data,
+        insurance_details=insurance_details,
+        risk_data=risk_data,
+        pricing_data=pricing_data,
+        policy_text=policy_text
+    )
+    return {
+        "policy_id": policy['id'],
+        "risk_assessment": risk_data,
+        "pricing": pricing_data,
+        "policy_text": policy_text
+    }
 
 @policy_bp.route('/', methods=['POST'])
 def create_policy():
@@ -27,42 +58,258 @@ def create_policy():
         coverage_amount=insurance_details.get('coverage_amount', 100000),
         insurance_type=insurance_details.get('type', 'life')
     )
+
+    # Each result is dumped once for the prompt/DB and encoded once for the response
+    risk = Serialized(risk_result)
+    pricing = Serialized(pricing_result)
+
+    # Async mode: hand generation and persistence to the job queue
+    if data.get('async') or request.args.get('async') == 'true':
+        try:
+            job_id = job_queue.submit(
+                'policy_generation', _generate_policy_job,
+                client_data, insurance_details, risk.data, pricing.data,
+                not data.get('bypass_cache', False)
+            )
+        except QueueFullError:
+            return jsonify({'error': 'Too many policy generations in progress. Please retry shortly.'}), 503, {'Retry-After': '5'}
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "risk_assessment": risk,
+            "pricing": pricing
+        }), 202
     
     # 3. AI Policy Generation
     policy_text = ai_service.generate_policy(
         client_data=client_data,
-        risk_result=risk_result.dict(),
-        pricing_result=pricing_result.dict()
+        risk_result=risk.data,
+        pricing_result=pricing.data,
+        use_cache=not data.get('bypass_cache', False),
+        insurance_details=insurance_details
     )
     
-    # 4. Persistence (Mocked or Real Supabase)
-    user = db.create_user(client_data)
-    policy = db.create_policy(user.get('id'), insurance_details)
-    db.save_risk_assessment(policy['id'], risk_result.dict())
-    db.save_pricing(policy['id'], pricing_result.dict())
-    db.save_policy_version(policy['id'], policy_text)
+    # 4. Persistence (Mocked or Real Supabase), one round trip for the whole bundle
+    policy = db.save_policy_bundle(
+        client_data=client_data,
+        insurance_details=insurance_details,
+        risk_data=risk.data,
+        pricing_data=pricing.data,
+        policy_text=policy_text
+    )
     
     return jsonify({
         "policy_id": policy['id'],
-        "risk_assessment": risk_result.dict(),
-        "pricing": pricing_result.dict(),
+        "risk_assessment": risk,
+        "pricing": pricing,
         "policy_text": policy_text
     }), 201
 
-from utils.exporters import Exporter
-from flask import send_file
+@policy_bp.route('/stream', methods=['POST'])
+def create_policy_stream():
+    """
+    Same flow as create_policy, but the policy text is pushed to the client as
+    Server-Sent Events while Gemini generates it.
+    """
+    data = request.json
+    client_data = data.get('client_details', {})
+    insurance_details = data.get('insurance_details', {})
 
-exporter = Exporter()
+    risk_result = risk_engine.calculate_risk(client_data)
+    pricing_result = pricing_engine.calculate_pricing(
+        risk_score=risk_result.score,
+        coverage_amount=insurance_details.get('coverage_amount', 100000),
+        insurance_type=insurance_details.get('type', 'life')
+    )
+    risk = Serialized(risk_result)
+    pricing = Serialized(pricing_result)
+    risk_data = risk.data
+    pricing_data = pricing.data
+
+    # Policy rows are written up front; the version follows once the text is complete
+    policy = db.save_policy_bundle(
+        client_data=client_data,
+        insurance_details=insurance_details,
+        risk_data=risk_data,
+        pricing_data=pricing_data,
+        policy_text=None
+    )
+    chunks = ai_service.stream_policy(
+        client_data=client_data,
+        risk_result=risk_data,
+        pricing_result=pricing_data,
+        use_cache=not data.get('bypass_cache', False),
+        insurance_details=insurance_details
+    )
+
+    def generate():
+        yield format_sse({
+            "policy_id": policy['id'],
+            "risk_assessment": risk,
+            "pricing": pricing
+        }, event="meta")
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield format_sse({"text": chunk}, event="chunk")
+        except Exception as e:
+            print(f"Policy stream error: {e}")
+            yield format_sse({"error": "Policy generation was interrupted"}, event="error")
+            return
+        policy_text = "".join(parts)
+        db.save_policy_version(policy['id'], policy_text)
+        yield format_sse({"policy_id": policy['id'], "policy_text": policy_text}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def _import_job(job, import_id):
+    """
+    Background half of the import endpoints. Cancelling the job pauses the
+    import after the current chunk; it can be resumed from its checkpoint.
+    """
+    state = importer.run(import_id, should_stop=job.cancelled)
+    job.raise_if_cancelled()
+    return state
+
+def _submit_import(state):
+    try:
+        job_id = job_queue.submit('portfolio_import', _import_job, state['import_id'])
+    except QueueFullError:
+        return jsonify({'error': 'Too many background jobs in progress. Please retry shortly.'}), 503, {'Retry-After': '5'}
+    return jsonify({**state, "job_id": job_id}), 202
+
+@policy_bp.route('/imports', methods=['POST'])
+def create_import():
+    """
+    Bulk import of a CSV or Parquet portfolio: a multipart `file` upload, or
+    JSON naming a `file` already in IMPORT_UPLOAD_DIR. Options (form fields or
+    JSON): policy_text ("none", "template" or "llm") and chunk_size.
+    """
+    # Portfolio files are far larger than policy documents
+    request.max_content_length = Config.IMPORT_MAX_BYTES
+    options = request.form if request.files else (request.get_json(silent=True) or {})
+    os.makedirs(Config.IMPORT_UPLOAD_DIR, exist_ok=True)
+    if 'file' in request.files:
+        upload = request.files['file']
+        filename = secure_filename(upload.filename or '')
+        try:
+            detect_format(filename)
+        except PortfolioImportError as e:
+            return jsonify({'error': str(e)}), 400
+        path = os.path.join(Config.IMPORT_UPLOAD_DIR, f"{os.urandom(8).hex()}-{filename}")
+        # Streamed to disk in blocks, never held in memory
+        upload.save(path)
+    elif options.get('file'):
+        path = os.path.join(Config.IMPORT_UPLOAD_DIR, secure_filename(options['file']))
+    else:
+        return jsonify({'error': 'No file provided'}), 400
+
+    try:
+        chunk_size = int(options['chunk_size']) if options.get('chunk_size') else None
+        state = importer.create(path, policy_text=options.get('policy_text', 'none'), chunk_size=chunk_size)
+    except (PortfolioImportError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return _submit_import(state)
+
+@policy_bp.route('/imports/<import_id>', methods=['GET'])
+def get_import(import_id):
+    state = importer.status(secure_filename(import_id))
+    if state is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(state), 200
+
+@policy_bp.route('/imports/<import_id>/resume', methods=['POST'])
+def resume_import(import_id):
+    state = importer.status(secure_filename(import_id))
+    if state is None:
+        return jsonify({'error': 'Import not found'}), 404
+    if state['status'] == 'completed':
+        return jsonify(state), 409
+    return _submit_import(state)
+
+@policy_bp.route('/<policy_id>', methods=['GET'])
+def get_policy(policy_id):
+    """The policy row with its latest version (text included)."""
+    policy = db.get_policy(policy_id)
+    if policy is None:
+        return jsonify({'error': 'Policy not found'}), 404
+    return jsonify({**policy, "latest_version": db.get_latest_policy_version(policy_id)}), 200
+
+@policy_bp.route('/<policy_id>/versions', methods=['GET'])
+def list_policy_versions(policy_id):
+    if db.get_policy(policy_id) is None:
+        return jsonify({'error': 'Policy not found'}), 404
+    return jsonify({"policy_id": policy_id, "versions": db.list_policy_versions(policy_id)}), 200
+
+@policy_bp.route('/<policy_id>/versions/<int:version_number>', methods=['GET'])
+def get_policy_version(policy_id, version_number):
+    version = db.get_policy_version(policy_id, version_number)
+    if version is None:
+        return jsonify({'error': 'Policy version not found'}), 404
+    return jsonify(version), 200
+
+@policy_bp.route('/<policy_id>/risk', methods=['GET'])
+def get_policy_risk(policy_id):
+    risk = db.get_risk_assessment(policy_id)
+    if risk is None:
+        return jsonify({'error': 'Risk assessment not found'}), 404
+    return jsonify(risk), 200
+
+@policy_bp.route('/<policy_id>/pricing', methods=['GET'])
+def get_policy_pricing(policy_id):
+    pricing = db.get_pricing(policy_id)
+    if pricing is None:
+        return jsonify({'error': 'Pricing not found'}), 404
+    return jsonify(pricing), 200
+
+@policy_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_policy_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+@policy_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_policy_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+@policy_bp.route('/jobs/stats', methods=['GET'])
+def policy_job_stats():
+    return jsonify(job_queue.stats()), 200
+
+@policy_bp.route('/persistence/stats', methods=['GET'])
+def persistence_stats():
+    return jsonify(db.persistence_stats()), 200
+
+from utils.exporters import MIME_TYPES
+from io import BytesIO
+
+exporter = services.proxy('exporter')
 
 @policy_bp.route('/<policy_id>/export', methods=['POST'])
 def export_policy(policy_id):
-    data = request.json
+    data = request.json or {}
     format = data.get('format', 'pdf')
     policy_text = data.get('policy_text')
+    if not policy_text:
+        # Clients may leave the text out and export the stored latest version
+        version = db.get_latest_policy_version(policy_id)
+        if version is None:
+            return jsonify({'error': 'Policy not found'}), 404
+        policy_text = version['policy_text']
     
-    if format == 'pdf':
-        filepath = exporter.export_to_pdf(policy_text, f"policy_{policy_id}")
-    else:
-        filepath = exporter.export_to_docx(policy_text, f"policy_{policy_id}")
+    if format != 'pdf':
+        format = 'docx'
+    data = exporter.export(policy_text, format)
     
-    return send_file(os.path.abspath(filepath), as_attachment=True)
+    # Rendered in memory and streamed straight back; nothing is written to disk
+    return send_file(
+        BytesIO(data),
+        mimetype=MIME_TYPES[format],
+        as_attachment=True,
+        download_name=f"policy_{policy_id}.{format}"
+    )
@@ -1,8 +1,20 @@
-from flask import Blueprint, request, jsonify
-from services.pricing_engine import PricingEngine
+from flask import Blueprint, request, jsonify, send_file
+from io import BytesIO
+import math
+import numpy as np
+from services.registry import services
+from services.simulation import SimulationError
+from config import Config
 
 pricing_bp = Blueprint('pricing', __name__)
-pricing_engine = PricingEngine()
+pricing_engine = services.proxy('pricing_engine')
+simulator = services.proxy('simulator')
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
 
 @pricing_bp.route('/calculate', methods=['POST'])
 def calculate_pricing():
@@ -12,4 +24,85 @@ def calculate_pricing():
     insurance_type = data.get('insurance_type', 'life')
     
     result = pricing_engine.calculate_pricing(risk_score, coverage_amount, insurance_type)
-    return jsonify(result.dict()), 200
+    return jsonify(result), 200
+
+@pricing_bp.route('/grid', methods=['POST'])
+def calculate_grid():
+    """
+    Prices a full quote grid (insurance types x risk tiers x coverage amounts).
+    Coverage is either an explicit `coverage_amounts` list or a
+    `coverage_min`/`coverage_max`/`coverage_step` range. `format: "npz"`
+    returns a NumPy archive instead of JSON.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    coverage_amounts = data.get('coverage_amounts')
+    risk_scores = data.get('risk_scores') or pricing_engine.risk_tiers
+    insurance_types = data.get('insurance_types') or pricing_engine.insurance_types
+    if not _is_string_list(risk_scores) or not _is_string_list(insurance_types):
+        return jsonify({'error': 'risk_scores and insurance_types must be lists of strings'}), 400
+
+    if coverage_amounts is None:
+        coverage_min = data.get('coverage_min', 50000)
+        coverage_max = data.get('coverage_max', 2000000)
+        coverage_step = data.get('coverage_step', 50000)
+        if not all(_is_number(value) for value in (coverage_min, coverage_max, coverage_step)):
+            return jsonify({'error': 'coverage_min, coverage_max and coverage_step must be numbers'}), 400
+        if coverage_step <= 0 or coverage_max < coverage_min:
+            return jsonify({'error': 'Invalid coverage range'}), 400
+        coverage_count = int((coverage_max - coverage_min) // coverage_step) + 1
+    elif isinstance(coverage_amounts, list) and all(_is_number(value) for value in coverage_amounts):
+        coverage_count = len(coverage_amounts)
+    else:
+        return jsonify({'error': 'coverage_amounts must be a list of numbers'}), 400
+
+    # Check the size before allocating anything
+    cells = coverage_count * len(risk_scores) * len(insurance_types)
+    if cells > Config.PRICING_GRID_MAX_CELLS:
+        return jsonify({'error': f'Grid too large ({cells} cells, max {Config.PRICING_GRID_MAX_CELLS})'}), 400
+    if coverage_amounts is None:
+        coverage_amounts = coverage_min + coverage_step * np.arange(coverage_count)
+
+    grid = pricing_engine.calculate_grid(coverage_amounts, risk_scores, insurance_types)
+
+    if data.get('format') == 'npz':
+        buffer = BytesIO()
+        np.savez(
+            buffer,
+            insurance_types=np.array(grid["insurance_types"]),
+            risk_scores=np.array(grid["risk_scores"]),
+            coverage_amounts=grid["coverage_amounts"],
+            monthly_premium=grid["monthly_premium"],
+            yearly_premium=grid["yearly_premium"]
+        )
+        buffer.seek(0)
+        return send_file(buffer, mimetype='application/octet-stream', as_attachment=True, download_name='pricing_grid.npz')
+
+    # NumPy arrays are encoded directly by the JSON provider, without .tolist() copies
+    return jsonify({
+        "insurance_types": grid["insurance_types"],
+        "risk_scores": grid["risk_scores"],
+        "coverage_amounts": grid["coverage_amounts"],
+        "shape": list(grid["monthly_premium"].shape),
+        "monthly_premium": grid["monthly_premium"],
+        "yearly_premium": grid["yearly_premium"]
+    }), 200
+
+@pricing_bp.route('/simulate', methods=['POST'])
+def simulate():
+    """
+    Monte Carlo premium and portfolio loss simulation. The body sets
+    scenarios, portfolio_size, seed, tier_mix or score_distribution,
+    type_mix, coverage, base_rates, base_rate_volatility, claim_probability,
+    frequency_volatility, severity, percentiles and `parallel`; see
+    services/simulation.py. Returns percentile summaries across scenarios.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    try:
+        result = simulator.simulate(data, parallel=data.get('parallel'))
+    except (SimulationError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
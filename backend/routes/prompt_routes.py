@@ -1,21 +1,34 @@
-from flask import Blueprint, request, jsonify
-from services.ai_service import AIService
-from models.supabase_models import SupabaseModels
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from services.registry import services
+from services.prompt_compiler import prompt_compiler
+from utils.sse import format_sse, SSE_HEADERS
 
 prompt_bp = Blueprint('prompt', __name__)
 
-ai_service = AIService()
-db = SupabaseModels()
+ai_service = services.proxy('ai_service')
+db = services.proxy('db')
+
+def _current_text(data):
+    """The text to refine: `current_text` from the client, else the stored latest version."""
+    if data.get('current_text'):
+        return data['current_text']
+    version = db.get_latest_policy_version(data.get('policy_id'))
+    return version['policy_text'] if version else None
 
 @prompt_bp.route('/refine', methods=['POST'])
 def refine_policy():
     data = request.json
     policy_id = data.get('policy_id')
     refinement_prompt = data.get('prompt')
-    current_policy_text = data.get('current_text') # In real app, fetch from DB
+    current_policy_text = _current_text(data)
+    if current_policy_text is None:
+        return jsonify({'error': 'Policy not found; send current_text'}), 404
     
     # 1. AI Refinement
-    updated_policy_text = ai_service.refine_policy(current_policy_text, refinement_prompt)
+    updated_policy_text = ai_service.refine_policy(
+        current_policy_text, refinement_prompt,
+        use_cache=not data.get('bypass_cache', False)
+    )
     
     # 2. Persistence
     db.log_prompt(policy_id, refinement_prompt)
@@ -25,3 +38,54 @@ def refine_policy():
         "policy_id": policy_id,
         "updated_policy_text": updated_policy_text
     }), 200
+
+@prompt_bp.route('/refine/stream', methods=['POST'])
+def refine_policy_stream():
+    """
+    Streams the refined policy as Server-Sent Events and saves the new version
+    once the full text has been received.
+    """
+    data = request.json
+    policy_id = data.get('policy_id')
+    refinement_prompt = data.get('prompt')
+    current_policy_text = _current_text(data)
+    if current_policy_text is None:
+        return jsonify({'error': 'Policy not found; send current_text'}), 404
+
+    db.log_prompt(policy_id, refinement_prompt)
+    chunks = ai_service.stream_refinement(
+        current_policy_text, refinement_prompt,
+        use_cache=not data.get('bypass_cache', False)
+    )
+
+    def generate():
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield format_sse({"text": chunk}, event="chunk")
+        except Exception as e:
+            print(f"Refinement stream error: {e}")
+            yield format_sse({"error": "Policy refinement was interrupted"}, event="error")
+            return
+        updated_policy_text = "".join(parts)
+        db.save_policy_version(policy_id, updated_policy_text, version_note=f"Refinement: {refinement_prompt[:30]}...")
+        yield format_sse({"policy_id": policy_id, "updated_policy_text": updated_policy_text}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@prompt_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(ai_service.cache.stats()), 200
+
+@prompt_bp.route('/coalescing/stats', methods=['GET'])
+def coalescing_stats():
+    return jsonify(ai_service.singleflight.stats()), 200
+
+@prompt_bp.route('/rate-limits/stats', methods=['GET'])
+def rate_limit_stats():
+    return jsonify(ai_service.limiter.stats()), 200
+
+@prompt_bp.route('/budget/stats', methods=['GET'])
+def budget_stats():
+    return jsonify(prompt_compiler.stats()), 200
@@ -1,12 +1,50 @@
 from flask import Blueprint, request, jsonify
-from services.risk_engine import RiskEngine
+from services.registry import services
 
 risk_bp = Blueprint('risk', __name__)
-risk_engine = RiskEngine()
+risk_engine = services.proxy('risk_engine')
 
 @risk_bp.route('/analyze', methods=['POST'])
 def analyze_risk():
     data = request.json
     client_data = data.get('client_details', {})
     result = risk_engine.calculate_risk(client_data)
-    return jsonify(result.dict()), 200
+    return jsonify(result), 200
+
+@risk_bp.route('/analyze/batch', methods=['POST'])
+def analyze_risk_batch():
+    """
+    Scores a whole book of clients. Accepts either `clients` (list of records)
+    or `columns` (dict of equal-length arrays) and returns columnar results.
+    """
+    data = request.json
+    clients = data.get('columns') or data.get('clients', [])
+    include_factors = data.get('include_factors', False)
+    result = risk_engine.calculate_risk_batch(clients, include_factors=include_factors)
+
+    response = {
+        "count": result["count"],
+        "score": result["score"].tolist(),
+        # Float arrays and factor models are encoded directly by the JSON provider
+        "score_value": result["score_value"]
+    }
+    if include_factors:
+        response["factors"] = result["factors"]
+        response["explanation"] = result["explanation"]
+    return jsonify(response), 200
+
+@risk_bp.route('/rules', methods=['GET'])
+def risk_rules_status():
+    return jsonify(risk_engine.rules.status()), 200
+
+@risk_bp.route('/rules/reload', methods=['POST'])
+def reload_risk_rules():
+    """
+    Recompiles the risk rule file now instead of waiting for the next
+    hot-reload check. Invalid rules are rejected and the old set stays active.
+    """
+    try:
+        risk_engine.rules.reload(force=True)
+    except Exception as e:
+        return jsonify({"error": f"Invalid risk rules: {e}", **risk_engine.rules.status()}), 400
+    return jsonify(risk_engine.rules.status()), 200
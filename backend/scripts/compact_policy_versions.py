@@ -0,0 +1,63 @@
+"""
+Rewrites existing full policy_versions rows into snapshot + delta storage.
+Run once after migrations/001_policy_versions_delta.sql, from the backend directory:
+    python scripts/compact_policy_versions.py [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.supabase_models import SupabaseModels
+from models.version_store import FULL
+
+
+def compact_policy(db: SupabaseModels, policy_id: str, dry_run: bool) -> tuple:
+    rows = db.repo.select(
+        'policy_versions', 'id, version_number, storage_kind, policy_text',
+        filters={'policy_id': policy_id}, order='version_number'
+    )
+    before = after = 0
+    snapshot = None
+    for row in rows:
+        if row['storage_kind'] != FULL:
+            return 0, 0
+        text = row['policy_text'] or ""
+        encoded = db.version_codec.encode(text, row['version_number'], snapshot)
+        before += len(text)
+        after += len(encoded['policy_text'] or "") + len(encoded['delta'] or "")
+        if encoded['storage_kind'] == FULL:
+            snapshot = {"version_number": row['version_number'], "policy_text": text}
+        elif not dry_run:
+            db.repo.update('policy_versions', {
+                "storage_kind": encoded['storage_kind'],
+                "base_version": encoded['base_version'],
+                "delta": encoded['delta'],
+                "policy_text": None
+            }, filters={'id': row['id']})
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report savings without writing")
+    args = parser.parse_args()
+
+    db = SupabaseModels()
+    if not db.repo:
+        print("A database backend is required (see DB_BACKEND)")
+        return 1
+
+    policy_ids = {row['id'] for row in db.repo.select('policies', 'id')}
+    total_before = total_after = 0
+    for policy_id in sorted(policy_ids):
+        before, after = compact_policy(db, policy_id, args.dry_run)
+        total_before += before
+        total_after += after
+    print(f"Policies: {len(policy_ids)}, text bytes before: {total_before}, after: {total_after}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
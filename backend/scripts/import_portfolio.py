@@ -0,0 +1,66 @@
+"""
+Bulk-imports a CSV or Parquet portfolio (one client per row: age, income,
+lifestyle, medical_history, ..., type, coverage_amount) through risk
+scoring, pricing and persistence, with a checkpoint after every chunk.
+Run from the backend directory:
+    python scripts/import_portfolio.py book.csv [--policy-text template] [--chunk-size 5000]
+    python scripts/import_portfolio.py --resume <import_id>
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.portfolio_import import PortfolioImporter, PortfolioImportError, POLICY_TEXT_MODES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="CSV or Parquet file to import")
+    parser.add_argument("--resume", metavar="IMPORT_ID", help="Continue an interrupted import from its checkpoint")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="Defaults to the file extension")
+    parser.add_argument("--policy-text", choices=POLICY_TEXT_MODES, default="none",
+                        help="none: no policy document; template: render from policy templates; llm: Gemini per row")
+    parser.add_argument("--chunk-size", type=int, help="Rows per chunk and DB transaction")
+    args = parser.parse_args()
+    if not args.path and not args.resume:
+        parser.error("a file path or --resume is required")
+
+    importer = PortfolioImporter()
+    try:
+        if args.resume:
+            import_id = args.resume
+        else:
+            state = importer.create(args.path, file_format=args.format, policy_text=args.policy_text,
+                                    chunk_size=args.chunk_size)
+            import_id = state["import_id"]
+            print(f"Import {import_id}: {state['path']} ({state['file_size'] / 1e6:.1f} MB)")
+            print(f"Resume with: python scripts/import_portfolio.py --resume {import_id}")
+
+        last = [0.0]
+
+        def progress(state):
+            now = time.monotonic()
+            if now - last[0] >= 1.0:
+                last[0] = now
+                print(f"  {state['rows_done']:>10,} rows  {state['rows_per_second']:>9,.0f} rows/s  "
+                      f"{state['elapsed_seconds']:>7.1f}s", flush=True)
+
+        state = importer.run(import_id, progress=progress)
+    except PortfolioImportError as e:
+        print(f"Import failed: {e}")
+        return 1
+    except KeyboardInterrupt:
+        state = importer.status(import_id)
+        print(f"\nInterrupted after {state['rows_done']:,} rows; resume with --resume {import_id}")
+        return 130
+
+    print(f"Imported {state['rows_done']:,} rows in {state['elapsed_seconds']:.1f}s "
+          f"({state['rows_per_second']:,.0f} rows/s), {state['invalid_values']} unparseable values")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
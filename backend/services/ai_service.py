@@ -1,8 +1,20 @@
-import google.generativeai as genai
-from typing import Dict
-import json
 import time
+import google.generativeai as genai
+from typing import Dict, Iterator, Optional
 from config import Config
+from services.response_cache import response_cache, make_cache_key
+from services.model_health import model_health, is_quota_error, parse_retry_after
+from services.rate_limiter import rate_limiter, current_lane
+from services.singleflight import singleflight
+from services import policy_sections
+from services.prompt_compiler import prompt_compiler
+from services.policy_templates import PolicyTemplates
+from utils.metrics import metrics, record_llm_usage
+from utils.tokens import count_tokens
+
+class AllModelsFailed(Exception):
+    """Every model was skipped or failed before producing any output."""
+    pass
 
 class AIService:
     def __init__(self):
@@ -11,49 +23,189 @@ class AIService:
         self.model_names = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-flash-latest']
         self.current_model_index = 0
         self.model = genai.GenerativeModel(self.model_names[0])
+        self.cache = response_cache
+        self.health = model_health
+        self.singleflight = singleflight
+        self.limiter = rate_limiter
+        self.prompts = prompt_compiler
+        # Deterministic policy sections, also the degraded mode when every model fails
+        self.templates = PolicyTemplates(Config.POLICY_TEMPLATES_PATH)
     
-    def _generate_with_retry(self, prompt: str, max_retries: int = 3) -> str:
+    @metrics.timed("stage_seconds", stage="llm")
+    def _generate_with_retry(self, prompt: str, max_retries: int = 3, use_cache: bool = True,
+                             fallback: bool = True) -> str:
         """
         Attempts to generate content with retry logic and model fallback.
+        Models whose circuit breaker is open are skipped without a call, and
+        failures are retried immediately instead of sleeping in the worker.
+        Responses are served from / stored in the shared response cache unless
+        `use_cache` is False. Identical concurrent calls share one upstream
+        request and its result or error. When every model fails the mock
+        policy is returned, or AllModelsFailed raised if `fallback` is False.
         """
-        last_error = None
-        
+        if use_cache:
+            cached = self.cache.get_first(self.model_names, prompt)
+            if cached is not None:
+                print("Serving generation from response cache")
+                metrics.inc("llm_generations_total", source="cache")
+                return cached
+        else:
+            self.cache.record_bypass()
+
+        key = make_cache_key("\0".join(self.model_names) + f"\0{max_retries}\0{use_cache}", prompt)
+        try:
+            # Waiters in other workers get AllModelsFailed too, so they fall back like the leader
+            return self.singleflight.do(key, lambda: self._call_models(prompt, max_retries, use_cache),
+                                        shared_errors=(AllModelsFailed,))
+        except AllModelsFailed:
+            if not fallback:
+                raise
+            return self._mock_fallback(prompt, "Returning mock policy.")
+
+    def _mock_fallback(self, prompt: str, message: str) -> str:
+        print(f"All models failed. {message}")
+        metrics.inc("llm_generations_total", source="mock")
+        metrics.inc("llm_mock_policies_total")
+        return self._generate_mock_policy(prompt)
+
+    def _admit(self, model_name: str, prompt: str, lane: str, wait: bool = True) -> bool:
+        """Takes client-side rate limit capacity for one call; False means skip this model."""
+        return self.limiter.acquire(model_name, getattr(prompt, "input_tokens", None) or count_tokens(prompt), lane, wait=wait)
+
+    def _admitted_models(self, prompt: str, lane: str) -> Iterator[str]:
+        """
+        Yields the models to try, in order, skipping open circuits. A model
+        at its client-side rate limit is passed over for the next one; only
+        when none has capacity does the call queue, for the first of them.
+        """
+        waiting_for = None
         for model_name in self.model_names:
+            if not self.health.available(model_name):
+                print(f"Skipping {model_name}: circuit open")
+                continue
+            if self._admit(model_name, prompt, lane, wait=False):
+                yield model_name
+            elif waiting_for is None:
+                waiting_for = model_name
+        if waiting_for is not None and self._admit(waiting_for, prompt, lane):
+            yield waiting_for
+
+    def _settle(self, model_name: str, text: str, response=None, error: Optional[Exception] = None):
+        """Charges the output tokens of a call, or backs off after a 429 that got through anyway."""
+        if error is not None:
+            if is_quota_error(error):
+                self.limiter.pause(model_name, parse_retry_after(error) or Config.MODEL_QUOTA_COOLDOWN_SECONDS)
+            return
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "candidates_token_count", None)
+        self.limiter.settle(model_name, tokens if tokens is not None else count_tokens(text))
+
+    def _call_models(self, prompt: str, max_retries: int, use_cache: bool) -> str:
+        lane = current_lane()
+        for model_name in self._admitted_models(prompt, lane):
             try:
                 model = genai.GenerativeModel(model_name)
                 print(f"Attempting generation with model: {model_name}")
                 
                 for attempt in range(max_retries):
+                    if attempt and not self._admit(model_name, prompt, lane):
+                        break
+                    start = time.perf_counter()
                     try:
-                        response = model.generate_content(prompt)
+                        response = model.generate_content(prompt, **self.prompts.generation_config(prompt))
+                        text = response.text
+                        metrics.observe("llm_attempt_seconds", time.perf_counter() - start, model=model_name, outcome="ok")
                         print(f"Successfully generated content with {model_name}")
-                        return response.text
+                        self.health.record_success(model_name)
+                        self._settle(model_name, text, response)
+                        metrics.inc("llm_generations_total", source=model_name)
+                        record_llm_usage(model_name, prompt, text, response)
+                        self.prompts.record_usage(prompt, response)
+                        if use_cache:
+                            self.cache.set(model_name, prompt, text)
+                        return text
                     except Exception as e:
-                        error_str = str(e)
-                        print(f"Attempt {attempt + 1} failed with {model_name}: {error_str}")
+                        metrics.observe("llm_attempt_seconds", time.perf_counter() - start, model=model_name, outcome="error")
+                        print(f"Attempt {attempt + 1} failed with {model_name}: {e}")
+                        self._settle(model_name, "", error=e)
                         
-                        # If it's a quota error, try next model immediately
-                        if "quota" in error_str.lower() or "429" in error_str:
-                            print(f"Quota exceeded for {model_name}, trying next model...")
+                        # Quota errors and repeated failures open the breaker; move to the next model
+                        if not self.health.record_failure(model_name, e):
+                            print(f"{model_name} unavailable, trying next model...")
                             break
-                        
-                        # For other errors, retry with exponential backoff
-                        if attempt < max_retries - 1:
-                            wait_time = 2 ** attempt
-                            print(f"Retrying in {wait_time} seconds...")
-                            time.sleep(wait_time)
-                        
-                        last_error = e
+                metrics.inc("llm_fallbacks_total", model=model_name)
                         
             except Exception as e:
                 print(f"Error initializing model {model_name}: {e}")
-                last_error = e
+                self.health.record_failure(model_name, e)
+                metrics.inc("llm_fallbacks_total", model=model_name)
                 continue
         
-        # If all models fail, return a detailed mock policy
-        print("All models failed. Returning mock policy.")
-        return self._generate_mock_policy(prompt)
+        # The caller decides between the mock policy and its own fallback
+        raise AllModelsFailed("All models failed")
     
+    def _stream_with_retry(self, prompt: str, use_cache: bool = True, fallback: bool = True) -> Iterator[str]:
+        """
+        Streaming counterpart of `_generate_with_retry`. Falls back to the next
+        model only while nothing has been sent yet; once chunks have been
+        yielded a failure is raised to the caller. If no model produced
+        anything, streams the mock policy or, with `fallback` False, raises
+        AllModelsFailed.
+        """
+        if use_cache:
+            cached = self.cache.get_first(self.model_names, prompt)
+            if cached is not None:
+                print("Serving streamed generation from response cache")
+                metrics.inc("llm_generations_total", source="cache")
+                yield cached
+                return
+        else:
+            self.cache.record_bypass()
+
+        for model_name in self._admitted_models(prompt, current_lane()):
+            parts = []
+            chunk = None
+            # Measures generation time only, not the time the client takes to read the chunks
+            busy = 0.0
+            try:
+                model = genai.GenerativeModel(model_name)
+                print(f"Attempting streamed generation with model: {model_name}")
+                start = time.perf_counter()
+                for chunk in model.generate_content(prompt, stream=True, **self.prompts.generation_config(prompt)):
+                    text = chunk.text
+                    busy += time.perf_counter() - start
+                    if text:
+                        parts.append(text)
+                        yield text
+                    start = time.perf_counter()
+                busy += time.perf_counter() - start
+                metrics.observe("llm_attempt_seconds", busy, model=model_name, outcome="ok")
+                print(f"Successfully streamed content with {model_name}")
+                self.health.record_success(model_name)
+                text = "".join(parts)
+                self._settle(model_name, text, chunk)
+                metrics.inc("llm_generations_total", source=model_name)
+                # Gemini reports usage on the final chunk
+                record_llm_usage(model_name, prompt, text, chunk)
+                self.prompts.record_usage(prompt, chunk)
+                if use_cache:
+                    self.cache.set(model_name, prompt, text)
+                return
+            except Exception as e:
+                metrics.observe("llm_attempt_seconds", busy, model=model_name, outcome="error")
+                self.health.record_failure(model_name, e)
+                self._settle(model_name, "".join(parts), error=e)
+                if parts:
+                    print(f"Stream from {model_name} failed after {len(parts)} chunks: {e}")
+                    raise
+                print(f"Streamed generation failed with {model_name}: {e}, trying next model...")
+                metrics.inc("llm_fallbacks_total", model=model_name)
+                continue
+
+        if not fallback:
+            raise AllModelsFailed("All models failed")
+        yield self._mock_fallback(prompt, "Streaming mock policy.")
+
     def _generate_mock_policy(self, prompt: str) -> str:
         """
         Generates a realistic mock policy when API is unavailable.
@@ -99,60 +251,145 @@ class AIService:
 **Need Help?** Contact our support team for assistance.
 """
 
-    def generate_policy(self, client_data: Dict, risk_result: Dict, pricing_result: Dict) -> str:
-        """
-        Generates a complete insurance policy using Gemini.
-        """
-        prompt = f"""
-        Generate a comprehensive, personalized insurance policy for the following client:
-        
-        CLIENT DATA:
-        {json.dumps(client_data, indent=2)}
-        
-        RISK ASSESSMENT:
-        {json.dumps(risk_result, indent=2)}
-        
-        PRICING DETAILS:
-        {json.dumps(pricing_result, indent=2)}
-        
-        The policy MUST include:
-        1. Policy Overview (Type, Holder, Duration, Coverage Amount)
-        2. Detailed Coverage (What is covered)
-        3. Terms & Conditions (Standard and personalized based on risk)
-        4. Exclusions (What is not covered)
-        5. Premium and Payment Schedule (Monthly/Yearly breakdown)
-        
-        Format the output as a well-structured Markdown document.
-        Keep the tone professional, legalistic, yet clear.
-        """
-        
+    def _build_policy_prompt(self, client_data: Dict, risk_result: Dict, pricing_result: Dict) -> str:
+        return self.prompts.compile("policy", client_data=client_data, risk_result=risk_result, pricing_result=pricing_result)
+
+    def _build_narrative_prompt(self, client_data: Dict, insurance_details: Optional[Dict], risk_result: Dict) -> str:
+        insurance_details = insurance_details or {}
+        return self.prompts.compile(
+            "policy_narrative",
+            client_data=client_data,
+            insurance_type=insurance_details.get('type') or 'life',
+            coverage_amount=insurance_details.get('coverage_amount', 100000),
+            risk_result=risk_result
+        )
+
+    def _generate_chunks(self, prompt: str, use_cache: bool) -> Iterator[str]:
+        """Non-streaming generation as a chunk iterator; any failure counts as every model failing."""
         try:
-            return self._generate_with_retry(prompt)
+            text = self._generate_with_retry(prompt, use_cache=use_cache, fallback=False)
+        except AllModelsFailed:
+            raise
         except Exception as e:
             print(f"AI Generation Error: {e}")
-            # Return mock policy on complete failure
-            return self._generate_mock_policy(prompt)
+            raise AllModelsFailed(str(e)) from e
+        yield text
 
-    def refine_policy(self, current_policy: str, refinement_prompt: str) -> str:
+    def _with_template_fallback(self, chunks: Iterator[str], replacement: Iterator[str]) -> Iterator[str]:
         """
-        Refines an existing policy based on natural language input.
+        Passes a generation through, switching to `replacement` if every
+        model failed before producing output.
         """
-        prompt = f"""
-        You are an insurance expert. I have an existing insurance policy and I want to refine it based on a user's request.
-        
-        CURRENT POLICY:
-        ---
-        {current_policy}
-        ---
-        
-        USER REFINEMENT REQUEST: "{refinement_prompt}"
-        
-        Please update the policy to reflect this request. Ensure the overall structure, legal tone, and consistency are maintained.
-        Output ONLY the updated policy text in Markdown.
+        mode = Config.POLICY_GENERATION_MODE
+        try:
+            for chunk in chunks:
+                yield chunk
+        except AllModelsFailed:
+            print("All models failed. Using the policy templates instead of the mock policy.")
+            metrics.inc("policy_generations_total", mode=mode, source="template")
+            yield from replacement
+            return
+        metrics.inc("policy_generations_total", mode=mode, source="llm")
+
+    def generate_policy(self, client_data: Dict, risk_result: Dict, pricing_result: Dict, use_cache: bool = True,
+                        insurance_details: Optional[Dict] = None) -> str:
+        """
+        Generates a complete insurance policy. In "hybrid" mode only the
+        personalized narrative comes from Gemini and the rest is rendered from
+        the policy templates.
+        """
+        return "".join(self.stream_policy(client_data, risk_result, pricing_result, use_cache=use_cache,
+                                          insurance_details=insurance_details, stream=False))
+
+    def stream_policy(self, client_data: Dict, risk_result: Dict, pricing_result: Dict, use_cache: bool = True,
+                      insurance_details: Optional[Dict] = None, stream: bool = True) -> Iterator[str]:
+        """
+        Streams a complete insurance policy chunk by chunk. In "hybrid" mode
+        the template sections are sent immediately and the narrative is
+        streamed into place as Gemini writes it.
+        """
+        context = self.templates.context(client_data, insurance_details, risk_result, pricing_result)
+        if Config.POLICY_GENERATION_MODE == "hybrid":
+            prompt = self._build_narrative_prompt(client_data, insurance_details, risk_result)
+        else:
+            prompt = self._build_policy_prompt(client_data, risk_result, pricing_result)
+
+        if stream:
+            chunks = self._stream_with_retry(prompt, use_cache=use_cache, fallback=False)
+        else:
+            chunks = self._generate_chunks(prompt, use_cache)
+        if Config.POLICY_GENERATION_MODE == "hybrid":
+            # No narrative means both narrative parts come from the template fallbacks
+            return self.templates.assemble(context, self._with_template_fallback(chunks, iter(())))
+        return self._with_template_fallback(chunks, self.templates.assemble(context, None))
+
+    def _build_refine_prompt(self, current_policy: str, refinement_prompt: str) -> str:
+        return self.prompts.compile("refine", current_policy=current_policy, refinement_prompt=refinement_prompt)
+
+    def _build_section_refine_prompt(self, outline: str, sections_text: str, refinement_prompt: str) -> str:
+        return self.prompts.compile("refine_sections", outline=outline, sections_text=sections_text,
+                                    refinement_prompt=refinement_prompt)
+
+    def _refine_sections(self, current_policy: str, refinement_prompt: str, use_cache: bool = True) -> Optional[str]:
+        """
+        Regenerates only the sections a refinement prompt is about and splices
+        them back into the policy. Returns None when the request should go
+        through a full-document refinement instead.
+        """
+        if not current_policy or policy_sections.is_global_request(refinement_prompt):
+            return None
+        parsed = policy_sections.parse_sections(current_policy)
+        if parsed is None:
+            return None
+        preamble, level, sections = parsed
+        selected = policy_sections.select_sections(sections, refinement_prompt, max_sections=Config.REFINE_MAX_SECTIONS)
+        if not selected:
+            return None
+        selected_chars = sum(len(sections[i]["text"]) for i in selected)
+        if selected_chars > len(current_policy) * Config.REFINE_MAX_SECTION_FRACTION:
+            return None
+
+        outline = "\n".join(section["text"].split("\n", 1)[0] for section in sections)
+        sections_text = "\n\n".join(sections[i]["text"].strip() for i in selected)
+        prompt = self._build_section_refine_prompt(outline, sections_text, refinement_prompt)
+        try:
+            updated_text = self._generate_with_retry(prompt, use_cache=use_cache, fallback=False)
+        except AllModelsFailed:
+            # A full refinement would fail the same way
+            return self._mock_fallback(prompt, "Returning mock policy.")
+
+        updated_policy = policy_sections.splice_sections(preamble, sections, level, updated_text, selected)
+        if updated_policy is None:
+            print("Section refinement could not be spliced, falling back to full refinement")
+            return None
+        print(f"Refined {len(selected)} of {len(sections)} sections")
+        return updated_policy
+
+    def refine_policy(self, current_policy: str, refinement_prompt: str, use_cache: bool = True) -> str:
+        """
+        Refines an existing policy based on natural language input. Requests
+        aimed at specific sections only regenerate those sections; global
+        requests regenerate the whole document.
         """
+        if Config.REFINE_INCREMENTAL:
+            try:
+                updated_policy = self._refine_sections(current_policy, refinement_prompt, use_cache=use_cache)
+                if updated_policy is not None:
+                    return updated_policy
+            except Exception as e:
+                print(f"Section refinement error: {e}, falling back to full refinement")
+
+        prompt = self._build_refine_prompt(current_policy, refinement_prompt)
         
         try:
-            return self._generate_with_retry(prompt)
+            return self._generate_with_retry(prompt, use_cache=use_cache)
         except Exception as e:
             print(f"AI Refinement Error: {e}")
             return "Unable to refine policy at this time due to API limitations. Please try again later or contact support."
+
+    def stream_refinement(self, current_policy: str, refinement_prompt: str, use_cache: bool = True) -> Iterator[str]:
+        """
+        Streams the refined policy chunk by chunk.
+        """
+        prompt = self._build_refine_prompt(current_policy, refinement_prompt)
+        return self._stream_with_retry(prompt, use_cache=use_cache)
@@ -0,0 +1,248 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+from config import Config
+from utils.process_pool import pid_alive
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class SQLiteJobStore:
+    """
+    Job records in SQLite, so any gunicorn worker can answer status and
+    cancellation requests for a job that runs in another worker. Use
+    ":memory:" for a store private to one process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._conn = None
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "pid INTEGER, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor
+
+    def create(self, job_id: str, kind: str):
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, pid, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, os.getpid(), time.time())
+        )
+
+    def mark_running(self, job_id: str) -> bool:
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ? AND cancel_requested = 0",
+            (RUNNING, time.time(), job_id, QUEUED)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def request_cancel(self, job_id: str):
+        # Queued jobs are cancelled outright; running jobs stop at their next checkpoint
+        self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, QUEUED)
+        )
+        self._execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+            (job_id, QUEUED, RUNNING)
+        )
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def fail_orphaned(self, stale_before: float) -> int:
+        """
+        Fails queued and running jobs whose owning process (the one holding
+        them in memory) has exited, or that were created before `stale_before`.
+        Job functions are not persisted, so they cannot be requeued.
+        """
+        rows = self._execute(
+            "SELECT id, pid, created_at FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        orphaned = [row["id"] for row in rows if row["created_at"] < stale_before or not pid_alive(row["pid"])]
+        for job_id in orphaned:
+            self._execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (FAILED, "Job was lost: its worker process exited or it ran too long", time.time(),
+                 job_id, QUEUED, RUNNING)
+            )
+        return len(orphaned)
+
+    def prune(self, older_than: float):
+        self._execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (older_than,))
+
+
+class JobContext:
+    """
+    Handed to job functions so they can bail out at safe points when the job
+    has been cancelled.
+    """
+
+    def __init__(self, job_id: str, store: SQLiteJobStore):
+        self.id = job_id
+        self._store = store
+
+    def cancelled(self) -> bool:
+        return self._store.cancel_requested(self.id)
+
+    def raise_if_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled(self.id)
+
+
+class JobQueue:
+    """
+    Bounded job queue executed by a pool of worker threads in this process.
+    Job state is kept in the store so it can be polled from any worker. When
+    a process starts its workers it fails the jobs left unfinished by
+    processes that have exited, so they do not poll as running forever.
+    """
+
+    def __init__(self, store: SQLiteJobStore, workers: int = 4, max_queued: int = 100, result_ttl: float = 3600,
+                 stale_after: float = 3600):
+        self.store = store
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._threads = []
+        self._threads_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_workers(self):
+        if self._threads_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._threads_pid == os.getpid():
+                return
+            orphaned = self.store.fail_orphaned(time.time() - self.stale_after)
+            if orphaned:
+                print(f"Failed {orphaned} job(s) left unfinished by exited workers")
+            self._threads = [
+                threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._threads_pid = os.getpid()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Queues `fn(context, *args, **kwargs)` and returns the job id. Raises
+        QueueFullError when `max_queued` jobs are already waiting.
+        """
+        self._ensure_workers()
+        job_id = str(uuid.uuid4())
+        self.store.prune(time.time() - self.result_ttl)
+        self.store.create(job_id, kind)
+        try:
+            self._queue.put_nowait((job_id, fn, args, kwargs))
+        except queue.Full:
+            self.store.finish(job_id, FAILED, error="Job queue is full")
+            raise QueueFullError("Job queue is full")
+        return job_id
+
+    def _run(self):
+        while True:
+            job_id, fn, args, kwargs = self._queue.get()
+            if not self.store.mark_running(job_id):
+                # Cancelled while queued
+                continue
+            try:
+                result = fn(JobContext(job_id, self.store), *args, **kwargs)
+                self.store.finish(job_id, SUCCEEDED, result=result)
+            except JobCancelled:
+                self.store.finish(job_id, CANCELLED)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.store.finish(job_id, FAILED, error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return job
+        self.store.request_cancel(job_id)
+        return self.store.get(job_id)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "local_queue_depth": self._queue.qsize(),
+            "max_queued": self._queue.maxsize,
+            "jobs": self.store.counts()
+        }
+
+
+job_queue = JobQueue(
+    SQLiteJobStore(Config.JOB_STORE_PATH),
+    workers=Config.JOB_WORKERS,
+    max_queued=Config.JOB_QUEUE_LIMIT,
+    result_ttl=Config.JOB_RESULT_TTL,
+    stale_after=Config.JOB_STALE_AFTER
+)
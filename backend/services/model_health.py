@@ -0,0 +1,231 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_quota_error(error: Exception) -> bool:
+    error_str = str(error)
+    return "quota" in error_str.lower() or "429" in error_str
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """
+    Extracts the server-suggested cooldown from a Gemini 429 error, e.g.
+    "Please retry in 17.5s" or "retry_delay { seconds: 17 }".
+    """
+    error_str = str(error)
+    match = re.search(r"retry in ([\d.]+)\s*s", error_str, re.IGNORECASE)
+    if not match:
+        match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", error_str)
+    if match:
+        try:
+            return float(match.group(1))
+        except ValueError:
+            return None
+    return None
+
+
+def _initial_state() -> Dict:
+    return {"state": CLOSED, "failures": 0, "trips": 0, "open_until": 0.0, "probe_started": 0.0}
+
+
+class MemoryHealthStore:
+    """
+    Breaker state shared by all threads of one process.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, model: str) -> Dict:
+        with self._lock:
+            return dict(self._states.get(model) or _initial_state())
+
+    def save(self, model: str, state: Dict):
+        with self._lock:
+            self._states[model] = dict(state)
+
+    def try_begin_probe(self, model: str, now: float, probe_timeout: float) -> bool:
+        with self._lock:
+            state = self._states.get(model)
+            if state is None:
+                return True
+            expired_open = state["state"] == OPEN and state["open_until"] <= now
+            stale_probe = state["state"] == HALF_OPEN and state["probe_started"] + probe_timeout <= now
+            if expired_open or stale_probe:
+                state["state"] = HALF_OPEN
+                state["probe_started"] = now
+                return True
+            return False
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return list(self._states.keys())
+
+
+class SQLiteHealthStore:
+    """
+    Breaker state in a SQLite file so every gunicorn worker on the host sees
+    the same open/closed models. The half-open probe is claimed with a
+    conditional UPDATE, so only one worker probes a recovering model.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS model_health ("
+            "model TEXT PRIMARY KEY, state TEXT NOT NULL, failures INTEGER NOT NULL, "
+            "trips INTEGER NOT NULL, open_until REAL NOT NULL, probe_started REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, model: str) -> Dict:
+        row = self._conn().execute(
+            "SELECT state, failures, trips, open_until, probe_started FROM model_health WHERE model = ?",
+            (model,)
+        ).fetchone()
+        if row is None:
+            return _initial_state()
+        return {"state": row[0], "failures": row[1], "trips": row[2], "open_until": row[3], "probe_started": row[4]}
+
+    def save(self, model: str, state: Dict):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO model_health (model, state, failures, trips, open_until, probe_started) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (model, state["state"], state["failures"], state["trips"], state["open_until"], state["probe_started"])
+        )
+        conn.commit()
+
+    def try_begin_probe(self, model: str, now: float, probe_timeout: float) -> bool:
+        conn = self._conn()
+        cursor = conn.execute(
+            "UPDATE model_health SET state = ?, probe_started = ? WHERE model = ? AND "
+            "((state = ? AND open_until <= ?) OR (state = ? AND probe_started + ? <= ?))",
+            (HALF_OPEN, now, model, OPEN, now, HALF_OPEN, probe_timeout, now)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def models(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT model FROM model_health").fetchall()]
+
+
+class ModelHealthRegistry:
+    """
+    Per-model circuit breakers (closed -> open -> half-open -> closed).
+
+    A model opens after `failure_threshold` consecutive failures, or at once
+    on a quota (429) error using the cooldown the API asked for. Cooldowns
+    for repeated trips grow exponentially up to `max_cooldown`. After the
+    cooldown a single request is let through as a probe; its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, store=None, failure_threshold: int = 3, cooldown: float = 30.0,
+                 max_cooldown: float = 600.0, quota_cooldown: float = 60.0, probe_timeout: float = 60.0):
+        self.store = store or MemoryHealthStore()
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.quota_cooldown = quota_cooldown
+        self.probe_timeout = probe_timeout
+
+    def available(self, model: str) -> bool:
+        state = self.store.load(model)
+        if state["state"] == CLOSED:
+            return True
+        now = time.time()
+        if state["state"] == OPEN and state["open_until"] > now:
+            return False
+        return self.store.try_begin_probe(model, now, self.probe_timeout)
+
+    def healthy_models(self, models: List[str]) -> List[str]:
+        """
+        Filters `models` down to the ones that may be called right now, keeping
+        their order.
+        """
+        return [model for model in models if self.available(model)]
+
+    def record_success(self, model: str):
+        state = self.store.load(model)
+        if state["state"] != CLOSED or state["failures"]:
+            self.store.save(model, _initial_state())
+
+    def record_failure(self, model: str, error: Optional[Exception] = None) -> bool:
+        """
+        Records a failed call. Returns True if the breaker is still closed,
+        i.e. the model may be retried right away.
+        """
+        state = self.store.load(model)
+        now = time.time()
+        if error is not None and is_quota_error(error):
+            retry_after = parse_retry_after(error)
+            self._open(model, state, now, retry_after if retry_after is not None else self.quota_cooldown)
+            return False
+        state["failures"] += 1
+        if state["state"] == HALF_OPEN or state["failures"] >= self.failure_threshold:
+            cooldown = min(self.max_cooldown, self.cooldown * (2 ** state["trips"]))
+            self._open(model, state, now, cooldown)
+            return False
+        self.store.save(model, state)
+        return True
+
+    def _open(self, model: str, state: Dict, now: float, cooldown: float):
+        print(f"Circuit opened for {model} for {cooldown:.0f}s")
+        state["state"] = OPEN
+        state["open_until"] = now + cooldown
+        state["trips"] += 1
+        state["failures"] = 0
+        self.store.save(model, state)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        now = time.time()
+        snapshot = {}
+        for model in self.store.models():
+            state = self.store.load(model)
+            state["cooldown_remaining"] = max(0.0, state["open_until"] - now) if state["state"] == OPEN else 0.0
+            snapshot[model] = state
+        return snapshot
+
+
+def _create_store():
+    if Config.MODEL_HEALTH_PATH:
+        try:
+            return SQLiteHealthStore(Config.MODEL_HEALTH_PATH)
+        except sqlite3.Error as e:
+            print(f"Model health: falling back to in-process state ({e})")
+    return MemoryHealthStore()
+
+
+# Shared by every AIService instance in the process (and across workers via SQLite)
+model_health = ModelHealthRegistry(
+    store=_create_store(),
+    failure_threshold=Config.MODEL_FAILURE_THRESHOLD,
+    cooldown=Config.MODEL_COOLDOWN_SECONDS,
+    max_cooldown=Config.MODEL_MAX_COOLDOWN_SECONDS,
+    quota_cooldown=Config.MODEL_QUOTA_COOLDOWN_SECONDS
+)
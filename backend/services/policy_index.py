@@ -0,0 +1,163 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Optional
+from config import Config
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "my", "of", "on", "or", "the", "this", "to", "what",
+    "when", "which", "who", "will", "with", "you", "your"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_policy(policy_text: str, max_chars: int = 1200) -> List[str]:
+    """
+    Splits policy Markdown into chunks at headings. Sections longer than
+    `max_chars` are split further at paragraph breaks, and each piece keeps
+    its section heading so it still reads on its own.
+    """
+    sections = []
+    current = []
+    for line in policy_text.split('\n'):
+        if line.startswith('#') and current:
+            sections.append('\n'.join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        sections.append('\n'.join(current).strip())
+
+    chunks = []
+    for section in sections:
+        if not section:
+            continue
+        if len(section) <= max_chars:
+            chunks.append(section)
+            continue
+        heading = section.split('\n', 1)[0] if section.startswith('#') else ""
+        piece = ""
+        for paragraph in section.split('\n\n'):
+            if piece and len(piece) + len(paragraph) > max_chars:
+                chunks.append(piece.strip())
+                piece = heading + "\n" if heading and not paragraph.startswith(heading) else ""
+            piece += paragraph + "\n\n"
+        if piece.strip():
+            chunks.append(piece.strip())
+    return chunks
+
+
+class PolicyIndex:
+    """
+    BM25 index over the chunks of one policy version.
+    """
+
+    def __init__(self, policy_text: str, max_chars: int = 1200, k1: float = 1.5, b: float = 0.75):
+        self.chunks = split_policy(policy_text, max_chars)
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freqs = Counter()
+        for tf in self._term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def score(self, query: str) -> List[float]:
+        terms = tokenize(query)
+        scores = []
+        for tf, length in zip(self._term_freqs, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def top_chunks(self, query: str, k: int) -> List[str]:
+        """
+        Returns the `k` best-matching chunks in document order. The first
+        chunk (policy overview) is always included as it anchors the answer.
+        """
+        if len(self.chunks) <= k:
+            return list(self.chunks)
+        scores = self.score(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: scores[i], reverse=True)
+        selected = set(ranked[:k - 1])
+        selected.add(0)
+        for i in ranked[k - 1:]:
+            if len(selected) >= k:
+                break
+            selected.add(i)
+        return [self.chunks[i] for i in sorted(selected)]
+
+
+class PolicyIndexRegistry:
+    """
+    Caches one index per policy version (keyed by a hash of its text) and
+    remembers which version is current for each policy id. Other workers
+    can save newer versions, so a policy id's current text expires after
+    `ttl` seconds (the read cache TTL) and is then re-read from the database.
+    """
+
+    def __init__(self, max_indexes: int = 256, ttl: float = 30.0):
+        self.max_indexes = max_indexes
+        self.ttl = ttl
+        self._indexes = OrderedDict()
+        self._current = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _text_key(self, policy_text: str) -> str:
+        return hashlib.sha256(policy_text.encode('utf-8')).hexdigest()
+
+    def get_or_build(self, policy_text: str) -> PolicyIndex:
+        key = self._text_key(policy_text)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        index = PolicyIndex(policy_text, max_chars=Config.CHATBOT_CHUNK_CHARS)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def register(self, policy_id: str, policy_text: str, expires: bool = True):
+        """
+        Records `policy_text` as the current version of `policy_id`. Called
+        whenever a new policy version is saved; the index itself is built on
+        the first chat question. Pass `expires=False` for text that is not
+        stored anywhere else, such as uploads.
+        """
+        expires_at = time.monotonic() + self.ttl if expires else math.inf
+        with self._lock:
+            self._current[policy_id] = (policy_text, expires_at)
+            self._current.move_to_end(policy_id)
+            while len(self._current) > self.max_indexes:
+                self._current.popitem(last=False)
+
+    def get(self, policy_id: str) -> Optional[PolicyIndex]:
+        with self._lock:
+            entry = self._current.get(policy_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._current[policy_id]
+                entry = None
+        if entry is None:
+            return None
+        return self.get_or_build(entry[0])
+
+
+policy_indexes = PolicyIndexRegistry(max_indexes=Config.CHATBOT_INDEX_CACHE_SIZE, ttl=Config.POLICY_READ_CACHE_TTL)
@@ -0,0 +1,109 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from services.policy_index import tokenize
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+
+# Requests that touch the whole document are always refined in full
+GLOBAL_KEYWORDS = {
+    "entire", "whole", "everything", "overall", "throughout", "tone", "rewrite",
+    "translate", "simplify", "summarize", "summarise", "shorten", "format",
+    "formatting", "language", "restructure", "reorganize", "all"
+}
+
+
+def _normalize_heading(heading: str) -> str:
+    return " ".join(tokenize(heading.replace('*', '')))
+
+
+def parse_sections(policy_text: str) -> Optional[Tuple[str, int, List[Dict]]]:
+    """
+    Splits a policy into (preamble, section_level, sections) where each
+    section is {"heading", "key", "text"} and `text` includes the heading line
+    and any sub-headings. The section level is the shallowest heading level
+    used more than once. Returns None if the document has no such structure.
+    """
+    lines = policy_text.split('\n')
+    levels = []
+    for line in lines:
+        match = HEADING_PATTERN.match(line)
+        if match:
+            levels.append(len(match.group(1)))
+    candidates = sorted({level for level in levels if levels.count(level) > 1})
+    if not candidates:
+        return None
+    level = candidates[0]
+    preamble, sections = split_at_level(policy_text, level)
+    return preamble, level, sections
+
+
+def split_at_level(policy_text: str, level: int) -> Tuple[str, List[Dict]]:
+    """
+    Splits a policy into (preamble, sections) at headings of exactly `level`;
+    deeper headings stay inside their section.
+    """
+    lines = policy_text.split('\n')
+    preamble = []
+    sections = []
+    for line in lines:
+        match = HEADING_PATTERN.match(line)
+        if match and len(match.group(1)) == level:
+            heading = match.group(2)
+            sections.append({"heading": heading, "key": _normalize_heading(heading), "lines": [line]})
+        elif sections:
+            sections[-1]["lines"].append(line)
+        else:
+            preamble.append(line)
+
+    for section in sections:
+        section["text"] = '\n'.join(section.pop("lines"))
+    return '\n'.join(preamble), sections
+
+
+def is_global_request(refinement_prompt: str) -> bool:
+    return bool(GLOBAL_KEYWORDS.intersection(tokenize(refinement_prompt)))
+
+
+def select_sections(sections: List[Dict], refinement_prompt: str, max_sections: int = 2,
+                    min_relative_score: float = 0.5) -> List[int]:
+    """
+    Picks the sections a refinement prompt is about by lexical overlap, with
+    heading matches weighted above body matches. Returns section indexes, or
+    an empty list when no section clearly matches.
+    """
+    terms = set(tokenize(refinement_prompt))
+    if not terms:
+        return []
+    scores = []
+    for section in sections:
+        heading_terms = set(section["key"].split())
+        body_terms = set(tokenize(section["text"]))
+        scores.append(3 * len(terms & heading_terms) + len(terms & body_terms))
+    best = max(scores) if scores else 0
+    if best == 0:
+        return []
+    ranked = sorted(range(len(sections)), key=lambda i: scores[i], reverse=True)
+    return sorted(i for i in ranked[:max_sections] if scores[i] >= best * min_relative_score)
+
+
+def splice_sections(preamble: str, sections: List[Dict], level: int, updated_text: str,
+                    selected: List[int]) -> Optional[str]:
+    """
+    Replaces the selected sections with their rewritten versions from
+    `updated_text`. Returns None if any selected section is missing from the
+    model's answer, so the caller can fall back to a full refinement.
+    `updated_text` is split at the known section `level`, so rewritten
+    sections may contain sub-headings.
+    """
+    _, updated_sections = split_at_level(updated_text.strip(), level)
+    updated = {section["key"]: section["text"].rstrip() for section in updated_sections}
+
+    result = [section["text"] for section in sections]
+    for i in selected:
+        replacement = updated.get(sections[i]["key"])
+        if replacement is None:
+            return None
+        # Keep the blank line(s) that separated this section from the next one
+        trailing = sections[i]["text"][len(sections[i]["text"].rstrip()):]
+        result[i] = replacement + trailing
+    return '\n'.join([preamble] + result) if preamble else '\n'.join(result)
@@ -0,0 +1,195 @@
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import BaseModel
+
+COVERAGE_HEADING = "Detailed Coverage"
+TERMS_HEADING = "Personalized Terms"
+NARRATIVE_HEADING_PATTERN = re.compile(r"^\s*#{1,6}\s*\**\s*(detailed coverage|personalized terms)\s*\**\s*:?\s*$", re.I)
+
+SAMPLE_CONTEXT = {
+    "holder": "Sample Holder", "insurance_type": "Life", "coverage_amount": "$100,000",
+    "duration": "12 Months", "risk_score": "Medium", "risk_percent": "50%", "risk_factors": "- None identified",
+    "monthly_premium": "$1.00", "yearly_premium": "$1.00", "base_premium": "$1.00", "processing_fee": "$1.00",
+    "rider_costs": "$1.00", "risk_adjustment": "$1.00", "yearly_savings": "$1.00", "monthly_total_for_year": "$1.00",
+    "template_version": 1
+}
+
+
+class PolicyTemplateError(ValueError):
+    pass
+
+
+def _money(value) -> str:
+    return f"${float(value or 0):,.2f}"
+
+
+def _as_dict(value) -> Dict:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return value or {}
+
+
+def load_template_spec(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise PolicyTemplateError("PyYAML is required for YAML policy templates; install it or use JSON")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class PolicyTemplates:
+    """
+    Versioned policy templates (see policy_templates/v1.yaml). Overview,
+    terms, exclusions and the premium schedule are rendered locally from the
+    risk and pricing results; the LLM only supplies the "Detailed Coverage"
+    and "Personalized Terms" narratives, and the template's fallback
+    narratives are used when it is unavailable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        spec = load_template_spec(path)
+        missing = [key for key in ("version", "title", "overview", "terms", "exclusions", "premium", "narrative_fallback")
+                   if key not in spec]
+        if missing:
+            raise PolicyTemplateError(f"{path}: missing {', '.join(missing)}")
+        self.spec = spec
+        self.version = spec["version"]
+        self._lists = {}
+        # Render every combination once so a bad placeholder fails at start-up, not per request
+        for insurance_type in list(spec["terms"].get("by_type", {})) + ["other"]:
+            for tier in ("Low", "Medium", "High"):
+                context = dict(SAMPLE_CONTEXT, insurance_type=insurance_type.title(), risk_score=tier)
+                try:
+                    "".join(self.render_parts(context)) + self.fallback_coverage(context) + self.fallback_terms(context)
+                except (KeyError, IndexError, ValueError) as e:
+                    raise PolicyTemplateError(f"{path}: invalid placeholder {e} for {insurance_type}/{tier}")
+
+    def context(self, client_data: Dict, insurance_details: Optional[Dict], risk_result, pricing_result) -> Dict:
+        """Template fields for one policy."""
+        risk = _as_dict(risk_result)
+        pricing = _as_dict(pricing_result)
+        insurance_details = insurance_details or {}
+        breakdown = pricing.get("breakdown") or {}
+        factors = [_as_dict(factor) for factor in risk.get("factors") or []]
+        monthly = float(pricing.get("monthly_premium") or 0)
+        yearly = float(pricing.get("yearly_premium") or 0)
+        return {
+            "holder": (client_data or {}).get("name") or "Valued Customer",
+            "insurance_type": str(insurance_details.get("type") or "life").title(),
+            "coverage_amount": _money(insurance_details.get("coverage_amount", 100000)),
+            "duration": self.spec.get("duration", "12 Months"),
+            "risk_score": risk.get("score", "Medium"),
+            "risk_percent": f"{float(risk.get('score_value') or 0):.0%}",
+            "risk_factors": "\n".join(
+                f"- **{factor.get('name')}** ({factor.get('impact')} impact): {factor.get('description')}" for factor in factors
+            ) or "- None identified",
+            "monthly_premium": _money(monthly),
+            "yearly_premium": _money(yearly),
+            "base_premium": _money(breakdown.get("base_premium")),
+            "processing_fee": _money(breakdown.get("processing_fee")),
+            "rider_costs": _money(breakdown.get("rider_costs")),
+            "risk_adjustment": _money(breakdown.get("risk_adjustment")),
+            "yearly_savings": _money(monthly * 12 - yearly),
+            "monthly_total_for_year": _money(monthly * 12),
+            "template_version": self.version
+        }
+
+    def _merged(self, kind: str, insurance_type: str, tier: str) -> List[str]:
+        key = (kind, insurance_type, tier)
+        items = self._lists.get(key)
+        if items is None:
+            section = self.spec[kind]
+            items = (list(section.get("common", []))
+                     + list(section.get("by_type", {}).get(insurance_type, []))
+                     + list(section.get("by_tier", {}).get(tier, [])))
+            self._lists[key] = items
+        return items
+
+    def render_parts(self, context: Dict) -> Tuple[str, str, str]:
+        """
+        The template text around the two narratives: everything up to the
+        coverage narrative, between it and the personalized terms, and after.
+        """
+        insurance_type = context["insurance_type"].lower()
+        tier = context["risk_score"]
+        terms = "\n".join(f"{i}. {item}" for i, item in enumerate(self._merged("terms", insurance_type, tier), 1))
+        exclusions = "\n".join(f"- {item}" for item in self._merged("exclusions", insurance_type, tier))
+        head = (
+            f"# {self.spec['title'].format_map(context)}\n\n"
+            f"## Policy Overview\n{self.spec['overview'].format_map(context).strip()}\n\n"
+            f"## {COVERAGE_HEADING}\n"
+        )
+        middle = f"## Terms & Conditions\n{terms.format_map(context)}\n\n### {TERMS_HEADING}\n"
+        tail = (
+            f"## Exclusions\n{exclusions.format_map(context)}\n\n"
+            f"## Premium and Payment Schedule\n{self.spec['premium'].format_map(context).strip()}\n"
+        )
+        if self.spec.get("footer"):
+            tail += f"\n---\n{self.spec['footer'].format_map(context)}\n"
+        return head, middle, tail
+
+    def fallback_coverage(self, context: Dict) -> str:
+        texts = self.spec["narrative_fallback"]["coverage"]
+        text = texts.get(context["insurance_type"].lower(), texts["default"])
+        return text.format_map(context).strip()
+
+    def fallback_terms(self, context: Dict) -> str:
+        texts = self.spec["narrative_fallback"]["personalized_terms"]
+        return texts.get(context["risk_score"], texts.get("Medium", "")).format_map(context).strip()
+
+    def assemble(self, context: Dict, narrative: Optional[Iterable[str]]) -> Iterator[str]:
+        """
+        Yields the full policy, routing the narrative text (an iterable of
+        chunks, e.g. a Gemini stream) into its two places in the layout.
+        Complete lines are passed through as they arrive. A narrative of
+        None, or a missing part, is replaced by the template fallback.
+        """
+        head, middle, tail = self.render_parts(context)
+        yield head
+        state = "coverage"
+        written = {"coverage": False, "terms": False}
+        pending = ""
+        # Blank lines are held back so a part never starts or ends with them
+        blanks = 0
+
+        def route(line: str):
+            nonlocal state, blanks
+            match = NARRATIVE_HEADING_PATTERN.match(line)
+            if match:
+                if match.group(1).lower() == TERMS_HEADING.lower() and state == "coverage":
+                    state = "terms"
+                    blanks = 0
+                    return self._close_coverage(context, written) + middle
+                return ""
+            if not line.strip():
+                blanks += written[state]
+                return ""
+            written[state] = True
+            out = "\n" * blanks + line + "\n"
+            blanks = 0
+            return out
+
+        for chunk in narrative or ():
+            pending += chunk
+            *lines, pending = pending.split("\n")
+            out = "".join(route(line) for line in lines)
+            if out:
+                yield out
+        out = route(pending) if pending else ""
+        if state == "coverage":
+            out += self._close_coverage(context, written) + middle
+            state = "terms"
+        if not written["terms"]:
+            out += self.fallback_terms(context) + "\n"
+        yield out + "\n" + tail
+
+    def _close_coverage(self, context: Dict, written: Dict) -> str:
+        return "\n" if written["coverage"] else self.fallback_coverage(context) + "\n\n"
+
+    def render(self, context: Dict, narrative: Optional[str] = None) -> str:
+        return "".join(self.assemble(context, [narrative] if narrative is not None else None))
@@ -0,0 +1,331 @@
+import csv
+import json
+import os
+import time
+import uuid
+from itertools import islice
+from typing import Callable, Dict, Iterator, Optional
+from config import Config
+from services.registry import services
+from utils.file_lock import file_lock
+from utils.metrics import metrics
+from utils.process_pool import pid_alive
+
+POLICY_TEXT_MODES = ("none", "template", "llm")
+TRUE_STRINGS = {"true", "1", "yes", "y", "t"}
+IMPORT_NAMESPACE = uuid.UUID("5c0d1a52-7e0c-4d55-9a36-6b1d1f3b7a10")
+
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class PortfolioImportError(ValueError):
+    pass
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    if extension in (".csv", ".txt"):
+        return "csv"
+    raise PortfolioImportError(f"Unsupported import file type '{extension}', expected .csv or .parquet")
+
+
+def iter_chunks(path: str, file_format: str, chunk_size: int, skip_rows: int = 0) -> Iterator[Dict[str, list]]:
+    """
+    Yields the file as column dicts of at most `chunk_size` rows, starting
+    after `skip_rows`. Only one chunk is held in memory at a time.
+    """
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise PortfolioImportError("pyarrow is required for Parquet imports; install it or use CSV")
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            if skip_rows:
+                batch = batch.slice(skip_rows)
+                skip_rows = 0
+            yield batch.to_pydict()
+        return
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        if not header:
+            return
+        rows = islice(reader, skip_rows, None)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            # Short rows are padded with empty cells
+            width = len(header)
+            columns = list(zip(*(row + [""] * (width - len(row)) if len(row) < width else row[:width] for row in chunk)))
+            yield {name: list(values) for name, values in zip(header, columns)}
+
+
+def _to_number(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    value = str(value).strip().replace(",", "")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _to_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    value = str(value).strip().lower()
+    return value in TRUE_STRINGS if value else None
+
+
+def _to_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def load_state(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(path: str, state: Dict) -> None:
+    """Atomic replace, so a crash never leaves a half-written checkpoint."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def row_ids(import_id: str, first_row: int, count: int) -> tuple:
+    """
+    Policy and user ids for rows [first_row, first_row + count): the import's
+    uuid5 prefix plus the row number, so replaying a chunk writes the same ids
+    (a no-op) and consecutive rows get consecutive, index-friendly keys.
+    """
+    prefix = uuid.uuid5(IMPORT_NAMESPACE, import_id).int >> 64 << 64
+    policy_ids = [str(uuid.UUID(int=prefix | (row << 1))) for row in range(first_row, first_row + count)]
+    user_ids = [str(uuid.UUID(int=prefix | (row << 1) | 1)) for row in range(first_row, first_row + count)]
+    return policy_ids, user_ids
+
+
+class PortfolioImporter:
+    """
+    Streams a CSV or Parquet book of business through risk scoring, pricing
+    and persistence in chunks: each chunk is scored and priced with the
+    vectorized engines and written as one bulk transaction.
+
+    Progress is checkpointed after every committed chunk in
+    IMPORT_STATE_DIR/<import_id>.json; `run` on an existing import resumes
+    after the last checkpoint. Policy text is optional: "none" leaves the
+    policy without a version, "template" renders it from the policy
+    templates without calling the LLM, and "llm" generates it per row
+    (slow; for small files). A run marks the checkpoint running with its
+    pid under a lock file, so only one process at a time runs an import;
+    a checkpoint left running by a dead process can be resumed.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, chunk_size: Optional[int] = None):
+        self.state_dir = state_dir or Config.IMPORT_STATE_DIR
+        self.chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
+        self.risk_engine = services.proxy('risk_engine')
+        self.pricing_engine = services.proxy('pricing_engine')
+        self.ai_service = services.proxy('ai_service')
+        self.db = services.proxy('db')
+
+    def _state_path(self, import_id: str) -> str:
+        return os.path.join(self.state_dir, f"{import_id}.json")
+
+    def create(self, path: str, file_format: Optional[str] = None, policy_text: str = "none",
+               chunk_size: Optional[int] = None, import_id: Optional[str] = None) -> Dict:
+        """Registers an import of `path` and writes its initial checkpoint."""
+        if policy_text not in POLICY_TEXT_MODES:
+            raise PortfolioImportError(f"policy_text must be one of {', '.join(POLICY_TEXT_MODES)}")
+        if not os.path.isfile(path):
+            raise PortfolioImportError(f"Import file not found: {path}")
+        stat = os.stat(path)
+        state = {
+            "import_id": import_id or str(uuid.uuid4()),
+            "path": os.path.abspath(path),
+            "format": file_format or detect_format(path),
+            "file_size": stat.st_size,
+            "file_mtime": stat.st_mtime,
+            "policy_text": policy_text,
+            "chunk_size": chunk_size or self.chunk_size,
+            "status": PAUSED,
+            "rows_done": 0,
+            "chunks_done": 0,
+            "invalid_values": 0,
+            "elapsed_seconds": 0.0,
+            "rows_per_second": 0.0,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "error": None
+        }
+        os.makedirs(self.state_dir, exist_ok=True)
+        save_state(self._state_path(state["import_id"]), state)
+        return state
+
+    def status(self, import_id: str) -> Optional[Dict]:
+        return load_state(self._state_path(import_id))
+
+    def run(self, import_id: str, progress: Optional[Callable[[Dict], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Imports from the last checkpoint to the end of the file. `progress`
+        is called with the state after each chunk; when `should_stop`
+        returns True the import pauses after the current chunk and can be
+        resumed later.
+        """
+        path = self._state_path(import_id)
+        # Check and claim under the lock so two processes cannot both start the import
+        with file_lock(f"{path}.lock"):
+            state = load_state(path)
+            if state is None:
+                raise PortfolioImportError(f"Unknown import: {import_id}")
+            if state["status"] == COMPLETED:
+                return state
+            if state["status"] == RUNNING and pid_alive(state.get("pid")):
+                raise PortfolioImportError(f"Import {import_id} is already running")
+            state.update(status=RUNNING, pid=os.getpid(), error=None)
+            save_state(path, state)
+        try:
+            stat = os.stat(state["path"])
+            if (stat.st_size, stat.st_mtime) != (state["file_size"], state["file_mtime"]) and state["rows_done"]:
+                raise PortfolioImportError("The import file changed since the last checkpoint; start a new import")
+            return self._run(state, path, progress, should_stop)
+        except BaseException as e:
+            # Interrupted (Ctrl-C, shutdown) imports are resumable like paused ones
+            failed = isinstance(e, Exception)
+            state.update(status=FAILED if failed else PAUSED, error=str(e) if failed else None, updated_at=time.time())
+            save_state(path, state)
+            raise
+
+    def _run(self, state: Dict, path: str, progress, should_stop) -> Dict:
+        templates = self.ai_service.templates if state["policy_text"] == "template" else None
+        started = time.perf_counter() - state["elapsed_seconds"]
+        chunks = iter_chunks(state["path"], state["format"], state["chunk_size"], skip_rows=state["rows_done"])
+        for columns in chunks:
+            records, invalid = self._process_chunk(state["import_id"], state["rows_done"], columns,
+                                                   state["policy_text"], templates)
+            self.db.save_policy_bundles(records)
+            metrics.inc("import_rows_total", len(records))
+
+            elapsed = time.perf_counter() - started
+            rows_done = state["rows_done"] + len(records)
+            state.update(
+                rows_done=rows_done,
+                chunks_done=state["chunks_done"] + 1,
+                invalid_values=state["invalid_values"] + invalid,
+                elapsed_seconds=round(elapsed, 3),
+                rows_per_second=round(rows_done / elapsed, 1) if elapsed else 0.0,
+                updated_at=time.time()
+            )
+            save_state(path, state)
+            if progress is not None:
+                progress(state)
+            if should_stop is not None and should_stop():
+                state.update(status=PAUSED)
+                save_state(path, state)
+                return state
+        state.update(status=COMPLETED, updated_at=time.time())
+        save_state(path, state)
+        return state
+
+    def _coerce(self, columns: Dict[str, list]) -> tuple:
+        """Casts CSV strings to what the risk rules and schema expect; unparseable cells become missing."""
+        kinds = {"age": "number", "income": "number", "coverage_amount": "number"}
+        for rule in self.risk_engine.rules.current().rules:
+            kinds.setdefault(rule.field, rule.kind)
+        converters = {"number": _to_number, "bool": _to_bool}
+        invalid = 0
+        for name, values in columns.items():
+            convert = converters.get(kinds.get(name), _to_text)
+            converted = [convert(value) for value in values]
+            invalid += sum(1 for before, after in zip(values, converted)
+                           if after is None and before not in (None, ""))
+            columns[name] = converted
+        return columns, invalid
+
+    def _process_chunk(self, import_id: str, first_row: int, columns: Dict[str, list],
+                       policy_text: str, templates) -> tuple:
+        columns, invalid = self._coerce(columns)
+        count = len(next(iter(columns.values()))) if columns else 0
+        types = columns.get("type") or columns.get("insurance_type") or [None] * count
+        types = [value or "life" for value in types]
+        coverage = [100000 if value is None else value for value in columns.get("coverage_amount") or [None] * count]
+
+        risk = self.risk_engine.calculate_risk_batch(columns, include_factors=True)
+        pricing = self.pricing_engine.calculate_pricing_batch(risk["score"], coverage, types)
+
+        policy_ids, user_ids = row_ids(import_id, first_row, count)
+        fees = {"processing_fee": self.pricing_engine.processing_fee, "rider_costs": self.pricing_engine.rider_cost}
+        # Factor objects are shared per rule, so each is dumped once
+        factor_dicts = {}
+        names = list(columns)
+        records = []
+        for i in range(count):
+            client_data = {name: columns[name][i] for name in names}
+            insurance_details = {"type": types[i], "coverage_amount": coverage[i]}
+            factors = []
+            for factor in risk["factors"][i]:
+                dumped = factor_dicts.get(id(factor))
+                if dumped is None:
+                    dumped = factor_dicts[id(factor)] = factor.model_dump()
+                factors.append(dumped)
+            risk_data = {
+                "score": risk["score"][i],
+                "score_value": float(risk["score_value"][i]),
+                "factors": factors,
+                "explanation": risk["explanation"][i]
+            }
+            monthly_base = float(pricing["base_premium"][i])
+            pricing_data = {
+                "monthly_premium": float(pricing["monthly_premium"][i]),
+                "yearly_premium": float(pricing["yearly_premium"][i]),
+                "breakdown": {
+                    "base_premium": monthly_base,
+                    **fees,
+                    "risk_adjustment": float(pricing["risk_adjustment"][i])
+                },
+                "explanation": (
+                    f"Calculated pricing for {types[i]} insurance with a {risk_data['score']} risk profile. "
+                    f"Base rate adjusted by {float(pricing['multiplier'][i])}x for risk. "
+                    f"Monthly premium: ${float(pricing['monthly_total'][i]):.2f}."
+                )
+            }
+            record = {
+                "client_data": client_data,
+                "insurance_details": insurance_details,
+                "risk_data": risk_data,
+                "pricing_data": pricing_data,
+                "policy_id": policy_ids[i],
+                "user_id": user_ids[i]
+            }
+            if templates is not None:
+                context = templates.context(client_data, insurance_details, risk_data, pricing_data)
+                record["policy_text"] = templates.render(context)
+            elif policy_text == "llm":
+                record["policy_text"] = self.ai_service.generate_policy(
+                    client_data, risk_data, pricing_data, insurance_details=insurance_details
+                )
+            records.append(record)
+        return records, invalid
@@ -1,5 +1,7 @@
-from typing import Dict
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
+import numpy as np
+from utils.metrics import metrics
 
 class PricingResult(BaseModel):
     monthly_premium: float
@@ -16,30 +18,70 @@ class PricingEngine:
             "auto": 0.3,
             "property": 0.2
         }
+        # Risk Multiplier
+        self.risk_multipliers = {
+            "Low": 0.8,
+            "Medium": 1.0,
+            "High": 1.5
+        }
+        # Fees and Riders (Mocked)
+        self.processing_fee = 10.0
+        self.rider_cost = 25.0
+        self.yearly_discount = 0.95 # 5% discount for yearly
+        self._build_rate_vectors()
 
+    def _build_rate_vectors(self):
+        """
+        Precomputes base rate and multiplier vectors for vectorized pricing,
+        each with a trailing default entry (0.3 and 1.0, as in
+        calculate_pricing) that unknown types and tiers map to.
+        """
+        self.insurance_types = list(self.base_rates.keys())
+        self.risk_tiers = list(self.risk_multipliers.keys())
+        self._type_index = {t: i for i, t in enumerate(self.insurance_types)}
+        self._tier_index = {r: i for i, r in enumerate(self.risk_tiers)}
+        self._base_vector = np.array([self.base_rates[t] for t in self.insurance_types] + [0.3])
+        self._multiplier_vector = np.array([self.risk_multipliers[r] for r in self.risk_tiers] + [1.0])
+
+    @staticmethod
+    def premium_kernel(coverage: Any, base_rate: Any, multiplier: Any, processing_fee: float, rider_cost: float,
+                       yearly_discount: float, rate_shock: Any = 1.0):
+        """
+        The premium formula every pricing path uses, on scalars or numpy
+        arrays that broadcast together. `rate_shock` scales the base rate,
+        e.g. per scenario in the portfolio simulation. Returns
+        (monthly_base, monthly_total, yearly_total).
+        """
+        monthly_base = (coverage / 1000) * base_rate * rate_shock * multiplier
+        monthly_total = monthly_base + processing_fee + rider_cost
+        yearly_total = monthly_total * 12 * yearly_discount
+        return monthly_base, monthly_total, yearly_total
+
+    def type_indices(self, insurance_types: Any) -> np.ndarray:
+        """Positions in the base rate vector; unknown types get the default entry."""
+        default = len(self.insurance_types)
+        return np.array([self._type_index.get(str(t).lower(), default) for t in insurance_types], dtype=np.intp)
+
+    def tier_indices(self, risk_scores: Any) -> np.ndarray:
+        """Positions in the multiplier vector; unknown tiers get the default entry."""
+        default = len(self.risk_tiers)
+        return np.array([self._tier_index.get(r, default) for r in risk_scores], dtype=np.intp)
+
+    @metrics.timed("stage_seconds", stage="pricing")
     def calculate_pricing(self, risk_score: str, coverage_amount: float, insurance_type: str) -> PricingResult:
         """
         Calculates premium based on risk score, coverage amount, and insurance type.
         """
         base_rate = self.base_rates.get(insurance_type.lower(), 0.3)
         
-        # Risk Multiplier
-        risk_multipliers = {
-            "Low": 0.8,
-            "Medium": 1.0,
-            "High": 1.5
-        }
-        multiplier = risk_multipliers.get(risk_score, 1.0)
+        multiplier = self.risk_multipliers.get(risk_score, 1.0)
         
-        # Calculate Base Premium
-        monthly_base = (coverage_amount / 1000) * base_rate * multiplier
+        processing_fee = self.processing_fee
+        rider_cost = self.rider_cost
         
-        # Fees and Riders (Mocked)
-        processing_fee = 10.0
-        rider_cost = 25.0 # Mocked rider cost
-        
-        monthly_total = monthly_base + processing_fee + rider_cost
-        yearly_total = monthly_total * 12 * 0.95 # 5% discount for yearly
+        # Calculate Premium
+        monthly_base, monthly_total, yearly_total = self.premium_kernel(
+            coverage_amount, base_rate, multiplier, processing_fee, rider_cost, self.yearly_discount)
         
         breakdown = {
             "base_premium": monthly_base,
@@ -59,3 +101,56 @@ class PricingEngine:
             breakdown=breakdown,
             explanation=explanation
         )
+
+    @metrics.timed("stage_seconds", stage="pricing_grid")
+    def calculate_grid(self, coverage_amounts: List[float], risk_scores: Optional[List[str]] = None,
+                       insurance_types: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Prices every (insurance type, risk tier, coverage amount) combination in
+        one vectorized pass. Premium arrays have shape
+        (len(insurance_types), len(risk_scores), len(coverage_amounts)).
+        Unrounded premiums equal calculate_pricing; rounding uses np.round, so an
+        exact half-cent value can differ from Python's round() by one cent.
+        """
+        insurance_types = [t.lower() for t in (insurance_types or self.insurance_types)]
+        risk_scores = risk_scores or self.risk_tiers
+        coverage = np.asarray(coverage_amounts, dtype=float)
+
+        base = self._base_vector[self.type_indices(insurance_types)]
+        multiplier = self._multiplier_vector[self.tier_indices(risk_scores)]
+
+        _, monthly_total, yearly_total = self.premium_kernel(
+            coverage[None, None, :], base[:, None, None], multiplier[None, :, None],
+            self.processing_fee, self.rider_cost, self.yearly_discount)
+
+        return {
+            "insurance_types": insurance_types,
+            "risk_scores": list(risk_scores),
+            "coverage_amounts": coverage,
+            "monthly_premium": np.round(monthly_total, 2),
+            "yearly_premium": np.round(yearly_total, 2)
+        }
+
+    @metrics.timed("stage_seconds", stage="pricing_batch")
+    def calculate_pricing_batch(self, risk_scores: Any, coverage_amounts: Any, insurance_types: Any) -> Dict[str, np.ndarray]:
+        """
+        Prices one policy per element of the three equal-length sequences in
+        a vectorized pass, e.g. a chunk of a portfolio import. Unrounded
+        values equal calculate_pricing; premiums are rounded with np.round.
+        """
+        coverage = np.asarray(coverage_amounts, dtype=float)
+        # Same rate vectors as calculate_grid; unknown types/tiers get calculate_pricing's defaults
+        base = self._base_vector[self.type_indices(insurance_types)]
+        multiplier = self._multiplier_vector[self.tier_indices(risk_scores)]
+
+        monthly_base, monthly_total, yearly_total = self.premium_kernel(
+            coverage, base, multiplier, self.processing_fee, self.rider_cost, self.yearly_discount)
+
+        return {
+            "multiplier": multiplier,
+            "base_premium": monthly_base,
+            "risk_adjustment": (multiplier - 1.0) * monthly_base,
+            "monthly_total": monthly_total,
+            "monthly_premium": np.round(monthly_total, 2),
+            "yearly_premium": np.round(yearly_total, 2)
+        }
@@ -0,0 +1,267 @@
+import string
+import textwrap
+import threading
+from typing import Dict, Optional, Tuple
+from config import Config
+from utils.metrics import metrics
+from utils.serialization import dumps
+from utils.tokens import count_tokens, truncate_to_tokens
+
+# Free-text values inside structured inputs (client details etc.) are cut to this length
+MAX_STRUCTURED_STRING_CHARS = 500
+
+
+class PromptBudgetError(ValueError):
+    """Raised when a prompt cannot be made to fit its input budget."""
+
+    def __init__(self, endpoint: str, tokens: int, budget: int):
+        super().__init__(f"The {endpoint} prompt needs about {tokens} tokens, over its {budget}-token input budget")
+        self.endpoint = endpoint
+        self.tokens = tokens
+        self.budget = budget
+
+
+class CompiledPrompt(str):
+    """
+    Prompt text that remembers which template built it, its estimated input
+    tokens and its output budget. Behaves as a plain string everywhere else
+    (cache keys, model calls).
+    """
+
+    def __new__(cls, text: str, endpoint: str, input_tokens: int, max_output_tokens: int, truncated: Tuple = ()):
+        prompt = super().__new__(cls, text)
+        prompt.endpoint = endpoint
+        prompt.input_tokens = input_tokens
+        prompt.max_output_tokens = max_output_tokens
+        prompt.truncated = truncated
+        return prompt
+
+
+def _trim_strings(value):
+    if isinstance(value, str):
+        return value if len(value) <= MAX_STRUCTURED_STRING_CHARS else value[:MAX_STRUCTURED_STRING_CHARS] + "..."
+    if isinstance(value, dict):
+        return {key: _trim_strings(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_trim_strings(item) for item in value]
+    return value
+
+
+def to_prompt_text(value) -> str:
+    """Strings pass through; structured values become compact JSON."""
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    return dumps(_trim_strings(value))
+
+
+class PromptTemplate:
+    """
+    A prompt parsed once into literal text and `{field}` slots. Indentation
+    is stripped at compile time, so templates can be written indented in
+    code without sending the whitespace to the model.
+
+    `limits` caps individual fields (in tokens) on every render;
+    `shrinkable` lists the fields, in order, that may be truncated to fit
+    the endpoint budget. Any other field that does not fit is rejected.
+    """
+
+    def __init__(self, name: str, text: str, shrinkable: Tuple[str, ...] = (), limits: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.text = textwrap.dedent(text).strip()
+        self.parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(self.text)]
+        self.fields = [field for _, field in self.parts if field]
+        self.literal_tokens = count_tokens("\n".join(literal for literal, _ in self.parts))
+        self.shrinkable = shrinkable
+        self.limits = limits or {}
+
+    def render(self, values: Dict[str, str]) -> str:
+        return "".join(literal + (values[field] if field else "") for literal, field in self.parts)
+
+
+class PromptCompiler:
+    """
+    Builds every Gemini prompt from registered templates and enforces
+    per-endpoint (input, output) token budgets. Truncation is deterministic,
+    so identical inputs still produce identical prompts (and cache keys).
+    """
+
+    def __init__(self, budgets: Dict[str, Tuple[int, int]]):
+        self.budgets = budgets
+        self.templates = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, template: PromptTemplate):
+        self.templates[template.name] = template
+
+    def _record(self, endpoint: str, **deltas):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                "calls": 0, "truncated": 0, "rejected": 0, "estimated_input_tokens": 0,
+                "measured_calls": 0, "measured_estimated_tokens": 0, "actual_input_tokens": 0
+            })
+            for key, value in deltas.items():
+                stats[key] += value
+
+    def compile(self, name: str, **values) -> CompiledPrompt:
+        template = self.templates[name]
+        input_budget, output_budget = self.budgets[name]
+
+        rendered = {}
+        sizes = {}
+        for field in template.fields:
+            text = to_prompt_text(values.get(field))
+            limit = template.limits.get(field)
+            if limit is not None:
+                text = truncate_to_tokens(text, limit)
+            rendered[field] = text
+            sizes[field] = count_tokens(text)
+
+        total = template.literal_tokens + sum(sizes.values())
+        truncated = []
+        for field in template.shrinkable:
+            if total <= input_budget:
+                break
+            allowed = max(0, input_budget - (total - sizes[field]))
+            rendered[field] = truncate_to_tokens(rendered[field], allowed)
+            size = count_tokens(rendered[field])
+            total -= sizes[field] - size
+            sizes[field] = size
+            truncated.append(field)
+
+        if total > input_budget:
+            self._record(name, rejected=1)
+            raise PromptBudgetError(name, total, input_budget)
+
+        if truncated:
+            print(f"Prompt {name}: truncated {', '.join(truncated)} to fit {input_budget} tokens")
+        self._record(name, calls=1, truncated=1 if truncated else 0, estimated_input_tokens=total)
+        metrics.inc("prompt_tokens_total", total, endpoint=name, kind="estimated")
+        return CompiledPrompt(template.render(rendered), name, total, output_budget, tuple(truncated))
+
+    def generation_config(self, prompt: str) -> Dict:
+        """Keyword arguments for generate_content enforcing the output budget."""
+        if isinstance(prompt, CompiledPrompt):
+            return {"generation_config": {"max_output_tokens": prompt.max_output_tokens}}
+        return {}
+
+    def record_usage(self, prompt: str, response) -> None:
+        """Logs estimated vs. actual input tokens when the API reports usage."""
+        if not isinstance(prompt, CompiledPrompt):
+            return
+        actual = getattr(getattr(response, "usage_metadata", None), "prompt_token_count", None)
+        if actual is None:
+            return
+        print(f"Prompt {prompt.endpoint}: estimated {prompt.input_tokens} input tokens, actual {actual}")
+        self._record(prompt.endpoint, measured_calls=1, measured_estimated_tokens=prompt.input_tokens,
+                     actual_input_tokens=actual)
+        metrics.inc("prompt_tokens_total", actual, endpoint=prompt.endpoint, kind="actual")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._stats.items()}
+        for name, stats in endpoints.items():
+            stats["input_budget"], stats["output_budget"] = self.budgets[name]
+            measured = stats.pop("measured_estimated_tokens")
+            # >1 means the local estimate undercounts what Gemini bills
+            stats["actual_to_estimate_ratio"] = round(stats["actual_input_tokens"] / measured, 3) if measured else None
+        return {"endpoints": endpoints}
+
+
+prompt_compiler = PromptCompiler(Config.PROMPT_BUDGETS)
+
+prompt_compiler.register(PromptTemplate("policy", """
+    Generate a comprehensive, personalized insurance policy for the following client:
+
+    CLIENT DATA:
+    {client_data}
+
+    RISK ASSESSMENT:
+    {risk_result}
+
+    PRICING DETAILS:
+    {pricing_result}
+
+    The policy MUST include:
+    1. Policy Overview (Type, Holder, Duration, Coverage Amount)
+    2. Detailed Coverage (What is covered)
+    3. Terms & Conditions (Standard and personalized based on risk)
+    4. Exclusions (What is not covered)
+    5. Premium and Payment Schedule (Monthly/Yearly breakdown)
+
+    Format the output as a well-structured Markdown document.
+    Keep the tone professional, legalistic, yet clear.
+""", shrinkable=("client_data",)))
+
+# Hybrid generation: everything else in the policy comes from policy_templates/
+prompt_compiler.register(PromptTemplate("policy_narrative", """
+    You are an insurance expert writing the personalized parts of an insurance policy. The overview, standard terms, exclusions and premium schedule are written separately; do not repeat them.
+
+    CLIENT DATA:
+    {client_data}
+
+    INSURANCE: {insurance_type} insurance, coverage amount {coverage_amount}
+
+    RISK ASSESSMENT:
+    {risk_result}
+
+    Write exactly two Markdown sections, with these headings and nothing else:
+    ## Detailed Coverage
+    What is covered for this client, personalized to their profile and risk factors.
+    ## Personalized Terms
+    A short list of conditions specific to this client's risk factors.
+
+    Keep the tone professional, legalistic, yet clear.
+""", shrinkable=("client_data",)))
+
+prompt_compiler.register(PromptTemplate("refine", """
+    You are an insurance expert. I have an existing insurance policy and I want to refine it based on a user's request.
+
+    CURRENT POLICY:
+    ---
+    {current_policy}
+    ---
+
+    USER REFINEMENT REQUEST: "{refinement_prompt}"
+
+    Please update the policy to reflect this request. Ensure the overall structure, legal tone, and consistency are maintained.
+    Output ONLY the updated policy text in Markdown.
+""", limits={"refinement_prompt": 300}))
+
+prompt_compiler.register(PromptTemplate("refine_sections", """
+    You are an insurance expert. I have an existing insurance policy and I want to refine it based on a user's request.
+    The request only affects the section(s) below.
+
+    POLICY OUTLINE (for context, do not output):
+    {outline}
+
+    SECTIONS TO UPDATE:
+    ---
+    {sections_text}
+    ---
+
+    USER REFINEMENT REQUEST: "{refinement_prompt}"
+
+    Rewrite ONLY these sections to reflect this request. Keep every section heading line exactly as given and keep the legal tone consistent with the rest of the policy.
+    Output ONLY the updated sections in Markdown.
+""", shrinkable=("outline",), limits={"refinement_prompt": 300}))
+
+# Context chunks arrive best-first, so truncation drops the least relevant ones
+prompt_compiler.register(PromptTemplate("chatbot", """
+    You are an insurance policy assistant. Answer the following question based ONLY on the provided policy context.
+
+    Policy Context:
+    {policy_context}
+
+    Question: {question}
+
+    Instructions:
+    - Only answer based on the policy context provided
+    - If the answer is not in the policy, say "This information is not available in the provided policy"
+    - Be concise and professional
+    - Do not make assumptions or provide general insurance advice
+
+    Answer:
+""", shrinkable=("policy_context",), limits={"question": 300}))
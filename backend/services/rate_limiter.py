@@ -0,0 +1,231 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from flask import has_request_context, request
+from config import Config
+from utils.metrics import metrics
+
+# Lower value is admitted first
+LANES = {"interactive": 0, "bulk": 1}
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parses "model=rpm:tpm,..." into {model: (rpm, tpm)}. A limit of 0 means
+    unlimited, and "*" applies to every model not listed.
+    """
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        try:
+            limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+        except ValueError:
+            raise ValueError(f"Invalid LLM rate limit {item!r}, expected model=requests_per_min:tokens_per_min")
+    return limits
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute / 60` per second, holding at most
+    `burst_seconds` worth. The level may go negative when a call turns out
+    to cost more than was reserved; later calls then wait for the debt to be
+    repaid.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Calls larger than the burst are admitted once the bucket is full
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+
+class ModelLimiter:
+    """
+    Requests/min and tokens/min admission for one model. Waiters are
+    admitted strictly in (lane, arrival) order, so interactive calls go
+    ahead of any queued bulk generation.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, burst_seconds: float = 5.0):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        wait = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens: float, lane: str, timeout: float) -> bool:
+        """Blocks until the call may be sent; False if that takes longer than `timeout`."""
+        entry = (LANES[lane], next(self._seq))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._cond.notify_all()
+            while True:
+                now = time.monotonic()
+                if self._waiters[0] == entry:
+                    wait = self._wait_time(tokens, now)
+                    if wait <= 0:
+                        heapq.heappop(self._waiters)
+                        if self.requests is not None:
+                            self.requests.take(1, now)
+                        if self.tokens is not None:
+                            self.tokens.take(tokens, now)
+                        self._cond.notify_all()
+                        return True
+                else:
+                    wait = deadline - now
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(min(wait, remaining))
+
+    def settle(self, tokens: float):
+        """Charges tokens that were not known at admission (the response)."""
+        if self.tokens is not None and tokens:
+            with self._cond:
+                self.tokens.take(tokens, time.monotonic())
+
+    def pause(self, seconds: float):
+        """Holds admissions after the API reported the quota exhausted anyway."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "requests_available": round(self.requests.level, 2) if self.requests is not None else None,
+                "tokens_available": round(self.tokens.level) if self.tokens is not None else None,
+                "waiting": len(self._waiters),
+                "paused_for": round(max(0.0, self.paused_until - now), 2)
+            }
+
+
+class RateLimiter:
+    """
+    Client-side admission control for Gemini, per model and per worker
+    process. Configure each model's limits at the share of the project quota
+    this worker may use, so bursts queue here instead of coming back as 429s.
+    Models without limits are never delayed.
+
+    Up to `burst_seconds` of capacity can be used at once, so over any
+    minute a model may see its limit plus one burst; set the limits that
+    much below the quota.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_wait: Dict[str, float], burst_seconds: float = 5.0):
+        self.limits = limits
+        self.max_wait = max_wait
+        self.burst_seconds = burst_seconds
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._stats = {lane: {"admitted": 0, "passed_over": 0, "rejected": 0, "wait_seconds": 0.0} for lane in LANES}
+
+    def _limiter(self, model: str) -> Optional[ModelLimiter]:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limit = self.limits.get(model, self.limits.get("*"))
+            if not limit or not any(limit):
+                return None
+            with self._lock:
+                limiter = self._limiters.setdefault(model, ModelLimiter(*limit, burst_seconds=self.burst_seconds))
+        return limiter
+
+    def acquire(self, model: str, tokens: float, lane: str = "bulk", wait: bool = True) -> bool:
+        """
+        Waits for `model` to have capacity for one call of about `tokens`
+        input tokens. False means the lane's max wait was exceeded and the
+        call should not be sent. With `wait=False` only capacity that is
+        free right now (and not owed to a queued call) is taken.
+        """
+        limiter = self._limiter(model)
+        if limiter is None:
+            return True
+        if not wait:
+            admitted = limiter.acquire(tokens, lane, 0)
+            with self._lock:
+                self._stats[lane]["admitted" if admitted else "passed_over"] += 1
+            return admitted
+        start = time.perf_counter()
+        admitted = limiter.acquire(tokens, lane, self.max_wait[lane])
+        waited = time.perf_counter() - start
+        metrics.observe("llm_admission_wait_seconds", waited, model=model, lane=lane)
+        with self._lock:
+            stats = self._stats[lane]
+            stats["admitted" if admitted else "rejected"] += 1
+            stats["wait_seconds"] += waited
+        if not admitted:
+            print(f"Rate limiter: no {model} capacity within {self.max_wait[lane]:.0f}s for {lane} call")
+            metrics.inc("llm_rate_limited_total", model=model, lane=lane)
+        return admitted
+
+    def settle(self, model: str, tokens: float):
+        limiter = self._limiter(model)
+        if limiter is not None:
+            limiter.settle(tokens)
+
+    def pause(self, model: str, seconds: float):
+        limiter = self._limiter(model)
+        if limiter is not None:
+            limiter.pause(seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lanes = {lane: dict(stats) for lane, stats in self._stats.items()}
+            limiters = dict(self._limiters)
+        for stats in lanes.values():
+            calls = stats["admitted"] + stats["rejected"]
+            stats["avg_wait_seconds"] = round(stats.pop("wait_seconds") / calls, 4) if calls else 0.0
+        return {
+            "limits": {model: {"requests_per_minute": rpm, "tokens_per_minute": tpm}
+                       for model, (rpm, tpm) in self.limits.items()},
+            "lanes": lanes,
+            "models": {model: limiter.snapshot() for model, limiter in limiters.items()}
+        }
+
+
+def current_lane() -> str:
+    """Calls made while serving an interactive endpoint go in the interactive lane; the rest (jobs, bulk) do not."""
+    if has_request_context() and request.path.startswith(Config.LLM_INTERACTIVE_PATHS):
+        return "interactive"
+    return "bulk"
+
+
+# Shared by every AIService instance in the process
+rate_limiter = RateLimiter(
+    parse_limits(Config.LLM_RATE_LIMITS),
+    max_wait={"interactive": Config.LLM_MAX_WAIT_INTERACTIVE, "bulk": Config.LLM_MAX_WAIT_BULK},
+    burst_seconds=Config.LLM_RATE_LIMIT_BURST_SECONDS
+)
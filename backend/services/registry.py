@@ -0,0 +1,116 @@
+import importlib
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+
+class ServiceRegistry:
+    """
+    Process-wide, lazily built services. Each service is registered as an
+    import path ("module:Class") and constructed on first use, so a worker
+    only pays the import and client setup for what it actually serves.
+
+    Services that hold sockets, gRPC channels or threads are registered with
+    fork_safe=False and are dropped in the child after a fork, so workers
+    forked from a gunicorn --preload master rebuild their own clients.
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._instances = {}
+        self._build_ms = {}
+        self._lock = threading.RLock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name: str, target: str, fork_safe: bool = True):
+        with self._lock:
+            self._specs[name] = (target, fork_safe)
+            self._instances.pop(name, None)
+
+    def _resolve(self, target: str):
+        module_name, _, attr = target.partition(":")
+        return getattr(importlib.import_module(module_name), attr)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                if name not in self._specs:
+                    raise KeyError(f"Unknown service: {name}")
+                start = time.perf_counter()
+                instance = self._resolve(self._specs[name][0])()
+                self._build_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+                self._instances[name] = instance
+        return instance
+
+    def proxy(self, name: str) -> "LazyService":
+        return LazyService(self, name)
+
+    def warm(self, names: List[str] = None):
+        """
+        Prepares services ahead of traffic, e.g. in a --preload master:
+        fork-safe services are built, the rest only have their modules
+        imported so forked workers share those pages copy-on-write.
+        """
+        for name in names or list(self._specs):
+            target, fork_safe = self._specs[name]
+            if fork_safe:
+                self.get(name)
+            else:
+                importlib.import_module(target.partition(":")[0])
+
+    def _after_fork(self):
+        # The parent may have held the lock mid-build when it forked
+        self._lock = threading.RLock()
+        for name, (_, fork_safe) in self._specs.items():
+            if not fork_safe:
+                self._instances.pop(name, None)
+                self._build_ms.pop(name, None)
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "services": {
+                name: {
+                    "built": name in self._instances,
+                    "fork_safe": fork_safe,
+                    "build_ms": self._build_ms.get(name)
+                }
+                for name, (_, fork_safe) in self._specs.items()
+            }
+        }
+
+
+class LazyService:
+    """
+    Module-level stand-in for a registry service: attribute access builds
+    the service on first use and forwards to it.
+    """
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"<LazyService {self._name}>"
+
+
+services = ServiceRegistry()
+
+services.register("risk_engine", "services.risk_engine:RiskEngine")
+services.register("pricing_engine", "services.pricing_engine:PricingEngine")
+services.register("ai_service", "services.ai_service:AIService", fork_safe=False)
+services.register("db", "models.supabase_models:SupabaseModels", fork_safe=False)
+services.register("exporter", "utils.exporters:Exporter")
+services.register("ingestor", "utils.ingestion:DocumentIngestor")
+services.register("portfolio_importer", "services.portfolio_import:PortfolioImporter")
+services.register("simulator", "services.simulation:PortfolioSimulator")
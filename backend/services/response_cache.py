@@ -0,0 +1,179 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from utils.lru import LRUTier
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Strips trailing whitespace per line and collapses runs of blank lines,
+    so prompts that differ only in that share a cache entry. Line breaks and
+    indentation are kept, since they can change what the model is asked.
+    """
+    lines = []
+    for line in prompt.strip().splitlines():
+        line = line.rstrip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def make_cache_key(model_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+
+class SQLiteTier:
+    """
+    On-disk tier shared by every worker process on the host. Uses WAL mode so
+    readers in other gunicorn workers are not blocked by writers.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[tuple]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at >= ?",
+            (key, time.time())
+        ).fetchone()
+        return row
+
+    def set(self, key: str, value: str, expires_at: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+
+
+class ResponseCache:
+    """
+    Two-tier content-addressed cache for LLM responses, keyed by
+    sha256(model, normalized prompt).
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 86400, disk_path: Optional[str] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.memory = LRUTier(max_entries, max_bytes, ttl)
+        self.disk = None
+        if enabled and disk_path:
+            try:
+                self.disk = SQLiteTier(disk_path)
+            except sqlite3.Error as e:
+                print(f"Response cache: disk tier disabled ({e})")
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "bypassed": 0, "errors": 0}
+
+    def _lookup(self, key: str) -> tuple:
+        value = self.memory.get(key)
+        if value is not None:
+            return value, "memory_hits"
+        if self.disk is not None:
+            try:
+                row = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"Response cache read error: {e}")
+                self._stats["errors"] += 1
+                row = None
+            if row is not None:
+                value, expires_at = row
+                self.memory.set(key, value, expires_at)
+                return value, "disk_hits"
+        return None, "misses"
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        return self.get_first([model_name], prompt)
+
+    def get_first(self, model_names: List[str], prompt: str) -> Optional[str]:
+        """
+        Returns the cached response of the first model in `model_names` that has
+        one. Counts as a single hit or miss.
+        """
+        if not self.enabled:
+            return None
+        for model_name in model_names:
+            value, outcome = self._lookup(make_cache_key(model_name, prompt))
+            if value is not None:
+                self._stats[outcome] += 1
+                return value
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, model_name: str, prompt: str, value: str):
+        if not self.enabled or not value:
+            return
+        key = make_cache_key(model_name, prompt)
+        expires_at = time.time() + self.ttl
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, expires_at)
+            except sqlite3.Error as e:
+                print(f"Response cache write error: {e}")
+                self._stats["errors"] += 1
+        self._stats["sets"] += 1
+
+    def record_bypass(self):
+        self._stats["bypassed"] += 1
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        stats["memory_bytes"] = self.memory._bytes
+        stats["disk_enabled"] = self.disk is not None
+        return stats
+
+
+# Shared by every AIService instance in the process
+response_cache = ResponseCache(
+    max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=Config.LLM_CACHE_MAX_BYTES,
+    ttl=Config.LLM_CACHE_TTL,
+    disk_path=Config.LLM_CACHE_PATH or None,
+    enabled=Config.LLM_CACHE_ENABLED
+)
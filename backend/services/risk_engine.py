@@ -1,5 +1,9 @@
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Any, List, Dict
+import numpy as np
+from config import Config
+from services.risk_rules import CompiledRule, RuleSetLoader
+from utils.metrics import metrics
 
 class RiskFactor(BaseModel):
     name: str
@@ -13,58 +17,86 @@ class RiskAssessmentResult(BaseModel):
     explanation: str
 
 class RiskEngine:
-    def __init__(self):
-        pass
+    """
+    Scores clients with the declarative rules in Config.RISK_RULES_PATH.
+    Rules are compiled once and recompiled when the file changes.
+    """
 
+    def __init__(self, rules_path: str = None, reload_interval: float = None):
+        self.rules = RuleSetLoader(
+            rules_path or Config.RISK_RULES_PATH,
+            check_interval=reload_interval if reload_interval is not None else Config.RISK_RULES_RELOAD_INTERVAL,
+            factor_type=RiskFactor
+        )
+
+    def _explain(self, score: str, hits: List[CompiledRule]) -> str:
+        return f"Risk assessment concluded with a {score} risk level due to factors: " + ", ".join([rule.name for rule in hits])
+
+    @metrics.timed("stage_seconds", stage="risk")
     def calculate_risk(self, client_data: Dict) -> RiskAssessmentResult:
         """
         Calculates risk based on age, lifestyle, medical history, and driving history.
         """
-        score_value = 0.5
-        factors = []
-        
-        # Age-based risk
-        age = client_data.get('age', 30)
-        if age > 60:
-            score_value += 0.2
-            factors.append(RiskFactor(name="Age", impact="High", description="Client is over 60, increasing health risk."))
-        elif age < 25:
-            score_value += 0.1
-            factors.append(RiskFactor(name="Age", impact="Medium", description="Young client, potentially higher risk for certain insurance types."))
-
-        # Income-based stability
-        income = client_data.get('income', 50000)
-        if income < 20000:
-            score_value += 0.1
-            factors.append(RiskFactor(name="Income", impact="Medium", description="Lower income may affect payment consistency."))
-
-        # Medical History
-        has_medical_issues = client_data.get('medical_history', False)
-        if has_medical_issues:
-            score_value += 0.3
-            factors.append(RiskFactor(name="Medical History", impact="High", description="Pre-existing conditions increase premium."))
-
-        # Lifestyle factors
-        lifestyle = client_data.get('lifestyle', 'standard')
-        if lifestyle == 'high_risk':
-            score_value += 0.2
-            factors.append(RiskFactor(name="Lifestyle", impact="High", description="Engages in high-risk activities."))
+        rule_set = self.rules.current()
+        score_value, hits = rule_set.evaluate(client_data)
 
         # Normalize score
         score_value = min(1.0, max(0.0, score_value))
-        
-        if score_value < 0.4:
-            score = "Low"
-        elif score_value < 0.7:
-            score = "Medium"
-        else:
-            score = "High"
-
-        explanation = f"Risk assessment concluded with a {score} risk level due to factors: " + ", ".join([f.name for f in factors])
+        score = rule_set.level(score_value)
 
         return RiskAssessmentResult(
             score=score,
             score_value=score_value,
-            factors=factors,
-            explanation=explanation
+            factors=[rule.factor for rule in hits],
+            explanation=self._explain(score, hits)
         )
+
+    def _column(self, columns: Dict[str, Any], name: str, default: Any, count: int) -> np.ndarray:
+        values = columns.get(name)
+        if values is None:
+            return np.full(count, default, dtype=object)
+        array = np.asarray(values, dtype=object)
+        # Missing cells fall back to the same defaults as the scalar path
+        array[array == None] = default  # noqa: E711
+        return array
+
+    def _to_columns(self, clients: Any, fields: List[str]) -> Dict[str, Any]:
+        """
+        Accepts a list of client dicts, a dict of columns (lists or NumPy arrays)
+        or an Arrow table/record batch.
+        """
+        if hasattr(clients, 'to_pydict'):
+            return clients.to_pydict()
+        if isinstance(clients, dict):
+            return clients
+        return {name: [client.get(name) for client in clients] for name in fields}
+
+    @metrics.timed("stage_seconds", stage="risk_batch")
+    def calculate_risk_batch(self, clients: Any, include_factors: bool = False) -> Dict[str, Any]:
+        """
+        Scores many clients at once by evaluating each rule as an array operation.
+        Gives the same scores as `calculate_risk`. Factor objects and
+        explanations are only built when `include_factors` is True.
+        """
+        rule_set = self.rules.current()
+        fields = list(dict.fromkeys(rule.field for rule in rule_set.rules))
+        columns = self._to_columns(clients, fields)
+        count = len(next(iter(columns.values()))) if columns else 0
+
+        score_value, matches = rule_set.evaluate_columns(
+            lambda name, default: self._column(columns, name, default, count), count
+        )
+        score_value = np.clip(score_value, 0.0, 1.0)
+        score = rule_set.levels_for(score_value)
+
+        result = {"count": count, "score": score, "score_value": score_value}
+        if include_factors:
+            factors = []
+            explanations = []
+            for i in range(count):
+                hits = rule_set.matched_rules(matches, i)
+                factors.append([rule.factor for rule in hits])
+                explanations.append(self._explain(score[i], hits))
+            result["factors"] = factors
+            result["explanation"] = explanations
+        return result
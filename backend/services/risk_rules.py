@@ -0,0 +1,311 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+
+class RuleSetError(ValueError):
+    pass
+
+
+# op -> (Python expression over `v` and the rule constant `{c}`, vectorized test builder)
+OPERATORS = {
+    "gt": ("v > {c}", lambda c: lambda col: col > c),
+    "ge": ("v >= {c}", lambda c: lambda col: col >= c),
+    "lt": ("v < {c}", lambda c: lambda col: col < c),
+    "le": ("v <= {c}", lambda c: lambda col: col <= c),
+    "eq": ("v == {c}", lambda c: lambda col: col == c),
+    "ne": ("v != {c}", lambda c: lambda col: col != c),
+    "in": ("v in {c}", lambda c: lambda col: np.isin(col, list(c))),
+    "not_in": ("v not in {c}", lambda c: lambda col: ~np.isin(col, list(c))),
+    "between": ("{c}[0] <= v <= {c}[1]", lambda c: lambda col: (col >= c[0]) & (col <= c[1])),
+    "truthy": ("v", lambda c: lambda col: col),
+    "falsy": ("not v", lambda c: lambda col: ~col),
+}
+VALUELESS_OPS = {"truthy", "falsy"}
+
+
+class CompiledRule:
+    """
+    One rule after compilation. `factor` is the result object built once at
+    load time and shared by every evaluation that hits the rule.
+    """
+    __slots__ = ("name", "impact", "description", "weight", "field", "op", "value", "vector_test", "kind", "factor")
+
+    def __init__(self, name: str, impact: str, description: str, weight: float, field: str,
+                 op: str, value: Any, vector_test: Callable, kind: str, factor: Any = None):
+        self.name = name
+        self.impact = impact
+        self.description = description
+        self.weight = weight
+        self.field = field
+        self.op = op
+        self.value = value
+        self.vector_test = vector_test
+        self.kind = kind
+        self.factor = factor
+
+
+def _column_kind(op: str, value: Any) -> str:
+    if op in VALUELESS_OPS:
+        return "bool"
+    sample = next(iter(value), None) if isinstance(value, (list, tuple)) else value
+    if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        return "number"
+    return "object"
+
+
+def _compile_rule(spec: Dict, position: int, factor_type: Optional[Callable]) -> Tuple[CompiledRule, Any]:
+    for key in ("name", "field", "op", "weight"):
+        if key not in spec:
+            raise RuleSetError(f"Rule {position} is missing '{key}'")
+    op = spec["op"]
+    if op not in OPERATORS:
+        raise RuleSetError(f"Rule {position} ({spec['name']}) has unknown op '{op}'")
+    value = spec.get("value")
+    if op not in VALUELESS_OPS and value is None:
+        raise RuleSetError(f"Rule {position} ({spec['name']}) needs a 'value' for op '{op}'")
+    if op in ("in", "not_in", "between") and not isinstance(value, (list, tuple)):
+        raise RuleSetError(f"Rule {position} ({spec['name']}) needs a list 'value' for op '{op}'")
+    if op == "between" and len(value) != 2:
+        raise RuleSetError(f"Rule {position} ({spec['name']}) needs [low, high] for op 'between'")
+
+    impact = spec.get("impact", "Medium")
+    description = spec.get("description", "")
+    if op in ("in", "not_in"):
+        value = frozenset(value)
+    elif op == "between":
+        value = tuple(value)
+    rule = CompiledRule(
+        name=spec["name"],
+        impact=impact,
+        description=description,
+        weight=float(spec["weight"]),
+        field=spec["field"],
+        op=op,
+        value=value,
+        vector_test=OPERATORS[op][1](value),
+        kind=spec.get("type") or _column_kind(op, value),
+        factor=factor_type(name=spec["name"], impact=impact, description=description) if factor_type else None
+    )
+    return rule, spec.get("default")
+
+
+class CompiledRuleSet:
+    """
+    Rules compiled into evaluation steps. Each step reads one field and tries
+    its rules in order (a group of exclusive rules, or a single rule). For
+    single clients the steps are turned into one generated Python function
+    with the thresholds inlined, so scoring does no per-rule dispatch.
+    """
+
+    def __init__(self, spec: Dict, factor_type: Optional[Callable] = None, source: str = None):
+        if not isinstance(spec, dict) or not isinstance(spec.get("rules"), list):
+            raise RuleSetError("Rule set must be a mapping with a 'rules' list")
+        self.source = source
+        self.base_score = float(spec.get("base_score", 0.0))
+        self.levels = self._compile_levels(spec.get("levels") or [{"score": "Default"}])
+        self.rules: List[CompiledRule] = []
+
+        steps = []
+        groups = {}
+        for position, rule_spec in enumerate(spec["rules"]):
+            rule, default = _compile_rule(rule_spec, position, factor_type)
+            self.rules.append(rule)
+            group = rule_spec.get("group")
+            if group is not None and group in groups:
+                step = groups[group]
+                if step[0] != rule.field:
+                    raise RuleSetError(f"Group '{group}' mixes fields '{step[0]}' and '{rule.field}'")
+                step[2].append(rule)
+                continue
+            step = (rule.field, default, [rule])
+            steps.append(step)
+            if group is not None:
+                groups[group] = step
+        self._steps = tuple((field, default, tuple(rules)) for field, default, rules in steps)
+        self.evaluate = self._generate_evaluator()
+
+    def _compile_levels(self, levels: List[Dict]) -> Tuple[Tuple[float, ...], Tuple[str, ...]]:
+        bounds = []
+        names = []
+        for level in levels:
+            if "score" not in level:
+                raise RuleSetError("Every level needs a 'score'")
+            names.append(level["score"])
+            if "below" in level:
+                bounds.append(float(level["below"]))
+        if len(bounds) != len(names) - 1 or bounds != sorted(bounds):
+            raise RuleSetError("Levels need ascending 'below' bounds and one final unbounded level")
+        return tuple(bounds), tuple(names)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def level(self, score_value: float) -> str:
+        bounds, names = self.levels
+        for bound, name in zip(bounds, names):
+            if score_value < bound:
+                return name
+        return names[-1]
+
+    def _generate_evaluator(self) -> Callable[[Dict], Tuple[float, List[CompiledRule]]]:
+        """
+        Builds `evaluate(client) -> (unclamped score, matched rules in rule
+        order)`. Weights are added in rule order so scores match the original
+        hand-written chain. Numbers and strings are inlined via repr(); any
+        other value (sets, booleans, the rule records) is bound as a global of
+        the generated function, never spliced into its source.
+        """
+        namespace = {"base_score": self.base_score}
+        field_vars = {}
+        lines = ["def evaluate(client):", "    get = client.get", "    score = base_score", "    hits = []"]
+
+        def constant(value: Any) -> str:
+            if isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)):
+                return repr(value)
+            name = f"c{len(namespace)}"
+            namespace[name] = value
+            return name
+
+        for field, default, rules in self._steps:
+            raw = field_vars.get(field)
+            if raw is None:
+                raw = field_vars[field] = f"f{len(field_vars)}"
+                lines.append(f"    {raw} = get({constant(field)})")
+            lines.append(f"    v = {constant(default)} if {raw} is None else {raw}")
+            for index, rule in enumerate(rules):
+                rule_name = constant(rule)
+                test = OPERATORS[rule.op][0].format(c=constant(rule.value))
+                lines.append(f"    {'if' if index == 0 else 'elif'} {test}:")
+                lines.append(f"        score += {constant(rule.weight)}")
+                lines.append(f"        hits.append({rule_name})")
+        lines.append("    return score, hits")
+        exec(compile("\n".join(lines), f"<risk rules {self.source or 'inline'}>", "exec"), namespace)
+        return namespace["evaluate"]
+
+    def _cast(self, array: np.ndarray, kind: str) -> np.ndarray:
+        if kind == "number":
+            return array.astype(float)
+        if kind == "bool":
+            return array.astype(bool)
+        return array
+
+    def evaluate_columns(self, column: Callable[[str, Any], np.ndarray], count: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Vectorized `evaluate`. `column(field, default)` returns an object array
+        with missing cells filled in. Returns (unclamped scores, per-step index
+        of the matched rule or -1).
+        """
+        score = np.full(count, self.base_score)
+        matches = []
+        cast_cache = {}
+        for field, default, rules in self._steps:
+            contribution = np.zeros(count)
+            matched = np.full(count, -1, dtype=np.int32)
+            remaining = np.ones(count, dtype=bool)
+            for index, rule in enumerate(rules):
+                key = (field, repr(default), rule.kind)
+                values = cast_cache.get(key)
+                if values is None:
+                    values = cast_cache[key] = self._cast(column(field, default), rule.kind)
+                hit = np.asarray(rule.vector_test(values), dtype=bool) & remaining
+                contribution[hit] = rule.weight
+                matched[hit] = index
+                remaining &= ~hit
+            score += contribution
+            matches.append(matched)
+        return score, matches
+
+    def matched_rules(self, matches: List[np.ndarray], row: int) -> List[CompiledRule]:
+        hits = []
+        for (_, _, rules), matched in zip(self._steps, matches):
+            index = matched[row]
+            if index >= 0:
+                hits.append(rules[index])
+        return hits
+
+    def levels_for(self, score_value: np.ndarray) -> np.ndarray:
+        bounds, names = self.levels
+        return np.asarray(names, dtype=object)[np.searchsorted(bounds, score_value, side="right")]
+
+
+def load_rule_spec(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise RuleSetError("PyYAML is required for YAML rule files; install it or use JSON")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class RuleSetLoader:
+    """
+    Holds the compiled rule set for a file and recompiles it when the file's
+    mtime changes, checking at most every `check_interval` seconds (0 turns
+    hot reload off). A rule file that fails to compile is reported and the
+    previous rule set stays active.
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0, factor_type: Optional[Callable] = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.factor_type = factor_type
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._failed_mtime = None
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.last_error = None
+        self.rule_set = self._compile()
+
+    def _compile(self) -> CompiledRuleSet:
+        mtime = os.path.getmtime(self.path)
+        rule_set = CompiledRuleSet(load_rule_spec(self.path), factor_type=self.factor_type, source=self.path)
+        self._mtime = mtime
+        self.loaded_at = time.time()
+        self.last_error = None
+        return rule_set
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Recompiles if the file changed (or always when `force`). Returns True
+        if a new rule set was installed.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtime = None
+            try:
+                mtime = os.path.getmtime(self.path)
+                # A file that already failed to compile is not retried until it changes again
+                if not force and mtime in (self._mtime, self._failed_mtime):
+                    return False
+                self.rule_set = self._compile()
+                print(f"Loaded {len(self.rule_set)} risk rules from {self.path}")
+                return True
+            except Exception as e:
+                self._failed_mtime = mtime
+                self.last_error = str(e)
+                print(f"Risk rules reload failed, keeping previous rules: {e}")
+                if force:
+                    raise
+                return False
+
+    def current(self) -> CompiledRuleSet:
+        if self.check_interval > 0 and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        return self.rule_set
+
+    def status(self) -> Dict:
+        return {
+            "path": self.path,
+            "rule_count": len(self.rule_set),
+            "loaded_at": self.loaded_at,
+            "hot_reload_interval": self.check_interval,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,257 @@
+import math
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from config import Config
+from services.pricing_engine import PricingEngine
+from services.registry import services
+from utils.metrics import metrics
+from utils.process_pool import LazyProcessPool
+
+DEFAULT_PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+# Annual probability of a claim per risk tier, and the claim size as a Beta-distributed share of coverage
+DEFAULT_CLAIM_PROBABILITY = {"Low": 0.005, "Medium": 0.01, "High": 0.025}
+DEFAULT_SEVERITY = {"mean": 0.3, "concentration": 4.0}
+OUTPUTS = ("yearly_premium", "losses", "loss_ratio", "avg_monthly_premium", "claims")
+
+
+class SimulationError(ValueError):
+    pass
+
+
+def _cdf(weights: Dict[str, float], names: List[str], label: str) -> np.ndarray:
+    unknown = [name for name in weights if name not in names]
+    if unknown:
+        raise SimulationError(f"Unknown {label}: {', '.join(unknown)} (expected {', '.join(names)})")
+    values = np.array([float(weights.get(name, 0.0)) for name in names])
+    if (values < 0).any() or values.sum() <= 0:
+        raise SimulationError(f"{label} weights must be non-negative and not all zero")
+    return np.cumsum(values / values.sum())
+
+
+def _mapping(spec: Dict, name: str) -> Dict:
+    value = spec.get(name) or {}
+    if not isinstance(value, dict):
+        raise SimulationError(f"{name} must be an object")
+    return value
+
+
+def _draw(rng: np.random.Generator, cdf: np.ndarray, shape) -> np.ndarray:
+    # Inverse CDF on uniforms; much faster than rng.choice with probabilities
+    return np.minimum(np.searchsorted(cdf, rng.random(shape), side="right"), len(cdf) - 1)
+
+
+def _shock(rng: np.random.Generator, volatility: float, count: int) -> np.ndarray:
+    """Per-scenario multiplicative shock, lognormal with mean 1."""
+    if not volatility:
+        return np.ones(count)
+    return rng.lognormal(-0.5 * volatility ** 2, volatility, count)
+
+
+def simulate_block(params: Dict, scenario_count: int, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """
+    Simulates `scenario_count` portfolio years of `params["portfolio_size"]`
+    policies and returns per-scenario totals. Policies are drawn in slices
+    of at most `params["chunk_draws"]` (scenarios x policies) so memory stays
+    bounded. Runs inside pool workers, so it only uses `params`.
+    """
+    rng = np.random.default_rng(seed)
+    size = params["portfolio_size"]
+    rate_shock = _shock(rng, params["base_rate_volatility"], scenario_count)[:, None]
+    frequency_shock = _shock(rng, params["frequency_volatility"], scenario_count)[:, None]
+    totals = {name: np.zeros(scenario_count) for name in ("yearly_premium", "monthly_premium", "losses", "claims")}
+    rows = np.arange(scenario_count)[:, None]
+
+    policy_slice = max(1, min(size, params["chunk_draws"] // scenario_count))
+    for start in range(0, size, policy_slice):
+        shape = (scenario_count, min(policy_slice, size - start))
+        types = _draw(rng, params["type_cdf"], shape)
+        if params["score_beta"] is not None:
+            # Risk tiers from a score distribution, cut at the risk rules' level bounds
+            alpha, beta = params["score_beta"]
+            tiers = np.searchsorted(params["level_bounds"], rng.beta(alpha, beta, shape), side="right")
+        else:
+            tiers = _draw(rng, params["tier_cdf"], shape)
+        if params["coverage_cdf"] is not None:
+            coverage = params["coverage_amounts"][_draw(rng, params["coverage_cdf"], shape)]
+        else:
+            coverage = rng.lognormal(params["coverage_mu"], params["coverage_sigma"], shape)
+            np.clip(coverage, params["coverage_min"], params["coverage_max"], out=coverage)
+
+        _, monthly, yearly = PricingEngine.premium_kernel(
+            coverage, params["base_rates"][types], params["multipliers"][tiers], params["processing_fee"],
+            params["rider_cost"], params["yearly_discount"], rate_shock=rate_shock)
+        totals["monthly_premium"] += monthly.sum(axis=1)
+        totals["yearly_premium"] += yearly.sum(axis=1)
+
+        claimed = rng.random(shape) < params["claim_probability"][tiers] * frequency_shock
+        claim_rows = np.broadcast_to(rows, shape)[claimed]
+        severity = rng.beta(params["severity_alpha"], params["severity_beta"], len(claim_rows))
+        totals["losses"] += np.bincount(claim_rows, weights=coverage[claimed] * severity, minlength=scenario_count)
+        totals["claims"] += np.bincount(claim_rows, minlength=scenario_count)
+    return totals
+
+
+def summarize(values: np.ndarray, percentiles: List[float]) -> Dict[str, float]:
+    summary = {"mean": float(values.mean()), "std": float(values.std())}
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{percentile:g}"] = float(value)
+    return summary
+
+
+class PortfolioSimulator:
+    """
+    Monte Carlo stress test of premiums and portfolio losses. Each scenario
+    is one year of a portfolio of `portfolio_size` policies whose type,
+    risk tier and coverage are drawn from the requested mix, priced with
+    PricingEngine's rates (optionally overridden and shocked per scenario)
+    and hit by claims with a per-tier probability. Risk tiers come either
+    from a `tier_mix` or from a Beta `score_distribution` cut at the current
+    risk rules' level bounds.
+
+    Scenarios are simulated in blocks of about `chunk_draws` policy draws,
+    each with its own child of the request's seed, so a seed gives the same
+    result whether blocks run inline or across the process pool.
+    """
+
+    def __init__(self, workers: int = None, chunk_draws: int = None, max_draws: int = None,
+                 max_scenarios: int = None):
+        self.risk_engine = services.proxy('risk_engine')
+        self.pricing_engine = services.proxy('pricing_engine')
+        self.pool = LazyProcessPool(workers if workers is not None else Config.SIMULATION_WORKERS)
+        self.chunk_draws = chunk_draws or Config.SIMULATION_CHUNK_DRAWS
+        self.max_draws = max_draws or Config.SIMULATION_MAX_DRAWS
+        self.max_scenarios = max_scenarios or Config.SIMULATION_MAX_SCENARIOS
+
+    def build_params(self, spec: Dict) -> Dict:
+        """Validates a request spec and resolves it against the pricing and risk engines."""
+        scenarios = int(spec.get("scenarios", 1000))
+        portfolio_size = int(spec.get("portfolio_size", 1000))
+        if scenarios < 1 or portfolio_size < 1:
+            raise SimulationError("scenarios and portfolio_size must be positive")
+        if scenarios * portfolio_size > self.max_draws:
+            raise SimulationError(f"Too many draws ({scenarios * portfolio_size}, max {self.max_draws})")
+        # Draws are streamed in blocks, but every scenario's totals are kept for the percentiles
+        if scenarios > self.max_scenarios:
+            raise SimulationError(f"Too many scenarios ({scenarios}, max {self.max_scenarios})")
+
+        pricing = self.pricing_engine
+        base_rates = dict(pricing.base_rates)
+        rate_overrides = _mapping(spec, "base_rates")
+        unknown = [name for name in rate_overrides if name not in base_rates]
+        if unknown:
+            raise SimulationError(f"Unknown insurance type in base_rates: {', '.join(unknown)}")
+        base_rates.update({name: float(rate) for name, rate in rate_overrides.items()})
+        types = list(base_rates)
+
+        score_distribution = _mapping(spec, "score_distribution")
+        if score_distribution:
+            bounds, tiers = self.risk_engine.rules.current().levels
+            score_beta = (float(score_distribution.get("alpha", 2.0)), float(score_distribution.get("beta", 5.0)))
+            if min(score_beta) <= 0:
+                raise SimulationError("score_distribution alpha and beta must be positive")
+            tier_cdf = None
+        else:
+            bounds, tiers = [], list(pricing.risk_multipliers)
+            score_beta = None
+            tier_cdf = _cdf(_mapping(spec, "tier_mix") or {tier: 1.0 for tier in tiers}, tiers, "risk tier")
+        claim_probability = {**DEFAULT_CLAIM_PROBABILITY, **_mapping(spec, "claim_probability")}
+        if any(not 0 <= float(p) <= 1 for p in claim_probability.values()):
+            raise SimulationError("claim probabilities must be between 0 and 1")
+
+        coverage = _mapping(spec, "coverage")
+        coverage_cdf = coverage_amounts = None
+        if coverage.get("amounts"):
+            coverage_amounts = np.asarray(coverage["amounts"], dtype=float)
+            weights = coverage.get("weights") or [1.0] * len(coverage_amounts)
+            if len(weights) != len(coverage_amounts):
+                raise SimulationError("coverage weights must match coverage amounts")
+            coverage_cdf = _cdf(dict(enumerate(weights)), list(range(len(weights))), "coverage")
+        median = float(coverage.get("median", 100000))
+        sigma = float(coverage.get("sigma", 0.5))
+        if median <= 0 or sigma < 0:
+            raise SimulationError("coverage median must be positive and sigma non-negative")
+
+        severity = {**DEFAULT_SEVERITY, **_mapping(spec, "severity")}
+        mean, concentration = float(severity["mean"]), float(severity["concentration"])
+        if not 0 < mean < 1 or concentration <= 0:
+            raise SimulationError("severity mean must be in (0, 1) and concentration positive")
+
+        percentiles = [float(p) for p in spec.get("percentiles") or DEFAULT_PERCENTILES]
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise SimulationError("percentiles must be between 0 and 100")
+        seed = spec.get("seed")
+        return {
+            "scenarios": scenarios,
+            "portfolio_size": portfolio_size,
+            "seed": int(seed) if seed is not None else int(np.random.SeedSequence().entropy % 2 ** 63),
+            "percentiles": percentiles,
+            "chunk_draws": self.chunk_draws,
+            "insurance_types": types,
+            "risk_tiers": list(tiers),
+            "type_cdf": _cdf(_mapping(spec, "type_mix") or {name: 1.0 for name in types}, types, "insurance type"),
+            "tier_cdf": tier_cdf,
+            "score_beta": score_beta,
+            "level_bounds": np.asarray(bounds, dtype=float),
+            "base_rates": np.array([base_rates[name] for name in types]),
+            # Tiers the pricing engine does not know price at 1.0x, as in calculate_pricing
+            "multipliers": np.array([pricing.risk_multipliers.get(tier, 1.0) for tier in tiers]),
+            "claim_probability": np.array([float(claim_probability.get(tier, 0.0)) for tier in tiers]),
+            "processing_fee": pricing.processing_fee,
+            "rider_cost": pricing.rider_cost,
+            "yearly_discount": pricing.yearly_discount,
+            "base_rate_volatility": float(spec.get("base_rate_volatility", 0.0)),
+            "frequency_volatility": float(spec.get("frequency_volatility", 0.1)),
+            "coverage_cdf": coverage_cdf,
+            "coverage_amounts": coverage_amounts,
+            "coverage_mu": math.log(median),
+            "coverage_sigma": sigma,
+            "coverage_min": float(coverage.get("min", 0.0)),
+            "coverage_max": float(coverage.get("max", math.inf)),
+            "severity_alpha": mean * concentration,
+            "severity_beta": (1 - mean) * concentration
+        }
+
+    @metrics.timed("stage_seconds", stage="simulation")
+    def simulate(self, spec: Dict, parallel: Optional[bool] = None) -> Dict:
+        """
+        Runs the simulation described by `spec` and returns mean, std and
+        percentiles across scenarios for each output. `parallel=False`
+        keeps every block in this process.
+        """
+        params = self.build_params(spec)
+        start = time.perf_counter()
+        scenarios = params["scenarios"]
+        per_block = max(1, self.chunk_draws // params["portfolio_size"])
+        blocks = [(offset, min(per_block, scenarios - offset)) for offset in range(0, scenarios, per_block)]
+        seeds = np.random.SeedSequence(params["seed"]).spawn(len(blocks))
+
+        use_pool = len(blocks) > 1 and parallel is not False and self.pool.workers > 0
+        if use_pool:
+            futures = [self.pool.submit(simulate_block, params, count, seed) for (_, count), seed in zip(blocks, seeds)]
+            results = [future.result() for future in futures]
+        else:
+            results = [simulate_block(params, count, seed) for (_, count), seed in zip(blocks, seeds)]
+
+        totals = {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+        outputs = {
+            "yearly_premium": totals["yearly_premium"],
+            "losses": totals["losses"],
+            "loss_ratio": totals["losses"] / totals["yearly_premium"],
+            "avg_monthly_premium": totals["monthly_premium"] / params["portfolio_size"],
+            "claims": totals["claims"]
+        }
+        elapsed = time.perf_counter() - start
+        return {
+            "seed": params["seed"],
+            "scenarios": scenarios,
+            "portfolio_size": params["portfolio_size"],
+            "draws": scenarios * params["portfolio_size"],
+            "blocks": len(blocks),
+            "workers": self.pool.workers if use_pool else 0,
+            "elapsed_seconds": round(elapsed, 3),
+            "insurance_types": params["insurance_types"],
+            "risk_tiers": params["risk_tiers"],
+            "summary": {name: summarize(outputs[name], params["percentiles"]) for name in OUTPUTS},
+            "probability_loss_ratio_above_1": float((outputs["loss_ratio"] > 1).mean())
+        }
@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from config import Config
+from utils.metrics import metrics
+
+
+class CoalescedCallError(RuntimeError):
+    """Raised in a worker whose coalesced call failed in another worker process."""
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SQLiteFlightStore:
+    """
+    In-flight claims and recent outcomes in a SQLite file, so identical calls
+    in different gunicorn workers on the host are coalesced too. A claim is
+    a lease: if the owning worker dies, it can be taken over once it expires.
+    """
+
+    PRUNE_EVERY = 100
+    # Outcomes are only read by callers that were waiting when they were published
+    RESULT_RETENTION = 60.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS flight_results ("
+            "key TEXT PRIMARY KEY, value TEXT, error TEXT, finished_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def claim(self, key: str, now: float, lease: float) -> bool:
+        conn = self._conn()
+        cursor = conn.execute("INSERT OR IGNORE INTO flights (key, expires_at) VALUES (?, ?)", (key, now + lease))
+        if cursor.rowcount == 0:
+            cursor = conn.execute("UPDATE flights SET expires_at = ? WHERE key = ? AND expires_at <= ?",
+                                  (now + lease, key, now))
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def publish(self, key: str, value: Optional[str], error: Optional[str]):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO flight_results (key, value, error, finished_at) VALUES (?, ?, ?, ?)",
+                     (key, value, error, now))
+        conn.execute("DELETE FROM flights WHERE key = ?", (key,))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM flight_results WHERE finished_at < ?", (now - self.RESULT_RETENTION,))
+        conn.commit()
+
+    def outcome(self, key: str, since: float) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        return self._conn().execute(
+            "SELECT value, error FROM flight_results WHERE key = ? AND finished_at >= ?", (key, since)
+        ).fetchone()
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent callers of `do` with the same key share
+    one execution of `fn` and all receive its result or exception. Threads
+    of a worker wait on the leader directly; with a store, the leaders of
+    different workers coordinate through it and the losers poll for the
+    published outcome.
+
+    A caller that waits longer than `wait_timeout` gives up on the shared
+    call and runs `fn` itself. Errors from another worker arrive as
+    CoalescedCallError, except those of a type listed in `shared_errors`,
+    which are re-raised as that type so callers can handle them as usual.
+    """
+
+    def __init__(self, store=None, enabled: bool = True, wait_timeout: float = 120.0, poll_interval: float = 0.05):
+        self.store = store
+        self.enabled = enabled
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0, "coalesced_across_workers": 0, "wait_timeouts": 0, "store_errors": 0}
+
+    def do(self, key: str, fn: Callable[[], str], shared_errors: Tuple[type, ...] = ()) -> str:
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            metrics.inc("llm_coalesced_total", scope="thread")
+            if not flight.done.wait(self.wait_timeout):
+                print("Coalesced call timed out waiting for the in-flight request, calling directly")
+                self._stats["wait_timeouts"] += 1
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run_shared(key, fn, shared_errors) if self.store is not None else fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _run_shared(self, key: str, fn: Callable[[], str], shared_errors: Tuple[type, ...]) -> str:
+        started = time.time()
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            try:
+                claimed = self.store.claim(key, time.time(), self.wait_timeout)
+            except sqlite3.Error as e:
+                print(f"Singleflight store error: {e}, calling directly")
+                self._stats["store_errors"] += 1
+                return fn()
+            if claimed:
+                return self._run_and_publish(key, fn)
+
+            if not waited:
+                waited = True
+                self._stats["coalesced_across_workers"] += 1
+                metrics.inc("llm_coalesced_total", scope="worker")
+            time.sleep(self.poll_interval)
+            try:
+                outcome = self.store.outcome(key, started)
+            except sqlite3.Error as e:
+                print(f"Singleflight store error: {e}, calling directly")
+                self._stats["store_errors"] += 1
+                return fn()
+            if outcome is not None:
+                value, error = outcome
+                if error is not None:
+                    raise self._rebuild_error(error, shared_errors)
+                return value
+            if time.monotonic() > deadline:
+                print("Coalesced call timed out waiting for another worker, calling directly")
+                self._stats["wait_timeouts"] += 1
+                return fn()
+
+    @staticmethod
+    def _rebuild_error(error: str, shared_errors: Tuple[type, ...]) -> Exception:
+        # Published as "<type name>: <message>"
+        name, _, message = error.partition(": ")
+        for error_type in shared_errors:
+            if error_type.__name__ == name:
+                return error_type(message)
+        return CoalescedCallError(error)
+
+    def _run_and_publish(self, key: str, fn: Callable[[], str]) -> str:
+        try:
+            value = fn()
+        except Exception as e:
+            self._publish(key, None, f"{type(e).__name__}: {e}")
+            raise
+        self._publish(key, value, None)
+        return value
+
+    def _publish(self, key: str, value: Optional[str], error: Optional[str]):
+        try:
+            self.store.publish(key, value, error)
+        except sqlite3.Error as e:
+            # Waiting workers fall back to calling directly once the lease expires
+            print(f"Singleflight store error: {e}")
+            self._stats["store_errors"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        stats["enabled"] = self.enabled
+        stats["cross_worker"] = self.store is not None
+        return stats
+
+
+def _create_store():
+    if Config.SINGLEFLIGHT_ENABLED and Config.SINGLEFLIGHT_PATH:
+        try:
+            return SQLiteFlightStore(Config.SINGLEFLIGHT_PATH)
+        except sqlite3.Error as e:
+            print(f"Singleflight: coalescing within this worker only ({e})")
+    return None
+
+
+# Shared by every AIService instance in the process (and across workers via SQLite)
+singleflight = SingleFlight(
+    store=_create_store(),
+    enabled=Config.SINGLEFLIGHT_ENABLED,
+    wait_timeout=Config.SINGLEFLIGHT_WAIT_SECONDS
+)
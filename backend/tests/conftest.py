@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep tests off the real services in .env (load_dotenv does not override these)
+os.environ.update({"GEMINI_API_KEY": "fake", "SUPABASE_URL": "", "SUPABASE_KEY": "", "DB_BACKEND": "none",
+                   "LLM_CACHE_ENABLED": "false", "MODEL_HEALTH_PATH": "", "JOB_STORE_PATH": ":memory:"})
@@ -0,0 +1,48 @@
+from services.policy_sections import parse_sections, select_sections, splice_sections
+
+POLICY = """# Policy
+
+Intro text.
+
+## Coverage
+
+Covers accidents.
+
+## Exclusions
+
+Excludes war.
+
+## Claims
+
+File within 30 days.
+"""
+
+
+def test_splice_keeps_nested_subheadings_of_a_rewritten_section():
+    preamble, level, sections = parse_sections(POLICY)
+    selected = select_sections(sections, "Clarify the exclusions", max_sections=1)
+    assert [sections[i]["heading"] for i in selected] == ["Exclusions"]
+
+    updated_text = """## Exclusions
+
+### Acts of war
+
+Excludes war and terrorism.
+
+### Intentional harm
+
+Excludes self-inflicted injuries.
+"""
+    updated = splice_sections(preamble, sections, level, updated_text, selected)
+
+    assert updated is not None
+    assert "### Acts of war" in updated and "### Intentional harm" in updated
+    assert "Excludes war.\n" not in updated
+    assert updated.index("## Coverage") < updated.index("### Intentional harm") < updated.index("## Claims")
+    assert "File within 30 days." in updated
+
+
+def test_splice_returns_none_when_a_selected_section_is_missing():
+    preamble, level, sections = parse_sections(POLICY)
+    updated_text = "### Exclusions\n\nExcludes war.\n"
+    assert splice_sections(preamble, sections, level, updated_text, [1]) is None
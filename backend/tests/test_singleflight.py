@@ -0,0 +1,47 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from services.ai_service import AllModelsFailed
+from services.singleflight import CoalescedCallError, SingleFlight, SQLiteFlightStore
+
+KEY = "same-prompt"
+
+
+def _lead(path, claimed, error_type):
+    def fail():
+        claimed.set()
+        time.sleep(0.5)
+        raise error_type("All models failed")
+
+    flight = SingleFlight(store=SQLiteFlightStore(path), wait_timeout=10)
+    try:
+        flight.do(KEY, fail, shared_errors=(AllModelsFailed,))
+    except error_type:
+        pass
+
+
+def _wait_on_other_process(tmp_path, error_type):
+    path = os.path.join(tmp_path, "flights.sqlite3")
+    ctx = multiprocessing.get_context("fork")
+    claimed = ctx.Event()
+    leader = ctx.Process(target=_lead, args=(path, claimed, error_type))
+    leader.start()
+    try:
+        assert claimed.wait(10)
+        flight = SingleFlight(store=SQLiteFlightStore(path), wait_timeout=10)
+        flight.do(KEY, lambda: "called directly", shared_errors=(AllModelsFailed,))
+    finally:
+        leader.join(10)
+
+
+def test_waiter_in_another_process_gets_all_models_failed(tmp_path):
+    with pytest.raises(AllModelsFailed):
+        _wait_on_other_process(tmp_path, AllModelsFailed)
+
+
+def test_other_errors_reach_waiters_as_coalesced_call_error(tmp_path):
+    with pytest.raises(CoalescedCallError, match="RuntimeError: All models failed"):
+        _wait_on_other_process(tmp_path, RuntimeError)
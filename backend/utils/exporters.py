@@ -1,54 +1,106 @@
-from docx import Document
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from io import BytesIO
-import markdown2 # Need to add this to requirements if used, otherwise simple text
-import os
+import hashlib
+import time
+from config import Config
+from utils.lru import LRUTier
+from utils.process_pool import LazyProcessPool
+from utils.metrics import metrics
+
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+}
+
+
+def render_docx(policy_text: str) -> bytes:
+    # python-docx and ReportLab are imported on first render to keep worker start-up light
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading('Insurance Policy', 0)
+
+    # Simple breakdown of markdown-like text
+    for line in policy_text.split('\n'):
+        if line.startswith('# '):
+            doc.add_heading(line[2:], level=1)
+        elif line.startswith('## '):
+            doc.add_heading(line[3:], level=2)
+        elif line.startswith('### '):
+            doc.add_heading(line[4:], level=3)
+        else:
+            doc.add_paragraph(line)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_pdf(policy_text: str) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    text_object = c.beginText(40, height - 40)
+    text_object.setFont("Helvetica", 10)
+
+    lines = policy_text.split('\n')
+    for line in lines:
+        if text_object.getY() < 40:
+            c.drawText(text_object)
+            c.showPage()
+            text_object = c.beginText(40, height - 40)
+            text_object.setFont("Helvetica", 10)
+
+        text_object.textLine(line)
+
+    c.drawText(text_object)
+    c.save()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "pdf": render_pdf,
+    "docx": render_docx
+}
+
 
 class Exporter:
-    def __init__(self):
-        pass
-
-    def export_to_docx(self, policy_text: str, filename: str) -> str:
-        doc = Document()
-        doc.add_heading('Insurance Policy', 0)
-        
-        # Simple breakdown of markdown-like text
-        for line in policy_text.split('\n'):
-            if line.startswith('# '):
-                doc.add_heading(line[2:], level=1)
-            elif line.startswith('## '):
-                doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                doc.add_heading(line[4:], level=3)
-            else:
-                doc.add_paragraph(line)
-        
-        filepath = os.path.join('exports', f"{filename}.docx")
-        os.makedirs('exports', exist_ok=True)
-        doc.save(filepath)
-        return filepath
-
-    def export_to_pdf(self, policy_text: str, filename: str) -> str:
-        filepath = os.path.join('exports', f"{filename}.pdf")
-        os.makedirs('exports', exist_ok=True)
-        
-        c = canvas.Canvas(filepath, pagesize=letter)
-        width, height = letter
-        
-        text_object = c.beginText(40, height - 40)
-        text_object.setFont("Helvetica", 10)
-        
-        lines = policy_text.split('\n')
-        for line in lines:
-            if text_object.getY() < 40:
-                c.drawText(text_object)
-                c.showPage()
-                text_object = c.beginText(40, height - 40)
-                text_object.setFont("Helvetica", 10)
-            
-            text_object.textLine(line)
-        
-        c.drawText(text_object)
-        c.save()
-        return filepath
+    """
+    Renders policies to PDF/DOCX in memory. Rendered bytes are cached by
+    hash of (format, policy_text), and rendering runs in a process pool so
+    large documents do not hold the request thread's GIL.
+    """
+
+    def __init__(self, cache_entries: int = None, cache_bytes: int = None, workers: int = None):
+        self.cache = LRUTier(
+            max_entries=cache_entries if cache_entries is not None else Config.EXPORT_CACHE_ENTRIES,
+            max_bytes=cache_bytes if cache_bytes is not None else Config.EXPORT_CACHE_BYTES,
+            ttl=0
+        )
+        self.pool = LazyProcessPool(workers if workers is not None else Config.EXPORT_WORKERS)
+
+    def _render(self, policy_text: str, format: str) -> bytes:
+        return self.pool.run(RENDERERS[format], policy_text)
+
+    def export(self, policy_text: str, format: str) -> bytes:
+        if format not in RENDERERS:
+            raise ValueError(f"Unsupported export format: {format}")
+        start = time.perf_counter()
+        key = hashlib.sha256(f"{format}\0{policy_text}".encode('utf-8')).hexdigest()
+        data = self.cache.get(key)
+        cache = "hit"
+        if data is None:
+            cache = "miss"
+            data = self._render(policy_text, format)
+            self.cache.set(key, data, float('inf'))
+        metrics.observe("export_seconds", time.perf_counter() - start, format=format, cache=cache)
+        return data
+
+    def export_to_docx(self, policy_text: str) -> bytes:
+        return self.export(policy_text, "docx")
+
+    def export_to_pdf(self, policy_text: str) -> bytes:
+        return self.export(policy_text, "pdf")
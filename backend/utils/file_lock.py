@@ -0,0 +1,29 @@
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, callers still hold their thread locks
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """
+    Exclusive advisory lock on `path` (created if missing) shared by every
+    process on the host, held for the duration of the `with` block. Lock a
+    dedicated lock file rather than a data file that gets replaced, since
+    the lock belongs to the inode that was opened.
+    """
+    lock_dir = os.path.dirname(path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,112 @@
+from io import BytesIO
+from typing import Iterator, List, Tuple
+from config import Config
+from utils.process_pool import LazyProcessPool
+
+
+class IngestionError(Exception):
+    pass
+
+
+class IngestionLimitError(IngestionError):
+    pass
+
+
+def _extract_pdf_range(data: bytes, start: int, end: int) -> List[str]:
+    """
+    Extracts pages [start, end) of a PDF. Runs inside pool workers, so it
+    opens its own reader from the raw bytes.
+    """
+    # PyPDF2 and python-docx are imported on first use to keep worker start-up light
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def count_pdf_pages(data: bytes) -> int:
+    import PyPDF2
+
+    return len(PyPDF2.PdfReader(BytesIO(data)).pages)
+
+
+def extract_text_from_docx(data: bytes) -> str:
+    """Extract text from DOCX file"""
+    import docx
+
+    document = docx.Document(BytesIO(data))
+    return "".join(paragraph.text + "\n" for paragraph in document.paragraphs)
+
+
+class DocumentIngestor:
+    """
+    Extracts text from uploaded policies entirely in memory. PDF pages are
+    split into ranges and extracted in parallel across a process pool; pages
+    can be consumed incrementally with `iter_pdf_pages`.
+    """
+
+    def __init__(self, workers: int = None, pages_per_task: int = None,
+                 max_pages: int = None, max_bytes: int = None):
+        self.pool = LazyProcessPool(workers if workers is not None else Config.INGEST_WORKERS)
+        self.pages_per_task = pages_per_task or Config.INGEST_PAGES_PER_TASK
+        self.max_pages = max_pages or Config.INGEST_MAX_PAGES
+        self.max_bytes = max_bytes or Config.INGEST_MAX_BYTES
+
+    def read_upload(self, stream) -> bytes:
+        """
+        Reads an upload stream (kept in memory by app.InMemoryUploadRequest)
+        into bytes, enforcing the byte limit without reading past it.
+        """
+        data = stream.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise IngestionLimitError(f"File exceeds the {self.max_bytes} byte limit")
+        return data
+
+    def _page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        if page_count > self.max_pages:
+            raise IngestionLimitError(f"Document has {page_count} pages, limit is {self.max_pages}")
+        return [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+    def iter_pdf_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (page_number, text) in page order. All ranges are submitted up
+        front, so later ranges are extracted while earlier ones are consumed.
+        """
+        try:
+            page_count = count_pdf_pages(data)
+        except Exception as e:
+            raise IngestionError(f"Unreadable PDF: {e}")
+        ranges = self._page_ranges(page_count)
+
+        if len(ranges) <= 1:
+            # Not worth shipping the document to another process
+            for start, end in ranges:
+                for offset, text in enumerate(_extract_pdf_range(data, start, end)):
+                    yield start + offset, text
+            return
+
+        futures = [(start, self.pool.submit(_extract_pdf_range, data, start, end)) for start, end in ranges]
+        for start, future in futures:
+            for offset, text in enumerate(future.result()):
+                yield start + offset, text
+
+    def extract_pdf(self, data: bytes) -> str:
+        return "".join(text for _, text in self.iter_pdf_pages(data))
+
+    def extract(self, data: bytes, file_ext: str) -> str:
+        if file_ext == 'pdf':
+            try:
+                return self.extract_pdf(data)
+            except IngestionError:
+                raise
+            except Exception as e:
+                raise IngestionError(f"Failed to extract PDF text: {e}")
+        if file_ext in ['doc', 'docx']:
+            try:
+                return extract_text_from_docx(data)
+            except Exception as e:
+                raise IngestionError(f"Unreadable DOCX: {e}")
+        raise IngestionError(f"Unsupported file format: {file_ext}")
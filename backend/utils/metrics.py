@@ -0,0 +1,278 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+from config import Config
+from utils.tokens import count_tokens
+
+# Seconds; covers sub-millisecond engine calls up to slow LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the current request when tracing is on, else None
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "trace", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Tuple, trace: Optional[List]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.metrics.enabled:
+            self.metrics._observe(self.name, self.labels, elapsed)
+        if self.trace is not None:
+            self.trace.append((_trace_name(self.name, self.labels), elapsed))
+        return False
+
+
+def _trace_name(name: str, labels: Tuple) -> str:
+    # Server-Timing names are tokens: stage_seconds{stage="risk"} -> "risk",
+    # db_operation_seconds{op="log_prompt"} -> "db.log_prompt"
+    prefix = name.split("_", 1)[0]
+    parts = ([] if prefix == "stage" else [prefix]) + [str(value) for _, value in labels]
+    return ".".join(parts) or name
+
+
+def tracing_enabled() -> bool:
+    return Config.METRICS_TRACE_HEADERS != "off"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """
+    In-process counters and histograms rendered in the Prometheus text
+    format. Values are per worker process. When disabled, `inc`/`observe`
+    return immediately, `timer` hands out a shared no-op context manager
+    and `timed` leaves the decorated function untouched.
+    """
+
+    def __init__(self, enabled: bool = True, namespace: str = "insurance", buckets: Tuple = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._started = time.time()
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[self._full(name)] = (kind, help_text)
+
+    def _full(self, name: str) -> str:
+        return f"{self.namespace}_{name}"
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (self._full(name), tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        trace = _trace.get()
+        if not self.enabled and trace is None:
+            return
+        labels = tuple(sorted(labels.items()))
+        if self.enabled:
+            self._observe(name, labels, seconds)
+        if trace is not None:
+            trace.append((_trace_name(name, labels), seconds))
+
+    def _observe(self, name: str, labels: Tuple, seconds: float):
+        key = (self._full(name), labels)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def timer(self, name: str, **labels):
+        """
+        Context manager recording the elapsed time of its block in histogram
+        `name` and, if the current request is traced, in its Server-Timing.
+        """
+        trace = _trace.get()
+        if not self.enabled and trace is None:
+            return NOOP_TIMER
+        return _Timer(self, name, tuple(sorted(labels.items())), trace)
+
+    def timed(self, name: str, **labels):
+        """
+        Decorator form of `timer`. Resolved at decoration time, so a disabled
+        registry adds no call overhead at all.
+        """
+        def decorator(fn):
+            if not self.enabled and not tracing_enabled():
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, [list(h[0]), h[1], h[2]]) for key, h in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                help_kind, help_text = self._help.get(name, (kind, ""))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {help_kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{bound:g}"'
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_format_labels(labels, le)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        name = self._full("process_start_time_seconds")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f'{name}{{pid="{os.getpid()}"}} {self._started:.3f}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=Config.METRICS_ENABLED)
+
+metrics.describe("http_request_seconds", "histogram", "Time to produce the response headers, per route.")
+metrics.describe("stage_seconds", "histogram", "Time spent in each request stage (risk, pricing, llm).")
+metrics.describe("llm_attempt_seconds", "histogram", "Duration of each Gemini call attempt, per model and outcome.")
+metrics.describe("llm_tokens_total", "counter", "Gemini tokens by model and kind (prompt/completion); estimated when the API reports no usage.")
+metrics.describe("llm_generations_total", "counter", "LLM generations by source (model name, cache or mock).")
+metrics.describe("llm_fallbacks_total", "counter", "Times a model was given up on and the next model tried.")
+metrics.describe("llm_mock_policies_total", "counter", "Generations answered with the mock policy because every model failed.")
+metrics.describe("llm_coalesced_total", "counter", "Gemini calls that joined an identical in-flight call instead of sending their own, by scope (thread/worker).")
+metrics.describe("llm_admission_wait_seconds", "histogram", "Time Gemini calls waited for client-side rate limit capacity, by model and lane.")
+metrics.describe("llm_rate_limited_total", "counter", "Gemini calls not admitted within their lane's max wait, by model and lane.")
+metrics.describe("prompt_tokens_total", "counter", "Prompt input tokens per template, as estimated before sending and as reported by the API.")
+metrics.describe("policy_generations_total", "counter", "Policy generations by mode (hybrid/llm) and narrative source (llm, or template when every model failed).")
+metrics.describe("db_operation_seconds", "histogram", "SupabaseModels operation latency.")
+metrics.describe("db_errors_total", "counter", "SupabaseModels operations that failed and fell back.")
+metrics.describe("export_seconds", "histogram", "Policy export latency by format and cache outcome.")
+
+
+def _trace_requested(request) -> bool:
+    mode = Config.METRICS_TRACE_HEADERS
+    if mode == "always":
+        return True
+    return mode == "on_request" and request.headers.get("X-Trace", "").lower() in ("1", "true", "yes")
+
+
+def install_metrics(app):
+    """
+    Times every request per route and, when tracing is requested, returns
+    the stage timings as a Server-Timing header plus an X-Request-Id.
+    """
+    from flask import g, request
+
+    if not metrics.enabled and not tracing_enabled():
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+        if _trace_requested(request):
+            g._metrics_trace_token = _trace.set([])
+
+    @app.after_request
+    def _finish_request_timer(response):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        token = g.pop("_metrics_trace_token", None)
+        stages = None
+        if token is not None:
+            stages = _trace.get() or []
+            _trace.reset(token)
+
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe("http_request_seconds", elapsed, route=route, method=request.method, status=response.status_code)
+
+        if stages is not None:
+            timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages]
+            timings.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(timings)
+            response.headers["X-Request-Id"] = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+        return response
+
+
+def record_llm_usage(model_name: str, prompt: str, text: str, response=None):
+    """
+    Counts prompt/completion tokens from the response's usage metadata,
+    falling back to the local estimate (see utils/tokens.py).
+    """
+    if not metrics.enabled:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    completion_tokens = getattr(usage, "candidates_token_count", None)
+    source = "api" if prompt_tokens is not None else "estimate"
+    if prompt_tokens is None:
+        prompt_tokens = getattr(prompt, "input_tokens", None) or count_tokens(prompt)
+    metrics.inc("llm_tokens_total", prompt_tokens,
+                model=model_name, kind="prompt", source=source)
+    metrics.inc("llm_tokens_total", completion_tokens if completion_tokens is not None else count_tokens(text),
+                model=model_name, kind="completion", source=source)
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+
+def pid_alive(pid) -> bool:
+    """Whether a process with this id exists on this host."""
+    if not pid:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LazyProcessPool:
+    """
+    Process pool created on first use in each worker process (pools do not
+    survive a gunicorn fork). Uses the spawn start method so children never
+    inherit the parent's threads or locks. With `workers <= 0`, or if the pool
+    breaks, work runs inline instead.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        try:
+            return self._get_pool().submit(fn, *args)
+        except BrokenProcessPool as e:
+            print(f"Process pool broken ({e}), running inline")
+            self._pool = None
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    def run(self, fn: Callable, *args) -> Any:
+        """
+        Runs `fn(*args)` in the pool and waits for the result.
+        """
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            print(f"Process pool broken ({e}), running inline")
+            self._pool = None
+            return fn(*args)
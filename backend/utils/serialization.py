@@ -0,0 +1,117 @@
+import json
+from decimal import Decimal
+from typing import Any, Dict
+import numpy as np
+import pydantic_core
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from pydantic import BaseModel
+
+try:
+    import orjson
+    # orjson.Fragment (embedding already-serialized JSON) needs orjson >= 3.9
+    if not hasattr(orjson, "Fragment"):
+        orjson = None
+except ImportError:
+    orjson = None
+
+
+class Serialized:
+    """
+    A pydantic result that is serialized at most once per form: `data` is the
+    dict handed to the LLM prompt, the database and background jobs, and
+    `json` is the encoded bytes embedded as-is in every response that
+    includes the result.
+    """
+    __slots__ = ("model", "_data", "_json")
+
+    def __init__(self, model: BaseModel):
+        self.model = model
+        self._data = None
+        self._json = None
+
+    @property
+    def data(self) -> Dict:
+        if self._data is None:
+            self._data = self.model.model_dump()
+        return self._data
+
+    @property
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = pydantic_core.to_json(self.model)
+        return self._json
+
+
+def _default(obj: Any) -> Any:
+    """
+    Types the JSON encoders do not handle natively. Returns JSON fragments
+    when orjson is available, plain Python values otherwise.
+    """
+    if isinstance(obj, Serialized):
+        return orjson.Fragment(obj.json) if orjson else obj.data
+    if isinstance(obj, BaseModel):
+        return orjson.Fragment(pydantic_core.to_json(obj)) if orjson else obj.model_dump()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def dumps_pretty(obj: Any) -> str:
+    """
+    Two-space indented JSON for LLM prompts. Non-ASCII text is kept as is
+    rather than escaped.
+    """
+    if orjson:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, default=_default, indent=2, ensure_ascii=False)
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson. Request bodies are parsed straight
+    from the raw bytes and responses are encoded straight to bytes, with no
+    intermediate str copies.
+    """
+    mimetype = "application/json"
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+class StdJSONProvider(DefaultJSONProvider):
+    """
+    Fallback when orjson is not installed: Flask's encoder, taught about
+    pydantic results and NumPy arrays.
+    """
+    default = staticmethod(_default)
+    sort_keys = False
+
+
+def install_json_provider(app):
+    app.json = ORJSONProvider(app) if orjson else StdJSONProvider(app)
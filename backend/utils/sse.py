@@ -0,0 +1,20 @@
+from typing import Dict, Optional
+from utils.serialization import dumps
+
+
+def format_sse(data: Dict, event: Optional[str] = None) -> str:
+    """
+    Formats a payload as a single Server-Sent Events message.
+    """
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    message += f"data: {dumps(data)}\n\n"
+    return message
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx and similar proxies from buffering the stream
+    "X-Accel-Buffering": "no"
+}
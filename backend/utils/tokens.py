@@ -0,0 +1,48 @@
+import re
+
+# Words, numbers and single punctuation marks; roughly one SentencePiece token each
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+TRUNCATION_MARKER = "[... truncated]"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Fast local estimate of Gemini's token count: one token per word or
+    punctuation mark plus one per extra six characters of long words.
+    Deterministic, so budget decisions never depend on an API call.
+    """
+    if not text:
+        return 0
+    pieces = TOKEN_PATTERN.findall(text)
+    return len(pieces) + sum((len(piece) - 1) // 6 for piece in pieces if len(piece) > 6)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    Keeps the longest prefix of whole lines (whole words for a single long
+    line) that fits in `max_tokens`, marker included. Same input, same output.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(marker)
+    if budget <= 0:
+        return marker if max_tokens > 0 else ""
+
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        tokens = count_tokens(line)
+        if used + tokens > budget:
+            if not kept:
+                # A single oversized line: cut it at a word boundary
+                words = []
+                for word in line.split(" "):
+                    used += count_tokens(word)
+                    if used > budget:
+                        break
+                    words.append(word)
+                kept.append(" ".join(words))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept).rstrip() + "\n" + marker
@@ -3,7 +3,7 @@ import { FaTimes, FaPaperPlane, FaRobot } from 'react-icons/fa';
 import axios from 'axios';
 import './Chatbot.css';
 
-const Chatbot = ({ policyContext, onClose }) => {
+const Chatbot = ({ policyId, policyContext, onClose }) => {
     const [messages, setMessages] = useState([
         { type: 'bot', text: 'Hello! I can answer questions about your policy. What would you like to know?' }
     ]);
@@ -28,10 +28,21 @@ const Chatbot = ({ policyContext, onClose }) => {
         setLoading(true);
 
         try {
-            const response = await axios.post(`${import.meta.env.VITE_API_BASE_URL}/api/chatbot/query`, {
-                question: userMessage,
-                policy_context: policyContext
-            });
+            const url = `${import.meta.env.VITE_API_BASE_URL}/api/chatbot/query`;
+            let response;
+            try {
+                // The server keeps an index per policy, so the id is usually enough
+                response = await axios.post(url, policyId
+                    ? { question: userMessage, policy_id: policyId }
+                    : { question: userMessage, policy_context: policyContext });
+            } catch (error) {
+                if (!error.response?.data?.context_required) throw error;
+                response = await axios.post(url, {
+                    question: userMessage,
+                    policy_id: policyId,
+                    policy_context: policyContext
+                });
+            }
 
             if (response.data.success) {
                 setMessages(prev => [...prev, { type: 'bot', text: response.data.answer }]);
@@ -261,6 +261,7 @@ const PolicyOutputPage = () => {
 
             {showChatbot && (
                 <Chatbot
+                    policyId={policyData.policy_id}
                     policyContext={policy_text}
                     onClose={() => setShowChatbot(false)}
                 />
@@ -0,0 +1,92 @@
+-- Migrates policy_versions to snapshot + delta storage.
+-- Existing rows are numbered per policy in creation order and kept as full
+-- snapshots. Run backend/scripts/compact_policy_versions.py afterwards to
+-- rewrite the rows between snapshots as deltas.
+
+ALTER TABLE policy_versions
+    ADD COLUMN IF NOT EXISTS version_number INT,
+    ADD COLUMN IF NOT EXISTS storage_kind TEXT NOT NULL DEFAULT 'full',
+    ADD COLUMN IF NOT EXISTS base_version INT,
+    ADD COLUMN IF NOT EXISTS delta TEXT,
+    ADD COLUMN IF NOT EXISTS text_length INT;
+
+UPDATE policy_versions AS pv
+SET version_number = numbered.rn,
+    text_length = LENGTH(pv.policy_text)
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY policy_id ORDER BY created_at, id) AS rn
+    FROM policy_versions
+) AS numbered
+WHERE pv.id = numbered.id
+  AND pv.version_number IS NULL;
+
+ALTER TABLE policy_versions ALTER COLUMN version_number SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS policy_versions_policy_id_version_number_key
+    ON policy_versions (policy_id, version_number);
+
+-- The bundle RPC must write version_number (now NOT NULL), storage_kind and
+-- text_length; same definition as in supabase_schema.sql.
+CREATE OR REPLACE FUNCTION create_policy_bundles(bundles JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    b JSONB;
+BEGIN
+    FOR b IN SELECT * FROM jsonb_array_elements(bundles)
+    LOOP
+        INSERT INTO users (id, age, gender, location, income, lifestyle_factors)
+        SELECT u.id, u.age, u.gender, u.location, u.income,
+               COALESCE(u.lifestyle_factors, b->'user'->>'lifestyle')
+        FROM jsonb_populate_record(NULL::users, b->'user') AS u
+        ON CONFLICT (id) DO NOTHING;
+
+        INSERT INTO policies (id, user_id, type, coverage_amount, status)
+        VALUES (
+            (b->'policy'->>'id')::UUID,
+            (b->'policy'->>'user_id')::UUID,
+            b->'policy'->>'type',
+            (b->'policy'->>'coverage_amount')::DECIMAL,
+            COALESCE(b->'policy'->>'status', 'active')
+        )
+        ON CONFLICT (id) DO NOTHING;
+
+        -- Skip the child rows if this bundle was already written (spill replay)
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+
+        INSERT INTO risk_assessments (policy_id, score, score_value, factors, explanation)
+        VALUES (
+            (b->'risk_assessment'->>'policy_id')::UUID,
+            b->'risk_assessment'->>'score',
+            (b->'risk_assessment'->>'score_value')::FLOAT,
+            b->'risk_assessment'->'factors',
+            b->'risk_assessment'->>'explanation'
+        );
+
+        INSERT INTO pricing_details (policy_id, monthly_premium, yearly_premium, breakdown, explanation)
+        VALUES (
+            (b->'pricing'->>'policy_id')::UUID,
+            (b->'pricing'->>'monthly_premium')::DECIMAL,
+            (b->'pricing'->>'yearly_premium')::DECIMAL,
+            b->'pricing'->'breakdown',
+            b->'pricing'->>'explanation'
+        );
+
+        -- Streaming generation saves the version separately once the text is complete
+        IF b ? 'policy_version' THEN
+            INSERT INTO policy_versions (policy_id, version_number, storage_kind, policy_text, text_length, version_note)
+            VALUES (
+                (b->'policy_version'->>'policy_id')::UUID,
+                COALESCE((b->'policy_version'->>'version_number')::INT, 1),
+                COALESCE(b->'policy_version'->>'storage_kind', 'full'),
+                b->'policy_version'->>'policy_text',
+                (b->'policy_version'->>'text_length')::INT,
+                b->'policy_version'->>'version_note'
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
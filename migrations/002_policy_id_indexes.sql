@@ -0,0 +1,9 @@
+-- Adds the per-policy lookup indexes from supabase_schema.sql to an existing
+-- database. On a large, live database run each statement on its own with
+-- CREATE INDEX CONCURRENTLY instead, so writes are not blocked while it builds.
+
+CREATE INDEX IF NOT EXISTS idx_policies_user_id ON policies (user_id);
+CREATE INDEX IF NOT EXISTS idx_risk_assessments_policy_created ON risk_assessments (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_pricing_details_policy_created ON pricing_details (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_policy_versions_policy_created ON policy_versions (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_prompts_log_policy_created ON prompts_log (policy_id, created_at);
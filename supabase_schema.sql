@@ -45,12 +45,20 @@ CREATE TABLE pricing_details (
 );
 
 -- Policy Versions Table
+-- Full snapshots keep the text in policy_text; versions in between store a
+-- compressed line delta against base_version (see backend/models/version_store.py)
 CREATE TABLE policy_versions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     policy_id UUID REFERENCES policies(id),
+    version_number INT NOT NULL,
+    storage_kind TEXT NOT NULL DEFAULT 'full',
+    base_version INT,
     policy_text TEXT,
+    delta TEXT,
+    text_length INT,
     version_note TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (policy_id, version_number)
 );
 
 -- Prompts Log Table
@@ -60,3 +68,79 @@ CREATE TABLE prompts_log (
     prompt_text TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
+
+-- Indexes for per-policy lookups (the read endpoints and latest-row queries);
+-- Postgres does not index foreign keys on its own. Existing databases:
+-- migrations/002_policy_id_indexes.sql.
+CREATE INDEX IF NOT EXISTS idx_policies_user_id ON policies (user_id);
+CREATE INDEX IF NOT EXISTS idx_risk_assessments_policy_created ON risk_assessments (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_pricing_details_policy_created ON pricing_details (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_policy_versions_policy_created ON policy_versions (policy_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_prompts_log_policy_created ON prompts_log (policy_id, created_at);
+
+-- Bulk policy persistence: writes users, policies, risk assessments, pricing
+-- and the first policy version for a batch of bundles in one transaction.
+-- Called by SupabaseModels._write_bundles via supabase.rpc('create_policy_bundles').
+CREATE OR REPLACE FUNCTION create_policy_bundles(bundles JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    b JSONB;
+BEGIN
+    FOR b IN SELECT * FROM jsonb_array_elements(bundles)
+    LOOP
+        INSERT INTO users (id, age, gender, location, income, lifestyle_factors)
+        SELECT u.id, u.age, u.gender, u.location, u.income,
+               COALESCE(u.lifestyle_factors, b->'user'->>'lifestyle')
+        FROM jsonb_populate_record(NULL::users, b->'user') AS u
+        ON CONFLICT (id) DO NOTHING;
+
+        INSERT INTO policies (id, user_id, type, coverage_amount, status)
+        VALUES (
+            (b->'policy'->>'id')::UUID,
+            (b->'policy'->>'user_id')::UUID,
+            b->'policy'->>'type',
+            (b->'policy'->>'coverage_amount')::DECIMAL,
+            COALESCE(b->'policy'->>'status', 'active')
+        )
+        ON CONFLICT (id) DO NOTHING;
+
+        -- Skip the child rows if this bundle was already written (spill replay)
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+
+        INSERT INTO risk_assessments (policy_id, score, score_value, factors, explanation)
+        VALUES (
+            (b->'risk_assessment'->>'policy_id')::UUID,
+            b->'risk_assessment'->>'score',
+            (b->'risk_assessment'->>'score_value')::FLOAT,
+            b->'risk_assessment'->'factors',
+            b->'risk_assessment'->>'explanation'
+        );
+
+        INSERT INTO pricing_details (policy_id, monthly_premium, yearly_premium, breakdown, explanation)
+        VALUES (
+            (b->'pricing'->>'policy_id')::UUID,
+            (b->'pricing'->>'monthly_premium')::DECIMAL,
+            (b->'pricing'->>'yearly_premium')::DECIMAL,
+            b->'pricing'->'breakdown',
+            b->'pricing'->>'explanation'
+        );
+
+        -- Streaming generation saves the version separately once the text is complete
+        IF b ? 'policy_version' THEN
+            INSERT INTO policy_versions (policy_id, version_number, storage_kind, policy_text, text_length, version_note)
+            VALUES (
+                (b->'policy_version'->>'policy_id')::UUID,
+                COALESCE((b->'policy_version'->>'version_number')::INT, 1),
+                COALESCE(b->'policy_version'->>'storage_kind', 'full'),
+                b->'policy_version'->>'policy_text',
+                (b->'policy_version'->>'text_length')::INT,
+                b->'policy_version'->>'version_note'
+            );
+        END IF;
+    END LOOP;
+END;
+$$;